@@ -1,15 +1,22 @@
 import time
 import logging
-import re
 
+from collections import Counter
 from enum import Enum
-from itertools import filterfalse
-from multiprocessing import Lock
+from heapq import heapify, heappop, heappush
+from itertools import count
 
+from arrnounced.pattern_set import are_disjoint, hit_order
 from arrnounced.utils import get_default_variables
 
 logger = logging.getLogger("ANNOUNCE_PARSER")
 
+# Learn the order to evaluate line patterns and ignores in from how often
+# they match, see PatternOrder. Trackers may pin the order of their XML config.
+adaptive_order = False
+# Number of parsed messages between updates of the order
+reorder_interval = 1000
+
 
 class ParseStatus(Enum):
     MATCH = 1
@@ -17,31 +24,96 @@ class ParseStatus(Enum):
     CONTINUE = 3
 
 
+# Number of messages per outcome for a tracker and number of incomplete
+# multiline announcements discarded for being too old or too many. With
+# adaptive order the hits per line pattern and expected ignore are counted
+# as well, keyed by their index in the XML config.
+class ParseStatistics:
+    def __init__(self):
+        self.matched = 0
+        self.ignored = 0
+        self.unmatched = 0
+        self.expired = 0
+        self.evicted = 0
+        self.pattern_hits = Counter()
+        self.ignore_hits = Counter()
+
+    def __str__(self):
+        return (
+            "matched: {}, ignored: {}, unmatched: {}, "
+            "expired: {}, evicted: {}".format(
+                self.matched, self.ignored, self.unmatched, self.expired, self.evicted
+            )
+        )
+
+
+statistics = {}
+
+
+def get_statistics(tracker_type):
+    if tracker_type not in statistics:
+        statistics[tracker_type] = ParseStatistics()
+    return statistics[tracker_type]
+
+
+def _format_hits(hits):
+    return ", ".join("{}: {}".format(i, hits[i]) for i in sorted(hits)) or "none"
+
+
+def log_statistics():
+    for tracker_type, tracker_statistics in statistics.items():
+        logger.info("%s: Parsed messages, %s", tracker_type, tracker_statistics)
+        if tracker_statistics.pattern_hits or tracker_statistics.ignore_hits:
+            logger.info(
+                "%s: Line pattern hits, %s. Ignore hits, %s",
+                tracker_type,
+                _format_hits(tracker_statistics.pattern_hits),
+                _format_hits(tracker_statistics.ignore_hits),
+            )
+
+
 def parse(tracker, message):
+    pattern_order = _get_pattern_order(tracker)
+    if pattern_order is not None and pattern_order.ignore_first(message):
+        _ignored(tracker, message)
+        return None
+
     parse_status = ParseStatus.NO_MATCH
     pattern_groups = {}
     if len(tracker.config.line_patterns) > 0:
         parse_status, pattern_groups = _parse_singleline_patterns(
-            tracker.config.line_patterns, message
+            tracker.config.line_pattern_set, message, pattern_order
         )
     elif len(tracker.config.multiline_patterns) > 0:
         parse_status, pattern_groups = _parse_multiline_patterns(tracker, message)
 
-    if not _is_parsing_ok(tracker, parse_status, message):
+    if not _is_parsing_ok(tracker, parse_status, message, pattern_order):
         return None
 
     return pattern_groups
 
 
-def _is_parsing_ok(tracker, parse_status, message):
+def _ignored(tracker, message):
+    get_statistics(tracker.config.type).ignored += 1
+    logger.debug("%s: Message ignored: %s", tracker.config.short_name, message)
+
+
+def _is_parsing_ok(tracker, parse_status, message, pattern_order=None):
+    tracker_statistics = get_statistics(tracker.config.type)
     if parse_status == ParseStatus.NO_MATCH:
-        if _ignore_message(tracker.config.ignores, message):
-            logger.debug("%s: Message ignored: %s", tracker.config.short_name, message)
+        if tracker.config.ignore_set.ignore(message):
+            _ignored(tracker, message)
+            if pattern_order is not None:
+                pattern_order.hit_ignore(message)
         else:
+            tracker_statistics.unmatched += 1
             logger.warning(
                 "%s: No match found for '%s'", tracker.config.short_name, message
             )
-    elif parse_status == ParseStatus.CONTINUE:
+        return False
+
+    tracker_statistics.matched += 1
+    if parse_status == ParseStatus.CONTINUE:
         logger.debug(
             "%s: Messages in announcement still remaining",
             tracker.config.short_name,
@@ -50,50 +122,253 @@ def _is_parsing_ok(tracker, parse_status, message):
     return parse_status == ParseStatus.MATCH
 
 
-def _ignore_message(ignores, message):
-    for ignore in ignores:
-        # If message matches an expected regex it will be ignord
-        # If it's not expected it works as an inverse, ignore everything which doesn't match.
-        if bool(re.search(ignore.regex, message)) == ignore.expected:
-            return True
-    return False
-
-
-def _parse_singleline_patterns(line_patterns, message):
-    index, pattern_groups = _parse_message(line_patterns, message)
+def _parse_singleline_patterns(line_pattern_set, message, pattern_order=None):
+    index, pattern_groups = line_pattern_set.match(message)
     if index == -1:
         return ParseStatus.NO_MATCH, {}
     else:
+        if pattern_order is not None:
+            pattern_order.hit_pattern(index)
         variables = get_default_variables()
         variables.update(pattern_groups)
         return ParseStatus.MATCH, variables
 
 
-def _parse_message(pattern_list, message):
-    for i, pattern in enumerate(pattern_list, start=0):
-        match_groups = pattern.process_string(message)
-        if match_groups is not None:
-            return i, match_groups
-    return -1, {}
+# Learns the order to evaluate a tracker's patterns in from the hits counted
+# in its statistics. Every interval parsed messages the line patterns are
+# reordered by hits and the expected ignore with most hits is checked before
+# any pattern. Both only where it cannot change the outcome of parsing, see
+# hit_order. An ignore is only checked first if no pattern can match the same
+# messages.
+class PatternOrder:
+    def __init__(self, tracker_config, statistics, interval=1000):
+        self.config = tracker_config
+        self.statistics = statistics
+        self.interval = interval
+        self.parsed = 0
+        self.first_ignore = None
+
+    def hit_pattern(self, index):
+        self.statistics.pattern_hits[index] += 1
+        self._count_parsed()
+
+    def hit_ignore(self, message):
+        index = self.config.ignore_set.expected_index(message)
+        if index != -1:
+            self.statistics.ignore_hits[index] += 1
+        self._count_parsed()
+
+    # True if the message matches the ignore checked first
+    def ignore_first(self, message):
+        if self.first_ignore is None:
+            return False
+
+        index, regex = self.first_ignore
+        if regex.search(message) is None:
+            return False
+        self.statistics.ignore_hits[index] += 1
+        self._count_parsed()
+        return True
+
+    def _count_parsed(self):
+        self.parsed += 1
+        if self.parsed % self.interval == 0:
+            self.update()
+
+    def update(self):
+        pattern_set = self.config.line_pattern_set
+        order = hit_order(
+            [e.regex for e in pattern_set.extracts], self.statistics.pattern_hits
+        )
+        if order != pattern_set.order:
+            logger.info(
+                "%s: Evaluating line patterns in order %s",
+                self.config.short_name,
+                order,
+            )
+            pattern_set.reorder(order)
+
+        self.first_ignore = None
+        if self.statistics.ignore_hits:
+            index = self.statistics.ignore_hits.most_common(1)[0][0]
+            regex = self.config.ignores[index].regex
+            patterns = self.config.line_patterns + self.config.multiline_patterns
+            if all(are_disjoint(regex, p.regex) for p in patterns):
+                self.first_ignore = (index, regex)
+
+
+def _get_pattern_order(tracker):
+    if not adaptive_order or tracker.config.pin_pattern_order:
+        return None
+    if tracker.pattern_order is None:
+        tracker.pattern_order = PatternOrder(
+            tracker.config, get_statistics(tracker.config.type), reorder_interval
+        )
+    return tracker.pattern_order
 
 
 ######################
 # Multi line patterns
 ######################
 
-multiline_matches = {}
-mutex = Lock()
-
 
 class MultilineMatch:
-    def __init__(self):
-        self.time = time.time()
+    def __init__(self, number, created):
+        self.number = number
+        self.time = created
         self.pattern_groups = get_default_variables()
         self.matched_index = -1
 
-    # Returns true if more than 15 seconds has passed since instantiated
-    def too_old(self):
-        return (time.time() - self.time) > 15
+
+# Returns the pattern indexes which may follow a match of matched_index, i.e.
+# the next pattern and the ones after any optional patterns in between
+def _next_indexes(patterns, matched_index):
+    indexes = []
+    for next_index in range(matched_index + 1, len(patterns)):
+        indexes.append(next_index)
+        if not patterns[next_index].optional:
+            break
+    return indexes
+
+
+# Assembles multiline announcements from interleaved messages. Partial
+# announcements are indexed by the pattern indexes they can accept next, in
+# order of creation, so that a message goes to the oldest partial announcement
+# accepting it without scanning all of them. Partial announcements expire
+# after timeout seconds, kept in a heap ordered by creation time. When
+# max_pending partial announcements are waiting the oldest is evicted to make
+# room for a new one.
+#
+# Heap entries are not removed when a partial announcement advances,
+# completes or expires. Such entries are dropped when found at the top of a
+# heap or when a heap has grown to twice max_pending.
+class MultilineAssembler:
+    def __init__(self, patterns, timeout=15, max_pending=100, statistics=None):
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.statistics = ParseStatistics() if statistics is None else statistics
+        self.next_indexes = [frozenset()] + [
+            frozenset(_next_indexes(patterns, i)) for i in range(len(patterns))
+        ]
+        self.is_last = [
+            _is_last_multiline_pattern(patterns, i) for i in range(len(patterns))
+        ]
+        self.pending = {}
+        self.waiting = {}
+        self.expiry = []
+        self.counter = count()
+
+    def __len__(self):
+        return len(self.pending)
+
+    # Returns the announcement the message belongs to or None if there is no
+    # partial announcement waiting for match_index
+    def update(self, match_index, match_groups):
+        now = time.time()
+        self._expire(now)
+
+        if match_index == 0:
+            multiline_match = self._create(now)
+        else:
+            multiline_match = self._waiting_for(match_index)
+            if multiline_match is None:
+                return None
+
+        previous_indexes = self._next_for(multiline_match)
+        multiline_match.matched_index = match_index
+        multiline_match.pattern_groups.update(match_groups)
+
+        if self.is_last[match_index]:
+            del self.pending[multiline_match.number]
+            return multiline_match
+
+        # Entries for indexes accepted before this match are still valid
+        for next_index in self._next_for(multiline_match) - previous_indexes:
+            waiting = self.waiting.setdefault(next_index, [])
+            heappush(waiting, (multiline_match.number, multiline_match))
+            if len(waiting) > 2 * self.max_pending:
+                self._compact_waiting(next_index)
+        return multiline_match
+
+    def _next_for(self, multiline_match):
+        return self.next_indexes[multiline_match.matched_index + 1]
+
+    def _is_waiting(self, multiline_match, match_index):
+        return multiline_match.number in self.pending and match_index in (
+            self._next_for(multiline_match)
+        )
+
+    def _compact_waiting(self, match_index):
+        waiting = [
+            entry
+            for entry in self.waiting[match_index]
+            if self._is_waiting(entry[1], match_index)
+        ]
+        heapify(waiting)
+        self.waiting[match_index] = waiting
+
+    def _compact_expiry(self):
+        self.expiry = [entry for entry in self.expiry if entry[1] in self.pending]
+        heapify(self.expiry)
+
+    def _create(self, now):
+        if len(self.pending) >= self.max_pending:
+            self._evict_oldest()
+
+        multiline_match = MultilineMatch(next(self.counter), now)
+        self.pending[multiline_match.number] = multiline_match
+        heappush(self.expiry, (now, multiline_match.number, multiline_match))
+        if len(self.expiry) > 2 * self.max_pending:
+            self._compact_expiry()
+        return multiline_match
+
+    def _waiting_for(self, match_index):
+        waiting = self.waiting.get(match_index)
+        while waiting:
+            multiline_match = waiting[0][1]
+            if self._is_waiting(multiline_match, match_index):
+                return multiline_match
+            heappop(waiting)
+        return None
+
+    def _pop_oldest(self):
+        while self.expiry:
+            _, number, multiline_match = heappop(self.expiry)
+            if self.pending.pop(number, None) is not None:
+                return multiline_match
+        return None
+
+    def _evict_oldest(self):
+        multiline_match = self._pop_oldest()
+        if multiline_match is not None:
+            self.statistics.evicted += 1
+            logger.warning(
+                "Too many incomplete announcements, discarding: %s",
+                list(multiline_match.pattern_groups.values()),
+            )
+
+    def _expire(self, now):
+        while self.expiry and (now - self.expiry[0][0]) > self.timeout:
+            _, number, multiline_match = heappop(self.expiry)
+            if self.pending.pop(number, None) is not None:
+                self.statistics.expired += 1
+                logger.warning(
+                    "Announcement is too old, discarding: %s",
+                    list(multiline_match.pattern_groups.values()),
+                )
+
+
+# Each tracker owns its partial announcements. Messages are parsed one at a
+# time on the IRC event loop and an update never awaits, hence no locking.
+def _get_assembler(tracker):
+    if tracker.multiline_assembler is None:
+        tracker.multiline_assembler = MultilineAssembler(
+            tracker.config.multiline_patterns,
+            tracker.config.multiline_timeout,
+            tracker.config.multiline_max_pending,
+            get_statistics(tracker.config.type),
+        )
+    return tracker.multiline_assembler
 
 
 # Returning None means the message matched but still waiting for remaning messages.
@@ -102,80 +377,26 @@ def _parse_multiline_patterns(tracker, message):
     logger.debug(
         "%s: Parsing multiline annoucement '%s'", tracker.config.short_name, message
     )
-    match_index, match_groups = _parse_message(
-        tracker.config.multiline_patterns, message
-    )
+    match_index, match_groups = tracker.config.multiline_pattern_set.match(message)
 
     if match_index == -1:
         return ParseStatus.NO_MATCH, {}
 
-    is_last_pattern = _is_last_multiline_pattern(
-        tracker.config.multiline_patterns, match_index
-    )
-
-    with mutex:
-        multiline_match = _get_multiline_match(
-            tracker.config.type,
-            tracker.config.multiline_patterns,
-            match_index,
-            is_last_pattern,
-        )
+    assembler = _get_assembler(tracker)
+    multiline_match = assembler.update(match_index, match_groups)
 
-        if multiline_match is None:
-            return ParseStatus.NO_MATCH, {}
-
-        multiline_match.matched_index = match_index
-        multiline_match.pattern_groups.update(match_groups)
+    if multiline_match is None:
+        return ParseStatus.NO_MATCH, {}
 
-    if is_last_pattern:
+    if assembler.is_last[match_index]:
         return ParseStatus.MATCH, multiline_match.pattern_groups
 
     return ParseStatus.CONTINUE, {}
 
 
-def _is_valid_next_index(matched_index, next_index, patterns):
-    return (next_index - matched_index) == 1 or (  # Next match
-        next_index - matched_index > 1
-        and all(  # Or optionals in between
-            pattern.optional for pattern in patterns[matched_index + 1 : next_index]
-        )
-    )
-
-
 # Returns True if match_index is the last pattern in the announcement
 # OR if the remaining patterns are optional
 def _is_last_multiline_pattern(multiline_patterns, match_index):
     return match_index + 1 == len(multiline_patterns) or all(
         pattern.optional for pattern in multiline_patterns[match_index + 1 :]
     )
-
-
-def _get_multiline_match(tracker_type, patterns, match_index, last_pattern):
-    global multiline_matches
-    if tracker_type not in multiline_matches:
-        multiline_matches[tracker_type] = []
-
-    _clean_old_multi_announcements(multiline_matches[tracker_type])
-
-    if match_index == 0:
-        multiline_match = MultilineMatch()
-        multiline_matches[tracker_type].append(multiline_match)
-        return multiline_match
-
-    for i, multiline_match in enumerate(multiline_matches[tracker_type]):
-        if _is_valid_next_index(multiline_match.matched_index, match_index, patterns):
-            if last_pattern:
-                del multiline_matches[tracker_type][i]
-            return multiline_match
-
-    return None
-
-
-def _clean_old_multi_announcements(matches):
-    removes = list(filterfalse(lambda x: not x.too_old(), matches))
-    for remove in removes:
-        logger.warning(
-            "Announcement is too old, discarding: %s",
-            list(remove.pattern_groups.values()),
-        )
-        matches.remove(remove)
@@ -2,10 +2,24 @@ import logging
 import urllib.parse
 from datetime import datetime
 from enum import Enum
+from functools import partial
 import re
 
+from arrnounced.pattern_set import (
+    fuse_regexes,
+    is_fusable,
+    prefilter_literal,
+    prefilter_rejects,
+)
+from arrnounced.utils import compile_regex
+
 logger = logging.getLogger("ANNOUNCEMENT")
 debug = False
+# Run all linematched elements, not only those needed for the announcement.
+# Meant for debugging tracker configurations.
+full_evaluation = False
+
+_http_scheme = re.compile("^https?")
 
 
 class Announcement:
@@ -22,8 +36,8 @@ class Announcement:
 
 
 def create_announcement(tracker, variables):
-    for line_match in tracker.config.line_matched:
-        line_match.process(tracker.config, variables)
+    for step in tracker.config.line_matched_plan(full_evaluation):
+        step(variables)
 
     _insert_ssl_url(variables)
 
@@ -44,9 +58,46 @@ def create_announcement(tracker, variables):
     )
 
 
+# Compiles linematched elements into a list of steps, functions taking the
+# variables, for a tracker configuration. Elements without effect on the
+# variables are left out.
+def compile_plan(line_matched, tracker_config):
+    plan = []
+    for line_match in line_matched:
+        step = line_match.compile(tracker_config)
+        if step is not None:
+            plan.append(step)
+    return plan
+
+
+# Variables used by create_announcement
+def consumed_variables(tracker_config):
+    consumed = {"torrentName", "torrentUrl", "category"}
+    if tracker_config.torrent_https:
+        consumed.add("torrentSslUrl")
+    return consumed
+
+
+# Returns the linematched elements needed for the live variables, i.e. those
+# which may write a live variable or a variable read by a later needed
+# element. Conditional writes do not end a variable's liveness as the value
+# from before may remain.
+def needed_line_matches(line_matched, live):
+    live = set(live)
+    needed = []
+    for line_match in reversed(line_matched):
+        line_match = line_match.needed(live)
+        if line_match is not None:
+            live |= line_match.read_variables()
+            needed.append(line_match)
+
+    needed.reverse()
+    return needed
+
+
 def _insert_ssl_url(variables):
     if variables.get("torrentUrl") and not variables.get("torrentSslUrl"):
-        variables["torrentSslUrl"] = re.sub("^https?", "https", variables["torrentUrl"])
+        variables["torrentSslUrl"] = _http_scheme.sub("https", variables["torrentUrl"])
 
 
 class Var:
@@ -56,6 +107,21 @@ class Var:
         for element in elements:
             self.elements.append(Var.Element(element.tag, element.attrib))
 
+    # The regexes evaluated by the element, for linting
+    def regexes(self):
+        return []
+
+    def read_variables(self):
+        return {
+            e.name for e in self.elements if e.var_type is not self.Element.Type.STRING
+        }
+
+    def written_variables(self):
+        return {self.var_name}
+
+    def needed(self, live):
+        return self if self.written_variables() & live else None
+
     def process(self, tracker_config, variables):
         var = ""
         for element in self.elements:
@@ -85,6 +151,65 @@ class Var:
             logger.debug("Setting variable: %s = %s", self.var_name, var)
         variables[self.var_name] = var
 
+    # Returns the elements as (name, value, encode) shards. Strings are
+    # merged with adjacent strings and have no name. Variables get the
+    # setting, encoded if varenc, as value which is used unless the variable
+    # is set when building.
+    def _shards(self, tracker_config):
+        shards = []
+        for element in self.elements:
+            if element.var_type is self.Element.Type.STRING:
+                if shards and shards[-1][0] is None and shards[-1][1] and element.name:
+                    shards[-1] = (None, shards[-1][1] + element.name, False)
+                else:
+                    shards.append((None, element.name, False))
+                continue
+
+            encode = element.var_type is self.Element.Type.VARENC
+            setting = tracker_config.setting(element.name)
+            if encode and setting is not None:
+                setting = urllib.parse.quote_plus(setting)
+            shards.append((element.name, setting, encode))
+        return shards
+
+    def compile(self, tracker_config):
+        var_name = self.var_name
+        shards = self._shards(tracker_config)
+
+        if all(name is None and value for name, value, _ in shards):
+            constant = "".join(value for _, value, _ in shards)
+
+            def set_constant(variables):
+                if debug:
+                    logger.debug("Setting variable: %s = %s", var_name, constant)
+                variables[var_name] = constant
+
+            return set_constant
+
+        def build_var(variables):
+            var = []
+            for name, var_shard, encode in shards:
+                if name is not None and name in variables:
+                    var_shard = variables[name]
+                    if encode:
+                        var_shard = urllib.parse.quote_plus(var_shard)
+
+                if not var_shard:
+                    logger.warning(
+                        "Could not build var '%s', missing variable '%s'",
+                        var_name,
+                        name if name is not None else var_shard,
+                    )
+                    return
+                var.append(var_shard)
+
+            var = "".join(var)
+            if debug:
+                logger.debug("Setting variable: %s = %s", var_name, var)
+            variables[var_name] = var
+
+        return build_var
+
     class Element:
         class Type(Enum):
             STRING = 1
@@ -102,6 +227,19 @@ _log_once = True
 
 
 class Http:
+    def regexes(self):
+        return []
+
+    def read_variables(self):
+        return set()
+
+    def written_variables(self):
+        return set()
+
+    # Kept for its warning
+    def needed(self, live):
+        return self
+
     def process(self, tracker_config, variables):
         global _log_once
         if _log_once:
@@ -111,34 +249,64 @@ class Http:
             )
             _log_once = False
 
+    # Has no effect on the variables, only warns once
+    def compile(self, tracker_config):
+        self.process(tracker_config, None)
+        return None
+
 
 class Extract:
     def __init__(self, srcvar, regex, groups, optional):
         self.srcvar = srcvar
-        self.regex = regex
+        self.regex = compile_regex(regex)
+        self.literal = prefilter_literal(self.regex)
         self.groups = groups
         self.optional = optional
 
     # Returns None when no match was found
     def process_string(self, string):
-        matches = re.search(self.regex, string)
+        if (
+            self.literal is not None
+            and self.literal not in string
+            and prefilter_rejects(self.literal, self.regex, string)
+        ):
+            return None
+
+        matches = self.regex.search(string)
         if matches:
-            match_groups = {}
-            for j, group_name in enumerate(self.groups, start=1):
-                # Filter out missing non-capturing groups
-                match = matches.group(j)
-                if match is not None and not match.isspace():
-                    match_groups[group_name] = match.strip()
-            return match_groups
+            return self.get_match_groups(matches)
 
         return None
 
+    # Variables from the regex groups. Offset is the number of groups in
+    # front of this regex when it's part of a larger regex.
+    def get_match_groups(self, matches, offset=0):
+        match_groups = {}
+        for j, group_name in enumerate(self.groups, start=offset + 1):
+            # Filter out missing non-capturing groups
+            match = matches.group(j)
+            if match is not None and not match.isspace():
+                match_groups[group_name] = match.strip()
+        return match_groups
+
     def get_extract_variables(self, variables):
         match_groups = None
         if self.srcvar in variables:
             match_groups = self.process_string(variables[self.srcvar])
         return match_groups
 
+    def regexes(self):
+        return [self.regex]
+
+    def read_variables(self):
+        return {self.srcvar}
+
+    def written_variables(self):
+        return set(self.groups)
+
+    def needed(self, live):
+        return self if self.written_variables() & live else None
+
     def process(self, tracker_config, variables):
         match_groups = self.get_extract_variables(variables)
 
@@ -151,14 +319,29 @@ class Extract:
             logger.warning(
                 "Extract: Variable '%s' did not match regex '%s'",
                 self.srcvar,
-                self.regex,
+                self.regex.pattern,
             )
 
+    def compile(self, tracker_config):
+        return partial(self.process, tracker_config)
+
 
 class ExtractOne:
     def __init__(self, extracts):
         self.extracts = extracts
 
+    def regexes(self):
+        return [e.regex for e in self.extracts]
+
+    def read_variables(self):
+        return {e.srcvar for e in self.extracts}
+
+    def written_variables(self):
+        return {g for e in self.extracts for g in e.groups}
+
+    def needed(self, live):
+        return self if self.written_variables() & live else None
+
     def process(self, tracker_config, variables):
         for extract in self.extracts:
             extract_vars = extract.get_extract_variables(variables)
@@ -171,12 +354,73 @@ class ExtractOne:
 
         logger.warning("ExtractOne: No matching regex found")
 
+    def compile(self, tracker_config):
+        return partial(self.process, tracker_config)
+
 
+# Each tag is given to the first SetVarIf which matches it. SetVarIfs with
+# only a value are looked up by lower case value and SetVarIfs with only a
+# regex are evaluated with one fused regex. The remaining are tried one by one
+# but only while they come before the first match found through the others.
 class ExtractTags:
     def __init__(self, srcvar, split, setvarifs):
         self.srcvar = srcvar
-        self.split = split
+        self.split = compile_regex(split)
         self.setvarifs = setvarifs
+        self.values = {}
+        self.others = []
+
+        regex_indexes = []
+        for index, setvarif in enumerate(setvarifs):
+            if setvarif.regex is None and setvarif.value is not None:
+                self.values.setdefault(setvarif.value.lower(), index)
+            elif (
+                setvarif.value is None
+                and setvarif.regex is not None
+                and is_fusable(setvarif.regex)
+            ):
+                regex_indexes.append(index)
+            else:
+                self.others.append(index)
+
+        self.fused = None
+        if len(regex_indexes) > 1:
+            self.fused, markers = fuse_regexes(
+                [setvarifs[i].regex for i in regex_indexes]
+            )
+            self.fused_indexes = {
+                marker: regex_indexes[i] for marker, (i, _) in markers.items()
+            }
+        else:
+            self.others = sorted(self.others + regex_indexes)
+
+    # Returns the index of the first SetVarIf matching the tag or the number
+    # of SetVarIfs if none matches
+    def first_match(self, tag_name):
+        first = self.values.get(tag_name.lower(), len(self.setvarifs))
+        if self.fused is not None:
+            matches = self.fused.match(tag_name)
+            if matches is not None:
+                first = min(first, self.fused_indexes[matches.lastindex])
+
+        for index in self.others:
+            if index >= first:
+                break
+            if self.setvarifs[index].get_value(tag_name) is not None:
+                return index
+        return first
+
+    def regexes(self):
+        return [self.split] + [s.regex for s in self.setvarifs if s.regex is not None]
+
+    def read_variables(self):
+        return {self.srcvar}
+
+    def written_variables(self):
+        return {s.var_name for s in self.setvarifs}
+
+    def needed(self, live):
+        return self if self.written_variables() & live else None
 
     def process(self, tracker_config, variables):
         if self.srcvar not in variables:
@@ -186,35 +430,40 @@ class ExtractTags:
             )
             return
 
-        for tag_name in [
-            x.strip() for x in re.split(self.split, variables[self.srcvar])
-        ]:
+        for tag_name in [x.strip() for x in self.split.split(variables[self.srcvar])]:
             if not tag_name:
                 continue
 
-            for setvarif in self.setvarifs:
-                new_value = setvarif.get_value(tag_name)
-                if new_value is not None:
-                    if debug:
-                        logger.debug(
-                            "Setting variable: %s = %s", setvarif.var_name, new_value
-                        )
-                    variables[setvarif.var_name] = new_value
-                    break
+            index = self.first_match(tag_name)
+            if index < len(self.setvarifs):
+                setvarif = self.setvarifs[index]
+                new_value = setvarif.tag_value(tag_name)
+                if debug:
+                    logger.debug(
+                        "Setting variable: %s = %s", setvarif.var_name, new_value
+                    )
+                variables[setvarif.var_name] = new_value
+
+    def compile(self, tracker_config):
+        return partial(self.process, tracker_config)
 
     class SetVarIf:
         def __init__(self, var_name, regex, value, new_value):
             self.var_name = var_name
-            self.regex = regex
+            self.regex = compile_regex(regex) if regex is not None else None
             self.value = value
             self.new_value = new_value
 
         def get_value(self, tag_name):
             if (self.value is not None and self.value.lower() != tag_name.lower()) or (
-                self.regex is not None and re.search(self.regex, tag_name) is None
+                self.regex is not None and self.regex.search(tag_name) is None
             ):
                 return None
 
+            return self.tag_value(tag_name)
+
+        # The value set for a matching tag
+        def tag_value(self, tag_name):
             return self.new_value if self.new_value is not None else tag_name
 
 
@@ -222,9 +471,21 @@ class VarReplace:
     def __init__(self, name, srcvar, regex, replace):
         self.name = name
         self.srcvar = srcvar
-        self.regex = regex
+        self.regex = compile_regex(regex)
         self.replace = replace
 
+    def regexes(self):
+        return [self.regex]
+
+    def read_variables(self):
+        return {self.srcvar}
+
+    def written_variables(self):
+        return {self.name}
+
+    def needed(self, live):
+        return self if self.written_variables() & live else None
+
     def process(self, tracker_config, variables):
         if self.srcvar not in variables:
             logger.warning(
@@ -236,18 +497,33 @@ class VarReplace:
             logger.debug(
                 "Setting variable: %s = %s",
                 self.name,
-                re.sub(self.regex, self.replace, variables[self.srcvar]),
+                self.regex.sub(self.replace, variables[self.srcvar]),
             )
-        variables[self.name] = re.sub(self.regex, self.replace, variables[self.srcvar])
+        variables[self.name] = self.regex.sub(self.replace, variables[self.srcvar])
+
+    def compile(self, tracker_config):
+        return partial(self.process, tracker_config)
 
 
 class SetRegex:
     def __init__(self, srcvar, regex, var_name, new_value):
         self.srcvar = srcvar
-        self.regex = regex
+        self.regex = compile_regex(regex)
         self.var_name = var_name
         self.new_value = new_value
 
+    def regexes(self):
+        return [self.regex]
+
+    def read_variables(self):
+        return {self.srcvar}
+
+    def written_variables(self):
+        return {self.var_name}
+
+    def needed(self, live):
+        return self if self.written_variables() & live else None
+
     def process(self, tracker_config, variables):
         if self.srcvar not in variables:
             logger.warning(
@@ -255,18 +531,36 @@ class SetRegex:
             )
             return
 
-        if re.search(self.regex, variables[self.srcvar]):
+        if self.regex.search(variables[self.srcvar]):
             if debug:
                 logger.debug("Setting variable: %s = %s", self.var_name, self.new_value)
             variables[self.var_name] = self.new_value
 
+    def compile(self, tracker_config):
+        return partial(self.process, tracker_config)
+
 
 class If:
     def __init__(self, srcvar, regex, line_matches):
         self.srcvar = srcvar
-        self.regex = regex
+        self.regex = compile_regex(regex)
         self.line_matches = line_matches
 
+    def regexes(self):
+        return [self.regex] + [r for m in self.line_matches for r in m.regexes()]
+
+    def read_variables(self):
+        return {self.srcvar}.union(*(m.read_variables() for m in self.line_matches))
+
+    def written_variables(self):
+        return set().union(*(m.written_variables() for m in self.line_matches))
+
+    def needed(self, live):
+        line_matches = needed_line_matches(self.line_matches, live)
+        if len(line_matches) == 0:
+            return None
+        return If(self.srcvar, self.regex, line_matches)
+
     def process(self, tracker_config, variables):
         if self.srcvar not in variables:
             logger.warning(
@@ -274,6 +568,24 @@ class If:
             )
             return
 
-        if re.search(self.regex, variables[self.srcvar]):
+        if self.regex.search(variables[self.srcvar]):
             for matched in self.line_matches:
                 matched.process(tracker_config, variables)
+
+    def compile(self, tracker_config):
+        srcvar = self.srcvar
+        search = self.regex.search
+        plan = compile_plan(self.line_matches, tracker_config)
+
+        def if_matched(variables):
+            if srcvar not in variables:
+                logger.warning(
+                    "If: Could not check condition, variable '%s' not found", srcvar
+                )
+                return
+
+            if search(variables[srcvar]):
+                for step in plan:
+                    step(variables)
+
+        return if_matched
@@ -1,13 +1,26 @@
+import json
 import logging
 import re
-from asyncio import Lock
+from asyncio import ensure_future, FIRST_COMPLETED, gather, wait
 
+from arrnounced import startup
 from arrnounced.eventloop_utils import eventloop_util
+from arrnounced.push_queue import PushQueue
 from arrnounced.session_provider import SessionProvider
 
 
 logger = logging.getLogger("BACKEND")
 
+# How announcements are pushed to the backends of a tracker:
+# sequential: One backend at a time until one approves
+# first: All backends at once, the first approval wins
+# all: All backends at once, every approval is kept
+# hedged: One backend at a time, but the next one is also pushed to when a
+#   backend has not answered within hedge_delay seconds. The first approval
+#   wins.
+policy = "sequential"
+hedge_delay = 0.5
+
 
 def _extract_approval(json_response, backend_name):
     try:
@@ -26,12 +39,36 @@ def _extract_approval(json_response, backend_name):
     return False
 
 
+# JSON bodies of an announcement, serialized once for all backends using
+# the same format
+class Bodies:
+    def __init__(self, announcement):
+        self.announcement = announcement
+        self._bodies = {}
+
+    def get(self, backend):
+        body = self._bodies.get(backend.json_format)
+        if body is None:
+            body = json.dumps(backend._create_json(self.announcement)).encode()
+            self._bodies[backend.json_format] = body
+        return body
+
+
 class Backend:
+    json_format = "v1"
+
     def __init__(self, user_backend):
         self.apikey = user_backend.apikey
         self.url = user_backend.url
         self.name = user_backend.name
-        self.lock = Lock()
+        # Limiting pushes also mitigates
+        # https://github.com/Sonarr/Sonarr/issues/2975
+        self.queue = PushQueue(
+            self.name,
+            user_backend.max_pushes,
+            user_backend.push_queue_size,
+            user_backend.push_overflow,
+        )
 
     def _create_json(self, announcement):
         params = {
@@ -43,19 +80,19 @@ class Backend:
 
         return params
 
-    async def _send_notification(self, announcement):
-        # Mitigate https://github.com/Sonarr/Sonarr/issues/2975
-        async with Lock():
-            json_response = await SessionProvider.post(
+    async def _send_notification(self, body):
+        return await self.queue.push(
+            lambda: SessionProvider.post(
                 url=f"{self.url}{self.push_path}",
-                headers={"X-Api-Key": self.apikey},
-                json=self._create_json(announcement),
+                headers={"X-Api-Key": self.apikey, "Content-Type": "application/json"},
+                data=body,
             )
+        )
 
-        return json_response
-
-    async def notify(self, announcement):
-        json_response = await self._send_notification(announcement)
+    async def notify(self, announcement, bodies=None):
+        if bodies is None:
+            bodies = Bodies(announcement)
+        json_response = await self._send_notification(bodies.get(self))
         if not json_response:
             return False
         return _extract_approval(json_response, self.name)
@@ -71,6 +108,7 @@ class Backend:
 
 
 class V3Api(Backend):
+    json_format = "v3"
     push_path_v3 = "/api/v3/release/push"
     diskspace_path_v3 = "/api/v3/diskspace"
     push_path_legacy = "/api/release/push"
@@ -135,9 +173,21 @@ def init(user_backends):
 
 
 async def stop():
+    for backend in _backends.values():
+        await backend.queue.stop()
     await SessionProvider.close_session()
 
 
+def log_statistics():
+    for backend in _backends.values():
+        logger.info(
+            "%s: queue depth: %s, %s",
+            backend.name,
+            backend.queue.depth,
+            backend.queue.statistics,
+        )
+
+
 def get_configured_backends():
     return list(_backends.keys())
 
@@ -163,12 +213,54 @@ def notify_which_backends(tracker, announced_category):
     return notify_backends
 
 
+async def _notify_one(backend, announcement, bodies):
+    approved = await backend.notify(announcement, bodies)
+    if not approved:
+        logger.debug("%s rejected release: %s", backend.name, announcement.title)
+    return backend, approved
+
+
+# Pushes to the backends in order, starting on the next one once a backend
+# rejects or has not answered within delay seconds. A delay of None waits
+# for each answer, 0 pushes to all at once. Pushes still pending once one
+# backend approves are cancelled, though the backend may have received it.
+async def _notify_in_order(announcement, backends, bodies, delay):
+    remaining = list(backends)
+    pending = set()
+    while remaining or pending:
+        if remaining:
+            pending.add(
+                ensure_future(_notify_one(remaining.pop(0), announcement, bodies))
+            )
+        done, pending = await wait(
+            pending,
+            timeout=delay if remaining else None,
+            return_when=FIRST_COMPLETED,
+        )
+        for task in done:
+            backend, approved = task.result()
+            if approved:
+                for other in pending:
+                    other.cancel()
+                return [backend]
+    return []
+
+
+async def _notify_all(announcement, backends, bodies):
+    results = await gather(
+        *(_notify_one(backend, announcement, bodies) for backend in backends)
+    )
+    return [backend for backend, approved in results if approved]
+
+
+# Returns the backends which approved the announcement, as per the policy
 async def notify(announcement, backends):
-    for backend in backends:
-        if await backend.notify(announcement):
-            return backend
+    bodies = Bodies(announcement)
+    if policy == "all":
+        return await _notify_all(announcement, backends, bodies)
 
-    return None
+    delay = {"first": 0, "hedged": hedge_delay}.get(policy)
+    return await _notify_in_order(announcement, backends, bodies, delay)
 
 
 def get_backend(backend_name):
@@ -179,6 +271,13 @@ async def renotify(announcement, backend):
     return await backend.notify(announcement)
 
 
+async def _check_all():
+    with startup.timer.phase("backend checks"):
+        await gather(
+            *(backend.check() for backend in _backends.values()),
+            return_exceptions=True,
+        )
+
+
 def check():
-    for backend in _backends.values():
-        eventloop_util.run(backend.check())
+    eventloop_util.run(_check_all())
@@ -3,14 +3,18 @@ import argparse
 import logging
 import os
 import sys
+import time
 from pathlib import Path
 
 from arrnounced import __version__
 from arrnounced import backend
 from arrnounced import config
-from arrnounced import db
 from arrnounced import log
 from arrnounced import manager
+from arrnounced import regex_lint
+from arrnounced import startup
+from arrnounced import tracker_cache
+from arrnounced.tracker_xml_config import get_tracker_xml_configs
 
 
 def _is_file(path):
@@ -33,6 +37,43 @@ def _validate_args(args):
         sys.exit(1)
 
 
+# Prints findings for the regexes of all XML tracker configs and the worst
+# match time of each tracker. Exits with an error if any regex is too slow.
+def _lint_trackers(args):
+    if not _is_dir(args.trackers):
+        sys.exit(1)
+
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    xml_configs = get_tracker_xml_configs(args.trackers)
+    findings = regex_lint.lint_trackers(xml_configs, fuzz=not args.no_fuzz)
+    for finding in findings:
+        print(finding)
+
+    slow = [f for f in findings if f.message.startswith("Slow match")]
+    print(
+        "Linted {} trackers, {} findings, {} slow regexes".format(
+            len(xml_configs), len(findings), len(slow)
+        )
+    )
+    sys.exit(1 if slow else 0)
+
+
+def _rebuild_tracker_cache(args):
+    if not (_is_dir(args.data) and _is_dir(args.trackers)):
+        sys.exit(1)
+
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    count = tracker_cache.rebuild(args.trackers, args.data)
+    print("Cached {} XML tracker configs".format(count))
+    sys.exit(0)
+
+
+_commands = {
+    "lint-trackers": _lint_trackers,
+    "rebuild-tracker-cache": _rebuild_tracker_cache,
+}
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Arrnounced - Listen for IRC announcements"
@@ -56,6 +97,20 @@ def main():
         default=str(Path.home().joinpath(".arrnounced", "autodl-trackers", "trackers")),
     )
     parser.add_argument("-v", "--verbose", help="Verbose logging", action="store_true")
+    parser.add_argument(
+        "--no-fuzz",
+        help="Only lint-trackers: Skip measuring match time with adversarial input",
+        action="store_true",
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=list(_commands),
+        help="lint-trackers: Check the XML tracker config regexes for "
+        + "catastrophic backtracking instead of running. "
+        + "rebuild-tracker-cache: Parse all XML tracker configs into the cache "
+        + "in the data directory instead of running",
+    )
     parser.add_argument("--version", help="Print version", action="store_true")
 
     try:
@@ -70,8 +125,12 @@ def main():
         print("Arrnounced version", __version__)
         sys.exit(0)
 
+    if args.command is not None:
+        _commands[args.command](args)
+
     _validate_args(args)
 
+    start = time.perf_counter()
     user_config = config.init(args.config)
     if user_config is None:
         sys.exit(1)
@@ -88,10 +147,9 @@ def main():
         sys.exit(1)
 
     backend.init(user_config.backends)
-    if not db.init(args.data):
-        sys.exit(1)
+    startup.timer.done("config", start)
 
-    manager.run(user_config, args.trackers)
+    manager.run(user_config, args.trackers, args.data)
 
 
 if __name__ == "__main__":
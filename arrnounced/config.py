@@ -3,12 +3,15 @@ import io
 import sys
 from tomlkit import parse
 
+from arrnounced.push_queue import overflow_policies
+
 
 backend_urls = {
     "sonarr": "http://localhost:8989",
     "radarr": "http://localhost:7878",
     "lidarr": "http://localhost:8686",
 }
+notify_policies = ["sequential", "first", "all", "hedged"]
 mandatory_tracker_fields = ["irc_nickname", "irc_server", "irc_port", "irc_channels"]
 logger = logging.getLogger("CONFIG")
 
@@ -26,6 +29,21 @@ class UserConfig:
             logger.error("webui: Must set none or both 'username' and 'password'")
             valid = False
 
+        for non_negative in ["match_budget_ms", "workers"]:
+            if self.toml["parser"][non_negative] < 0:
+                logger.error("parser: '%s' must not be negative", non_negative)
+                valid = False
+
+        if self.toml["notify"]["policy"] not in notify_policies:
+            logger.error(
+                "notify: 'policy' must be one of %s", ", ".join(notify_policies)
+            )
+            valid = False
+
+        if self.toml["notify"]["hedge_ms"] < 0:
+            logger.error("notify: 'hedge_ms' must not be negative")
+            valid = False
+
         if len(self.toml["backends"]) == 0:
             logger.error("Must specify at least one backend (Sonarr/Radarr/Lidarr)")
             valid = False
@@ -43,6 +61,22 @@ class UserConfig:
             if not section.get("apikey"):
                 logger.error("backends.%s: Must specify apikey", section_name)
                 valid = False
+            for positive in ["max_pushes", "push_queue_size"]:
+                if section.get(positive) is not None and section.get(positive) < 1:
+                    logger.error(
+                        "backends.%s: '%s' must be at least 1", section_name, positive
+                    )
+                    valid = False
+            if (
+                section.get("push_overflow") is not None
+                and section.get("push_overflow") not in overflow_policies
+            ):
+                logger.error(
+                    "backends.%s: 'push_overflow' must be one of %s",
+                    section_name,
+                    ", ".join(overflow_policies),
+                )
+                valid = False
 
         for section_name, section in self.toml["trackers"].items():
             for mandatory in mandatory_tracker_fields:
@@ -57,6 +91,13 @@ class UserConfig:
                 )
                 valid = False
 
+            for positive in ["multiline_timeout", "multiline_max_pending"]:
+                if section.get(positive) is not None and section.get(positive) < 1:
+                    logger.error(
+                        "trackers.%s: '%s' must be at least 1", section_name, positive
+                    )
+                    valid = False
+
             always_backends = (
                 [b.strip() for b in section.get("notify_backends").split(",")]
                 if section.get("notify_backends")
@@ -100,6 +141,18 @@ class UserConfig:
         def url(self):
             return self.backend.get("url")
 
+        @property
+        def max_pushes(self):
+            return self.backend["max_pushes"]
+
+        @property
+        def push_queue_size(self):
+            return self.backend["push_queue_size"]
+
+        @property
+        def push_overflow(self):
+            return self.backend["push_overflow"]
+
     @property
     def backends(self):
         return [UserConfig.UserBackend(n, b) for n, b in self.toml["backends"].items()]
@@ -128,6 +181,26 @@ class UserConfig:
     def log_to_file(self):
         return self.toml["log"]["to_file"]
 
+    @property
+    def adaptive_order(self):
+        return self.toml["parser"]["adaptive_order"]
+
+    @property
+    def match_budget_ms(self):
+        return self.toml["parser"]["match_budget_ms"]
+
+    @property
+    def parse_workers(self):
+        return self.toml["parser"]["workers"]
+
+    @property
+    def notify_policy(self):
+        return self.toml["notify"]["policy"]
+
+    @property
+    def notify_hedge_ms(self):
+        return self.toml["notify"]["hedge_ms"]
+
     @property
     def webui_host(self):
         return str(self.toml["webui"]["host"])
@@ -202,6 +275,9 @@ def _init_backends(toml_cfg):
             ("url", default_url, None),
             ("type", None, str),
             ("apikey", None, str),
+            ("max_pushes", 1, None),
+            ("push_queue_size", 100, None),
+            ("push_overflow", "block", None),
         ]
         for last_key, default_value, the_type in default_backend_values:
             keys = ["backends", backend_name, last_key]
@@ -220,6 +296,9 @@ def _init_trackers(toml_cfg):
             ("irc_tls_verify", False),
             ("torrent_https", False),
             ("announce_delay", 0),
+            ("multiline_timeout", 15),
+            ("multiline_max_pending", 100),
+            ("pin_pattern_order", False),
             ("category", {}),
             ("settings", {}),
         ]
@@ -278,6 +357,13 @@ def init(config_path):
         (["log"], {}),
         (["log", "to_file"], True),
         (["log", "to_console"], True),
+        (["parser"], {}),
+        (["parser", "adaptive_order"], False),
+        (["parser", "match_budget_ms"], 0),
+        (["parser", "workers"], 0),
+        (["notify"], {}),
+        (["notify", "policy"], "sequential"),
+        (["notify", "hedge_ms"], 500),
         (["backends"], {}),
         (["trackers"], {}),
     ]
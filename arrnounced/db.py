@@ -5,6 +5,7 @@ import threading
 
 from pony.orm import Database, desc, pony, Required, Set
 from pony.orm import db_session  # noqa: F401
+from pony.orm.core import TransactionError  # noqa: F401
 
 logger = logging.getLogger("DB")
 db = Database()
@@ -4,6 +4,7 @@ import re
 
 from arrnounced import irc_modes
 from arrnounced import message_handler
+from arrnounced import startup
 from arrnounced.eventloop_utils import eventloop_util
 
 logger = logging.getLogger("IRC")
@@ -12,16 +13,58 @@ logger = logging.getLogger("IRC")
 def get_connected():
     connected = {}
     for client in clients:
-        connected[client.tracker.config.type] = client.tracker.status.as_dict()
+        for tracker in client.trackers:
+            connected[tracker.config.type] = tracker.status.as_dict()
     return connected
 
 
+# Trackers with the same key share one connection
+def _connection_key(tracker):
+    return (
+        tracker.config.irc_server.lower(),
+        tracker.config.irc_port,
+        tracker.config.irc_tls,
+        tracker.config.irc_nickname,
+    )
+
+
+def _group_trackers(trackers):
+    groups = {}
+    for tracker in trackers:
+        groups.setdefault(_connection_key(tracker), []).append(tracker)
+    return list(groups.values())
+
+
+# One connection for all trackers on the same server with the same nickname.
+# Joins the channels of all trackers and keeps the status of each tracker
+# for the channels it uses.
 class IRC(irc_modes.ModesFixer):
     RECONNECT_MAX_ATTEMPTS = None
 
-    def __init__(self, tracker, event_loop):
-        super().__init__(tracker.config.irc_nickname, eventloop=event_loop)
-        self.tracker = tracker
+    def __init__(self, trackers, event_loop):
+        super().__init__(trackers[0].config.irc_nickname, eventloop=event_loop)
+        self.trackers = trackers
+        self.config = trackers[0].config
+        passwords = {
+            t.config.irc_ident_password
+            for t in trackers
+            if t.config.irc_ident_password is not None
+        }
+        if len(passwords) > 1:
+            logger.warning(
+                "%s: Different irc_ident_password for the same nickname, using one",
+                self.names,
+            )
+        self.ident_password = next(iter(passwords), None)
+
+    @property
+    def names(self):
+        return ", ".join(t.config.short_name for t in self.trackers)
+
+    # Trackers using the channel
+    def _channel_trackers(self, channel):
+        channel = channel.lower()
+        return [t for t in self.trackers if channel in t.config.irc_channels]
 
     async def connect(self, *args, **kwargs):
         try:
@@ -32,31 +75,39 @@ class IRC(irc_modes.ModesFixer):
 
     # Request channel invite or join channel
     async def attempt_join_channel(self):
-        if self.tracker.config.irc_invite_cmd is None:
-            for channel in self.tracker.config.user_channels:
-                logger.info("Joining %s", channel)
-                await self.join(channel)
-        else:
-            logger.info("%s: Requesting invite", self.tracker.config.short_name)
-            await self.message(
-                self.tracker.config.irc_inviter, self.tracker.config.irc_invite_cmd
-            )
+        joined = set()
+        for tracker in self.trackers:
+            if tracker.config.irc_invite_cmd is None:
+                for channel in tracker.config.user_channels:
+                    if channel not in joined:
+                        logger.info("Joining %s", channel)
+                        joined.add(channel)
+                        await self.join(channel)
+            else:
+                logger.info("%s: Requesting invite", tracker.config.short_name)
+                await self.message(
+                    tracker.config.irc_inviter, tracker.config.irc_invite_cmd
+                )
+
+    def _set_connected(self, connected):
+        for tracker in self.trackers:
+            tracker.status.connected = connected
 
     async def on_disconnect(self, expected):
-        self.tracker.status.connected = False
+        self._set_connected(False)
         await super().on_disconnect(expected)
 
     async def on_kill(self, target, by, reason):
-        self.tracker.status.connected = False
+        self._set_connected(False)
         logger.info("KILL: target: %s, by: %s, reason: %s", target, by, reason)
         await super().on_kill(target, by, reason)
 
     async def on_connect(self):
-        logger.info("Connected to: %s", self.tracker.config.irc_server)
-        self.tracker.status.connected = True
+        logger.info("Connected to: %s (%s)", self.config.irc_server, self.names)
+        self._set_connected(True)
         await super().on_connect()
 
-        if self.tracker.config.irc_ident_password is None:
+        if self.ident_password is None:
             await self.attempt_join_channel()
         else:
             logger.info("Identifying with NICKSERV")
@@ -64,7 +115,7 @@ class IRC(irc_modes.ModesFixer):
                 "PRIVMSG",
                 "NICKSERV",
                 "IDENTIFY",
-                self.tracker.config.irc_ident_password,
+                self.ident_password,
             )
 
     async def on_raw(self, message):
@@ -81,11 +132,17 @@ class IRC(irc_modes.ModesFixer):
         await self.attempt_join_channel()
 
     async def on_message(self, target, source, message):
-        await message_handler.on_message(self.tracker, source, target.lower(), message)
+        await message_handler.on_message(
+            self.trackers,
+            self.config.irc_server,
+            source,
+            target.lower(),
+            message,
+        )
 
     async def on_invite(self, channel, by):
         logger.info("%s invited us to join %s", by, channel)
-        if channel in self.tracker.config.irc_channels:
+        if len(self._channel_trackers(channel)) > 0:
             await self.join(channel)
         else:
             logger.warning(
@@ -95,54 +152,53 @@ class IRC(irc_modes.ModesFixer):
 
     async def on_join(self, channel, user):
         await super().on_join(channel, user)
-        if user == self.tracker.config.irc_nickname:
-            self.tracker.status.joined(channel)
+        if user == self.config.irc_nickname:
+            startup.timer.joined()
+            for tracker in self._channel_trackers(channel):
+                tracker.status.joined(channel)
 
     async def on_part(self, channel, user, message=None):
         await super().on_part(channel, user, message)
-        if user == self.tracker.config.irc_nickname:
-            self.tracker.status.parted(channel, message)
+        if user == self.config.irc_nickname:
+            for tracker in self._channel_trackers(channel):
+                tracker.status.parted(channel, message)
 
     async def on_kick(self, channel, user, by, reason=None):
         await super().on_kick(channel, user, by, reason)
-        if user == self.tracker.config.irc_nickname:
-            self.tracker.status.kicked(channel, by, reason)
+        if user == self.config.irc_nickname:
+            for tracker in self._channel_trackers(channel):
+                tracker.status.kicked(channel, by, reason)
+
+    # Trackers using the channel a rejection of us is about
+    def _rejected_trackers(self, message):
+        channel_rejection = _create_channel_rejection(message._raw)
+        if channel_rejection and channel_rejection.user == self.config.irc_nickname:
+            return channel_rejection, self._channel_trackers(channel_rejection.channel)
+        return None, []
 
     # Channel full
     async def on_raw_471(self, message):
-        channel_rejection = _create_channel_rejection(message._raw)
-        if (
-            channel_rejection
-            and channel_rejection.user == self.tracker.config.irc_nickname
-        ):
-            self.tracker.status.channel_full(channel_rejection)
+        channel_rejection, trackers = self._rejected_trackers(message)
+        for tracker in trackers:
+            tracker.status.channel_full(channel_rejection)
 
     # Invite only
     async def on_raw_473(self, message):
-        channel_rejection = _create_channel_rejection(message._raw)
-        if (
-            channel_rejection
-            and channel_rejection.user == self.tracker.config.irc_nickname
-        ):
-            self.tracker.status.invite_only(channel_rejection)
+        channel_rejection, trackers = self._rejected_trackers(message)
+        for tracker in trackers:
+            tracker.status.invite_only(channel_rejection)
 
     # Banned from channel
     async def on_raw_474(self, message):
-        channel_rejection = _create_channel_rejection(message._raw)
-        if (
-            channel_rejection
-            and channel_rejection.user == self.tracker.config.irc_nickname
-        ):
-            self.tracker.status.banned(channel_rejection)
+        channel_rejection, trackers = self._rejected_trackers(message)
+        for tracker in trackers:
+            tracker.status.banned(channel_rejection)
 
     # Bad channel key
     async def on_raw_475(self, message):
-        channel_rejection = _create_channel_rejection(message._raw)
-        if (
-            channel_rejection
-            and channel_rejection.user == self.tracker.config.irc_nickname
-        ):
-            self.tracker.status.bad_channel_key(channel_rejection)
+        channel_rejection, trackers = self._rejected_trackers(message)
+        for tracker in trackers:
+            tracker.status.bad_channel_key(channel_rejection)
 
 
 class ChannelRejection:
@@ -184,27 +240,28 @@ def disconnect_all():
 def run(trackers):
     global pool, clients
 
-    for tracker in trackers.values():
+    for connection_trackers in _group_trackers(trackers.values()):
+        config = connection_trackers[0].config
         logger.info(
             "Connecting to server: %s:%d %s",
-            tracker.config.irc_server,
-            tracker.config.irc_port,
-            ", ".join(tracker.config.user_channels),
+            config.irc_server,
+            config.irc_port,
+            ", ".join(c for t in connection_trackers for c in t.config.user_channels),
         )
 
-        client = IRC(tracker, pool.eventloop)
+        client = IRC(connection_trackers, pool.eventloop)
 
         clients.append(client)
         try:
             pool.connect(
                 client,
-                hostname=tracker.config.irc_server,
-                port=tracker.config.irc_port,
-                tls=tracker.config.irc_tls,
-                tls_verify=tracker.config.irc_tls_verify,
+                hostname=config.irc_server,
+                port=config.irc_port,
+                tls=config.irc_tls,
+                tls_verify=any(t.config.irc_tls_verify for t in connection_trackers),
             )
         except Exception:
-            logger.exception("Error while connecting to: %s", tracker.config.irc_server)
+            logger.exception("Error while connecting to: %s", config.irc_server)
 
     try:
         pool.handle_forever()
@@ -4,17 +4,31 @@ import signal
 import sys
 import threading
 
-from arrnounced import backend, db, irc, webui
+from arrnounced import (
+    announce_parser,
+    backend,
+    irc,
+    parse_executor,
+    pattern_set,
+    routing,
+    startup,
+)
 
 from arrnounced.eventloop_utils import eventloop_util
 from arrnounced.tracker import register_observer, Tracker, TrackerConfig
-from arrnounced.tracker_xml_config import get_tracker_xml_configs
+from arrnounced.tracker_cache import get_tracker_xml_configs
 
 logger = logging.getLogger("MANAGER")
 
 
-def _signal_handler(sig, frame):
+def _shutdown(exit_code):
     logger.info("Shutting down...")
+    announce_parser.log_statistics()
+    parse_executor.log_statistics()
+    backend.log_statistics()
+    parse_executor.stop()
+
+    from arrnounced import db
 
     db.stop()
     irc.disconnect_all()
@@ -24,16 +38,28 @@ def _signal_handler(sig, frame):
     eventloop_util.wait_till_complete()
 
     eventloop_util.stop_eventloop()
-    os._exit(os.EX_OK)
+    os._exit(exit_code)
+
+
+def _signal_handler(sig, frame):
+    _shutdown(os.EX_OK)
 
 
-def _set_latest(tracker):
+def _log_statistics_handler(sig, frame):
+    announce_parser.log_statistics()
+    parse_executor.log_statistics()
+    backend.log_statistics()
+
+
+def _set_latest(db, tracker):
     latest_announcement, latest_snatch = db.get_latest(tracker.config.short_name)
     tracker.status.init_latest(latest_announcement, latest_snatch)
 
 
-def _get_trackers(user_config, tracker_config_path):
-    xml_configs = get_tracker_xml_configs(tracker_config_path)
+def _get_trackers(user_config, tracker_config_path, data_path):
+    xml_configs = get_tracker_xml_configs(
+        tracker_config_path, data_path, [t.type for t in user_config.trackers]
+    )
     trackers = {}
     for user_tracker in user_config.trackers:
         if user_tracker.type not in xml_configs:
@@ -46,7 +72,6 @@ def _get_trackers(user_config, tracker_config_path):
             trackers[user_tracker.type] = Tracker(
                 TrackerConfig(user_tracker, xml_configs[user_tracker.type])
             )
-            _set_latest(trackers[user_tracker.type])
     return trackers
 
 
@@ -66,26 +91,68 @@ def _are_settings_configured(user_tracker, required_settings):
     return configured
 
 
-def run(user_config, tracker_config_path):
-    trackers = _get_trackers(user_config, tracker_config_path)
+# Initializes the database and loads the latest announcement and snatch of
+# each tracker while connecting to IRC, then runs the database purge.
+# Importing pony is part of the initialization.
+def _run_db(user_config, data_path, trackers):
+    with startup.timer.phase("database"):
+        from arrnounced import db
+
+        if not db.init(data_path):
+            _shutdown(1)
+        for tracker in trackers.values():
+            _set_latest(db, tracker)
+    startup.db_ready.set()
+    db.run(user_config)
+
+
+# Flask and Socket.IO are imported while connecting to IRC. Serving waits
+# for the database.
+def _run_webui(user_config):
+    with startup.timer.phase("web ui import"):
+        from arrnounced import webui
+
+    register_observer(webui.update)
+    startup.db_ready.wait()
+    webui.run(user_config)
+
+
+def run(user_config, tracker_config_path, data_path):
+    with startup.timer.phase("trackers"):
+        trackers = _get_trackers(user_config, tracker_config_path, data_path)
     if len(trackers) == 0:
         logger.error("No trackers configured, exiting...")
         sys.exit(1)
 
+    routing.rebuild(trackers.values())
+    announce_parser.adaptive_order = user_config.adaptive_order
+    if user_config.match_budget_ms > 0:
+        pattern_set.match_budget = user_config.match_budget_ms / 1000
+    backend.policy = user_config.notify_policy
+    backend.hedge_delay = user_config.notify_hedge_ms / 1000
+    with startup.timer.phase("parse workers"):
+        parse_executor.start(
+            trackers.values(),
+            user_config.trackers,
+            tracker_config_path,
+            data_path,
+            user_config.parse_workers,
+        )
     signal.signal(signal.SIGINT, _signal_handler)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, _log_statistics_handler)
 
+    # Backend checks run on the IRC event loop once it is started. The IRC
+    # thread is started first as connecting takes the longest.
     backend.check()
-    register_observer(webui.update)
-    db_thread = threading.Thread(target=db.run, args=(user_config,))
-    irc_thread = threading.Thread(target=irc.run, args=(trackers,))
-    webui_thread = threading.Thread(target=webui.run, args=(user_config,))
-
-    db_thread.start()
-    irc_thread.start()
-    webui_thread.start()
-
-    db_thread.join()
-    irc_thread.join()
-    webui_thread.join()
+    threads = [
+        threading.Thread(target=irc.run, args=(trackers,)),
+        threading.Thread(target=_run_db, args=(user_config, data_path, trackers)),
+        threading.Thread(target=_run_webui, args=(user_config,)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
     logger.debug("Threads joined")
@@ -1,10 +1,11 @@
 import asyncio
 import html
 import logging
-from pony.orm.core import TransactionError
 
 from arrnounced import announce_parser
-from arrnounced import db
+from arrnounced import parse_executor
+from arrnounced import routing
+from arrnounced import startup
 from arrnounced import utils
 from arrnounced.announcement import create_announcement
 from arrnounced.backend import notify, notify_which_backends
@@ -12,26 +13,15 @@ from arrnounced.backend import notify, notify_which_backends
 logger = logging.getLogger("MESSAGE_HANDLER")
 
 
-def _is_announcement(source, target, tracker):
-    return (
-        source in tracker.config.announcer_names
-        and target in tracker.config.irc_channels
-    )
-
-
 def _sanitize_message(message):
     message = utils.strip_irc_color_codes(message)
-    message = html.unescape(message)
+    # Most messages contain no character references
+    if "&" in message:
+        message = html.unescape(message)
     return message
 
 
-def _check_and_parse(tracker, source, target, message):
-    if not _is_announcement(source, target, tracker):
-        logger.debug("Message is no announcement")
-        return
-
-    message = _sanitize_message(message)
-
+def _parse(tracker, message):
     variables = announce_parser.parse(tracker, message)
     if variables is None:
         return None
@@ -39,7 +29,18 @@ def _check_and_parse(tracker, source, target, message):
     return create_announcement(tracker, variables)
 
 
-async def _handle_announcement(tracker, announcement):
+# Returns the db module once the database is ready. It is imported here
+# rather than at the top so pony is imported by the database initialization
+# in the background instead of before connecting to IRC.
+async def _get_db():
+    if not startup.db_ready.is_set():
+        await asyncio.get_running_loop().run_in_executor(None, startup.db_ready.wait)
+    from arrnounced import db
+
+    return db
+
+
+async def _handle_announcement(db, tracker, announcement):
     backends = notify_which_backends(tracker, announcement.category)
 
     backends_string = (
@@ -64,27 +65,46 @@ async def _handle_announcement(tracker, announcement):
         announcement.title,
     )
 
-    backend = await notify(announcement, backends)
+    approved = await notify(announcement, backends)
 
-    if backend is None:
+    if len(approved) == 0:
         # TODO Print rejection reason
         logger.debug("Release was rejected: %s", announcement.title)
     else:
         announcement.snatched()
-        logger.info("%s approved release: %s", backend.name, announcement.title)
         with db.db_session:
             db_announced = db.get_announcement(db_announced.id)
-            db.insert_snatched(db_announced, announcement.snatch_date, backend.name)
+            for backend in approved:
+                logger.info("%s approved release: %s", backend.name, announcement.title)
+                db.insert_snatched(db_announced, announcement.snatch_date, backend.name)
 
     tracker.status.latest_announcement = announcement
 
 
-async def on_message(tracker, source, target, message):
-    announcement = _check_and_parse(tracker, source, target, message)
-    if announcement is None:
+# Returns the trackers, of those given, which the message shall be parsed for
+def _route(trackers, server, source, target):
+    return [t for t in routing.route(server, target, source) if t in trackers]
+
+
+# Handles a message received on the server by a client for the given trackers
+async def on_message(trackers, server, source, target, message):
+    routed = _route(trackers, server, source, target)
+    if len(routed) == 0:
+        logger.debug("Message is no announcement")
         return
 
-    try:
-        await _handle_announcement(tracker, announcement)
-    except TransactionError:
-        logger.exception("Database transaction failed for %s", announcement.title)
+    message = _sanitize_message(message)
+
+    for tracker in routed:
+        if parse_executor.is_pooled(tracker):
+            announcement = await parse_executor.parse(tracker, message)
+        else:
+            announcement = _parse(tracker, message)
+        if announcement is None:
+            continue
+
+        db = await _get_db()
+        try:
+            await _handle_announcement(db, tracker, announcement)
+        except db.TransactionError:
+            logger.exception("Database transaction failed for %s", announcement.title)
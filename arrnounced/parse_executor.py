@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from arrnounced import announce_parser, pattern_set, tracker_cache
+from arrnounced.announcement import create_announcement
+from arrnounced.config import UserConfig
+from arrnounced.tracker import Tracker, TrackerConfig
+
+logger = logging.getLogger("PARSE_EXECUTOR")
+
+# Optionally parses messages of single line trackers in worker processes,
+# keeping the regex work off the IRC event loop. Each worker loads its own
+# copy of the tracker configs at start. Multiline trackers keep state
+# between messages and are always parsed on the event loop.
+_executor = None
+_pooled_types = frozenset()
+_queue_depth = 0
+_max_queue_depth = 0
+_workers = {}
+
+# Trackers of a worker process, by type
+_worker_trackers = {}
+
+
+class WorkerStatistics:
+    def __init__(self):
+        self.messages = 0
+        self.busy = 0.0
+
+    def __str__(self):
+        rate = self.messages / self.busy if self.busy > 0 else 0
+        return "messages: {}, busy: {:.1f} s, {:.0f} messages/s".format(
+            self.messages, self.busy, rate
+        )
+
+
+def _init_worker(
+    tracker_config_path, data_path, user_trackers, adaptive_order, match_budget
+):
+    # Shutdown is handled by the main process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    announce_parser.adaptive_order = adaptive_order
+    pattern_set.match_budget = match_budget
+
+    xml_configs = tracker_cache.get_tracker_xml_configs(
+        tracker_config_path, data_path, [t for t, _ in user_trackers]
+    )
+    for tracker_type, user_tracker in user_trackers:
+        _worker_trackers[tracker_type] = Tracker(
+            TrackerConfig(
+                UserConfig.UserTracker(tracker_type, user_tracker),
+                xml_configs[tracker_type],
+            )
+        )
+
+
+def _ready():
+    return os.getpid()
+
+
+def _outcomes(tracker_statistics):
+    return (
+        tracker_statistics.matched,
+        tracker_statistics.ignored,
+        tracker_statistics.unmatched,
+    )
+
+
+# Runs in a worker. Returns the announcement, if any, the parse outcome to
+# count in the main process, the worker's pid and the time spent.
+def _parse_in_worker(tracker_type, message):
+    start = time.perf_counter()
+    tracker = _worker_trackers[tracker_type]
+    tracker_statistics = announce_parser.get_statistics(tracker_type)
+    before = _outcomes(tracker_statistics)
+
+    announcement = None
+    variables = announce_parser.parse(tracker, message)
+    if variables is not None:
+        announcement = create_announcement(tracker, variables)
+
+    outcome = tuple(a - b for a, b in zip(_outcomes(tracker_statistics), before))
+    return announcement, outcome, os.getpid(), time.perf_counter() - start
+
+
+# Starts the given number of workers for the trackers without multiline
+# patterns. No workers means all messages are parsed on the event loop.
+def start(trackers, user_trackers, tracker_config_path, data_path, workers):
+    global _executor, _pooled_types
+    pooled_types = {t.config.type for t in trackers if not t.config.multiline_patterns}
+    if workers < 1 or not pooled_types:
+        return
+
+    _executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            tracker_config_path,
+            data_path,
+            [(u.type, u.tracker) for u in user_trackers if u.type in pooled_types],
+            announce_parser.adaptive_order,
+            pattern_set.match_budget,
+        ),
+    )
+
+    # Workers are started right away, before any other threads, and a worker
+    # failing to load the tracker configs is found at startup
+    try:
+        for future in wait([_executor.submit(_ready) for _ in range(workers)]).done:
+            future.result()
+    except BrokenProcessPool:
+        logger.exception("Parse workers failed to start, parsing on the event loop")
+        stop()
+        return
+
+    _pooled_types = frozenset(pooled_types)
+    logger.info(
+        "Parsing messages of %s trackers in %s worker processes",
+        len(_pooled_types),
+        workers,
+    )
+
+
+def stop():
+    global _executor, _pooled_types
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+    _pooled_types = frozenset()
+
+
+def is_pooled(tracker):
+    return tracker.config.type in _pooled_types
+
+
+def _count(tracker_type, outcome, pid, busy):
+    tracker_statistics = announce_parser.get_statistics(tracker_type)
+    tracker_statistics.matched += outcome[0]
+    tracker_statistics.ignored += outcome[1]
+    tracker_statistics.unmatched += outcome[2]
+
+    worker = _workers.setdefault(pid, WorkerStatistics())
+    worker.messages += 1
+    worker.busy += busy
+
+
+# Parses the message in a worker, returns the announcement or None
+async def parse(tracker, message):
+    global _queue_depth, _max_queue_depth
+    _queue_depth += 1
+    _max_queue_depth = max(_max_queue_depth, _queue_depth)
+    try:
+        (
+            announcement,
+            outcome,
+            pid,
+            busy,
+        ) = await asyncio.get_running_loop().run_in_executor(
+            _executor, _parse_in_worker, tracker.config.type, message
+        )
+    finally:
+        _queue_depth -= 1
+
+    _count(tracker.config.type, outcome, pid, busy)
+    return announcement
+
+
+def log_statistics():
+    if _executor is None:
+        return
+
+    logger.info(
+        "Parse queue depth: %s, max queue depth: %s", _queue_depth, _max_queue_depth
+    )
+    for pid, worker in sorted(_workers.items()):
+        logger.info("Parse worker %s: %s", pid, worker)
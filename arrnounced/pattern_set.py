@@ -0,0 +1,423 @@
+import logging
+import re
+import time
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+logger = logging.getLogger("PATTERN_SET")
+
+# Check every prefilter rejection with the regex itself and log an error if
+# the regex would have matched. Meant for testing, slows down parsing.
+verify_prefilter = False
+# Seconds a pattern may take to match a message before it is quarantined, i.e.
+# no longer evaluated. None means no budget.
+match_budget = None
+
+_default_flags = re.compile("").flags
+_group_references = (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+_beginning_anchors = (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING)
+_repeats = tuple(
+    getattr(sre_parse, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, op)
+)
+
+
+def _children(av):
+    if isinstance(av, sre_parse.SubPattern):
+        yield av
+    elif isinstance(av, (tuple, list)):
+        for child in av:
+            yield from _children(child)
+
+
+# Yields all (op, av) of a parsed regex, including nested sub patterns
+def walk(parsed):
+    for op, av in parsed:
+        yield op, av
+        for child in _children(av):
+            yield from walk(child)
+
+
+def parse_regex(regex):
+    return sre_parse.parse(regex.pattern, regex.flags)
+
+
+# A pattern can be merged with others into one alternation unless it depends
+# on its own group numbering or flags. I.e. backreferences, conditionals,
+# named groups, inline global flags (or any other non default flags) and
+# more variable names than regex groups.
+def is_fusable(regex, group_count=0):
+    if regex.flags != _default_flags or regex.groupindex:
+        return False
+    if group_count > regex.groups:
+        return False
+    return not any(op in _group_references for op, _ in walk(parse_regex(regex)))
+
+
+def _collect_literals(parsed, literals):
+    run = []
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+
+        literals.append("".join(run))
+        run = []
+        # Groups and repeats of at least one are always part of the match
+        if op == sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+            _collect_literals(av[-1], literals)
+        elif op in _repeats and av[0] > 0:
+            _collect_literals(av[2], literals)
+        elif op == getattr(sre_parse, "ATOMIC_GROUP", None):
+            _collect_literals(av, literals)
+    literals.append("".join(run))
+
+
+# Returns strings which are part of every string the regex can match,
+# longest first. Alternations, character sets, optional parts, lookarounds
+# and case insensitive parts are skipped.
+def required_literals(regex):
+    if regex.flags & re.IGNORECASE:
+        return []
+
+    literals = []
+    _collect_literals(parse_regex(regex), literals)
+    unique = dict.fromkeys(lit for lit in literals if len(lit) > 1)
+    return sorted(unique, key=len, reverse=True)
+
+
+# The literal used to prefilter strings for the regex. A string which does
+# not contain it cannot match. None if the regex has no required literal or
+# if it starts with an anchored literal, as the regex engine rejects
+# non matching strings as fast as the prefilter would.
+def prefilter_literal(regex):
+    parsed = parse_regex(regex)
+    if (
+        len(parsed) > 1
+        and parsed[0][0] == sre_parse.AT
+        and parsed[0][1] in _beginning_anchors
+        and parsed[1][0] == sre_parse.LITERAL
+    ):
+        return None
+
+    literals = required_literals(regex)
+    return literals[0] if literals else None
+
+
+# Called when the prefilter literal is missing in a string. True, i.e. the
+# regex cannot match, unless verification finds the regex does match.
+def prefilter_rejects(literal, regex, string):
+    if verify_prefilter and regex.search(string):
+        logger.error(
+            "Prefilter '%s' rejected matching string '%s' for regex '%s'",
+            literal,
+            string,
+            regex.pattern,
+        )
+        return False
+    return True
+
+
+# Returns the strings which the prefilter rejects but the regex matches
+def check_prefilter(regex, strings):
+    literals = required_literals(regex)
+    return [
+        s
+        for s in strings
+        if regex.search(s) and not all(literal in s for literal in literals)
+    ]
+
+
+# Literals for prefiltering a group of regexes. Empty if any of the regexes
+# lacks a literal, then the group cannot be prefiltered.
+def _group_literals(regexes):
+    literals = tuple(prefilter_literal(r) for r in regexes)
+    return () if None in literals else literals
+
+
+# True if none of the literals are found, i.e. none of the regexes can match
+def _all_rejected(literals, regexes, string):
+    for literal in literals:
+        if literal in string:
+            return False
+    for literal, regex in zip(literals, regexes):
+        if not prefilter_rejects(literal, regex, string):
+            return False
+    return True
+
+
+def _is_anchored(regex):
+    parsed = parse_regex(regex)
+    return (
+        len(parsed) > 0
+        and parsed[0][0] == sre_parse.AT
+        and parsed[0][1] in _beginning_anchors
+    )
+
+
+# The literal a regex requires at the start of a string, empty if none
+def anchored_prefix(regex):
+    if regex.flags != _default_flags or not _is_anchored(regex):
+        return ""
+
+    prefix = []
+    for op, av in list(parse_regex(regex))[1:]:
+        if op != sre_parse.LITERAL:
+            break
+        prefix.append(chr(av))
+    return "".join(prefix)
+
+
+def _disjoint_prefixes(prefix_a, prefix_b):
+    return (
+        bool(prefix_a)
+        and bool(prefix_b)
+        and not prefix_a.startswith(prefix_b)
+        and not prefix_b.startswith(prefix_a)
+    )
+
+
+# True if no string can match both regexes, i.e. both require a different
+# literal at the start of the string
+def are_disjoint(regex_a, regex_b):
+    return _disjoint_prefixes(anchored_prefix(regex_a), anchored_prefix(regex_b))
+
+
+# Returns the indexes of the regexes ordered by descending hits. A regex is
+# only put in front of an earlier one if the two are disjoint, so that the
+# first matching regex is the same in both orders for any string.
+def hit_order(regexes, hits):
+    prefixes = [anchored_prefix(r) for r in regexes]
+    remaining = list(range(len(regexes)))
+    order = []
+    while remaining:
+        movable = [
+            i
+            for position, i in enumerate(remaining)
+            if all(
+                _disjoint_prefixes(prefixes[j], prefixes[i])
+                for j in remaining[:position]
+            )
+        ]
+        best = max(movable, key=lambda i: hits.get(i, 0))
+        order.append(best)
+        remaining.remove(best)
+    return order
+
+
+# A lookahead which, matched at the start of a message, searches the whole
+# message for the regex
+def _lookahead(regex):
+    prefix = "" if _is_anchored(regex) else r"[\s\S]*?"
+    return "(?={}(?:{}))".format(prefix, regex.pattern)
+
+
+# Each branch is a lookahead which searches the whole message for the
+# pattern, followed by an empty marker group telling which branch matched.
+# The alternation tries the branches in order so the first pattern in the
+# list which matches anywhere in the message wins, just like searching the
+# patterns one by one.
+def fuse_regexes(regexes):
+    branches = []
+    markers = {}
+    group_offset = 0
+    for i, regex in enumerate(regexes):
+        branches.append(_lookahead(regex) + "()")
+        markers[group_offset + regex.groups + 1] = (i, group_offset)
+        group_offset += regex.groups + 1
+    return re.compile("(?:{})".format("|".join(branches))), markers
+
+
+class _SingleSegment:
+    def __init__(self, index, extract):
+        self.index = index
+        self.extract = extract
+        self.indexes = [index]
+
+    def match(self, message):
+        match_groups = self.extract.process_string(message)
+        if match_groups is None:
+            return -1, None
+        return self.index, match_groups
+
+
+class _FusedSegment:
+    def __init__(self, indexed_extracts):
+        self.indexes = [index for index, _ in indexed_extracts]
+        self.extracts = {}
+        self.regexes = [e.regex for _, e in indexed_extracts]
+        self.literals = _group_literals(self.regexes)
+        self.regex, markers = fuse_regexes(self.regexes)
+        for marker, (i, offset) in markers.items():
+            index, extract = indexed_extracts[i]
+            self.extracts[marker] = (index, extract, offset)
+
+    def match(self, message):
+        if self.literals and _all_rejected(self.literals, self.regexes, message):
+            return -1, None
+
+        matches = self.regex.match(message)
+        if matches is None:
+            return -1, None
+        index, extract, offset = self.extracts[matches.lastindex]
+        return index, extract.get_match_groups(matches, offset)
+
+
+# Matches a message against a list of Extract patterns and returns the index
+# and variables of the first matching pattern. Consecutive patterns which can
+# be fused are evaluated with one regex, the rest are tried one by one.
+# Patterns whose required literals are missing in the message are skipped.
+# The patterns are evaluated in list order unless reordered.
+class PatternSet:
+    def __init__(self, extracts):
+        self.extracts = extracts
+        self.unfused = set()
+        self.quarantined = set()
+        self.reorder(range(len(extracts)))
+
+    # Evaluate the patterns in the given order of indexes. The returned index
+    # of a matching pattern is still its position in the list.
+    def reorder(self, order):
+        self.order = list(order)
+        self.segments = []
+
+        fusable = []
+        for index in self.order:
+            if index in self.quarantined:
+                continue
+            extract = self.extracts[index]
+            if index not in self.unfused and is_fusable(
+                extract.regex, len(extract.groups)
+            ):
+                fusable.append((index, extract))
+            else:
+                logger.debug("Pattern cannot be fused: %s", extract.regex.pattern)
+                self._add_fused(fusable)
+                fusable = []
+                self.segments.append(_SingleSegment(index, extract))
+        self._add_fused(fusable)
+
+    def _add_fused(self, indexed_extracts):
+        if len(indexed_extracts) == 1:
+            self.segments.append(_SingleSegment(*indexed_extracts[0]))
+        elif len(indexed_extracts) > 1:
+            self.segments.append(_FusedSegment(indexed_extracts))
+
+    def __len__(self):
+        return len(self.extracts)
+
+    # Returns -1 and an empty dictionary when no pattern matched
+    def match(self, message):
+        for segment in self.segments:
+            if match_budget is None:
+                index, match_groups = segment.match(message)
+            else:
+                index, match_groups = self._budgeted_match(segment, message)
+            if index != -1:
+                return index, match_groups
+        return -1, {}
+
+    # A regex cannot be interrupted so a slow match is only detected once it
+    # has completed. Fused patterns over budget are split up to find the slow
+    # pattern next time, a single pattern over budget is quarantined.
+    def _budgeted_match(self, segment, message):
+        start = time.perf_counter()
+        result = segment.match(message)
+        elapsed = time.perf_counter() - start
+        if elapsed > match_budget:
+            if len(segment.indexes) > 1:
+                logger.warning(
+                    "Patterns took %.0f ms to match, evaluating them separately",
+                    elapsed * 1000,
+                )
+                self.unfused.update(segment.indexes)
+            else:
+                logger.error(
+                    "Pattern took %.0f ms to match, quarantined: %s",
+                    elapsed * 1000,
+                    self.extracts[segment.indexes[0]].regex.pattern,
+                )
+                self.quarantined.update(segment.indexes)
+            self.reorder(self.order)
+        return result
+
+
+def _prefiltered(regexes, match):
+    literals = _group_literals(regexes)
+    if not literals:
+        return match
+
+    def prefiltered_match(message):
+        if _all_rejected(literals, regexes, message):
+            return None
+        return match(message)
+
+    return prefiltered_match
+
+
+# Returns functions which are true if the message matches any of the regexes
+def _any_matchers(regexes):
+    fusable = [r for r in regexes if is_fusable(r)]
+    unfusable = [r for r in regexes if not is_fusable(r)]
+    if len(fusable) > 1:
+        fused = re.compile("|".join("(?:{})".format(r.pattern) for r in fusable))
+        matchers = [_prefiltered(fusable, fused.search)]
+    else:
+        matchers = [_prefiltered([r], r.search) for r in fusable]
+    return matchers + [_prefiltered([r], r.search) for r in unfusable]
+
+
+# Returns functions which all are true if the message matches all regexes.
+# The first function rejects messages missing any of the prefilter literals.
+def _all_matchers(regexes):
+    matchers = []
+    prefilters = [
+        (prefilter_literal(r), r) for r in regexes if prefilter_literal(r) is not None
+    ]
+
+    def all_literals_found(message):
+        for literal, regex in prefilters:
+            if literal not in message and prefilter_rejects(literal, regex, message):
+                return False
+        return True
+
+    if prefilters:
+        matchers.append(all_literals_found)
+
+    fusable = [r for r in regexes if is_fusable(r)]
+    if len(fusable) > 1:
+        matchers.append(re.compile("".join(_lookahead(r) for r in fusable)).match)
+    else:
+        matchers.extend(r.search for r in fusable)
+    return matchers + [r.search for r in regexes if not is_fusable(r)]
+
+
+# Decides whether a message shall be ignored. A message is ignored if it
+# matches any of the expected ignore regexes or if it does not match one of
+# the unexpected. Each of the two groups is evaluated with one fused regex,
+# except for regexes which cannot be fused. Regexes are only evaluated if
+# the message contains their required literals.
+class IgnoreSet:
+    def __init__(self, ignores):
+        self.ignores = ignores
+        self._expected = _any_matchers([i.regex for i in ignores if i.expected])
+        self._unexpected = _all_matchers([i.regex for i in ignores if not i.expected])
+
+    def __len__(self):
+        return len(self.ignores)
+
+    # Index of the first expected ignore matching the message, -1 if none
+    def expected_index(self, message):
+        for index, ignore in enumerate(self.ignores):
+            if ignore.expected and ignore.regex.search(message):
+                return index
+        return -1
+
+    def ignore(self, message):
+        return any(matcher(message) for matcher in self._expected) or not all(
+            matcher(message) for matcher in self._unexpected
+        )
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("PUSH_QUEUE")
+
+overflow_policies = ["block", "drop_oldest", "reject"]
+
+
+class PushStatistics:
+    def __init__(self):
+        self.pushes = 0
+        self.max_depth = 0
+        self.wait = 0.0
+        self.max_wait = 0.0
+        self.dropped = 0
+        self.rejected = 0
+
+    def __str__(self):
+        mean_wait = self.wait / self.pushes if self.pushes > 0 else 0
+        return (
+            "pushes: {}, max queue depth: {}, mean wait: {:.0f} ms, "
+            + "max wait: {:.0f} ms, dropped: {}, rejected: {}"
+        ).format(
+            self.pushes,
+            self.max_depth,
+            mean_wait * 1000,
+            self.max_wait * 1000,
+            self.dropped,
+            self.rejected,
+        )
+
+
+class _Push:
+    def __init__(self, send):
+        self.send = send
+        self.queued = time.perf_counter()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+# Limits the pushes in flight to one backend. Pushes wait in a bounded queue
+# for one of max_pushes workers. When the queue is full a new push waits for
+# room (block), replaces the oldest waiting push (drop_oldest) or is not
+# made (reject). A push not made returns None like a failed request.
+#
+# The queue and workers are created on first use, on the event loop
+# running the pushes.
+class PushQueue:
+    def __init__(self, name, max_pushes, size, overflow):
+        self.name = name
+        self.max_pushes = max_pushes
+        self.size = size
+        self.overflow = overflow
+        self.statistics = PushStatistics()
+        self._queue = None
+        self._workers = []
+
+    @property
+    def depth(self):
+        return 0 if self._queue is None else self._queue.qsize()
+
+    def _start(self):
+        self._queue = asyncio.Queue(maxsize=self.size)
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(self.max_pushes)
+        ]
+
+    async def _work(self):
+        while True:
+            push = await self._queue.get()
+            try:
+                # The pusher is no longer waiting for the result
+                if push.future.done():
+                    continue
+
+                wait = time.perf_counter() - push.queued
+                self.statistics.pushes += 1
+                self.statistics.wait += wait
+                self.statistics.max_wait = max(self.statistics.max_wait, wait)
+                try:
+                    result = await push.send()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if not push.future.done():
+                        push.future.set_exception(e)
+                else:
+                    if not push.future.done():
+                        push.future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _put(self, push):
+        if not self._queue.full() or self.overflow == "block":
+            await self._queue.put(push)
+            return True
+
+        if self.overflow == "drop_oldest":
+            oldest = self._queue.get_nowait()
+            self._queue.task_done()
+            if not oldest.future.done():
+                oldest.future.set_result(None)
+            self.statistics.dropped += 1
+            logger.warning("%s: Push queue full, dropped oldest push", self.name)
+            self._queue.put_nowait(push)
+            return True
+
+        self.statistics.rejected += 1
+        logger.warning("%s: Push queue full, rejected push", self.name)
+        return False
+
+    # Returns the result of awaiting send() once a worker is free
+    async def push(self, send):
+        if self._queue is None:
+            self._start()
+
+        push = _Push(send)
+        if not await self._put(push):
+            return None
+        self.statistics.max_depth = max(self.statistics.max_depth, self.depth)
+        return await push.future
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._queue = None
@@ -0,0 +1,229 @@
+import logging
+import string
+import time
+
+from arrnounced.pattern_set import parse_regex, walk
+
+try:
+    import re._constants as sre_constants  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_constants
+
+logger = logging.getLogger("REGEX_LINT")
+
+# IRC messages are at most 512 bytes, longer input is never matched
+max_input_length = 512
+# A regex taking longer than this many seconds for one input is too slow
+max_match_time = 0.01
+
+_repeats = tuple(
+    getattr(sre_constants, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, op)
+)
+_alphabet = frozenset(string.printable)
+_categories = {
+    sre_constants.CATEGORY_DIGIT: str.isdigit,
+    sre_constants.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_constants.CATEGORY_SPACE: str.isspace,
+    sre_constants.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_constants.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_constants.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+# Characters to build adversarial input from, besides the regex's literals
+_fuzz_characters = "a1 .-_/"
+# Ends each adversarial input. Control characters are stripped from IRC
+# messages so no regex is expected to match it.
+_fuzz_end = "\x00"
+
+
+class Finding:
+    def __init__(self, tracker_type, location, regex, message):
+        self.tracker_type = tracker_type
+        self.location = location
+        self.regex = regex
+        self.message = message
+
+    def __str__(self):
+        return "{}: {}: {}: {}".format(
+            self.tracker_type, self.location, self.message, self.regex.pattern
+        )
+
+
+# All regexes of a tracker XML config with their location in the XML
+def tracker_regexes(xml_config):
+    for i, extract in enumerate(xml_config.line_patterns):
+        yield "linepatterns[{}]".format(i), extract.regex
+    for i, extract in enumerate(xml_config.multiline_patterns):
+        yield "multilinepatterns[{}]".format(i), extract.regex
+    for i, line_match in enumerate(xml_config.line_matched):
+        for regex in line_match.regexes():
+            yield "linematched[{}]".format(i), regex
+    for i, ignore in enumerate(xml_config.ignores):
+        yield "ignore[{}]".format(i), ignore.regex
+
+
+def _in_set(items, char):
+    negate = False
+    found = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            found = found or chr(av) == char
+        elif op == sre_constants.RANGE:
+            found = found or av[0] <= ord(char) <= av[1]
+        elif op == sre_constants.CATEGORY:
+            found = found or _categories.get(av, lambda c: True)(char)
+    return found != negate
+
+
+# Returns the printable characters a match of the item may start with and
+# whether the item may match the empty string. Unknown items may start with
+# any character, which errs on the side of reporting ambiguity.
+def _item_first(op, av):  # noqa: C901
+    if op == sre_constants.LITERAL:
+        return {chr(av)}, False
+    elif op == sre_constants.NOT_LITERAL:
+        return _alphabet - {chr(av)}, False
+    elif op == sre_constants.ANY:
+        return set(_alphabet), False
+    elif op == sre_constants.IN:
+        return {c for c in _alphabet if _in_set(av, c)}, False
+    elif op == sre_constants.SUBPATTERN:
+        return _first(av[-1])
+    elif op == getattr(sre_constants, "ATOMIC_GROUP", None):
+        return _first(av)
+    elif op in _repeats:
+        chars, nullable = _first(av[2])
+        return chars, nullable or av[0] == 0
+    elif op == sre_constants.BRANCH:
+        firsts = [_first(branch) for branch in av[1]]
+        return set().union(*(f[0] for f in firsts)), any(f[1] for f in firsts)
+    elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return set(), True
+    return set(_alphabet), True
+
+
+def _first(parsed):
+    chars = set()
+    for op, av in parsed:
+        item_chars, nullable = _item_first(op, av)
+        chars |= item_chars
+        if not nullable:
+            return chars, False
+    return chars, True
+
+
+def _is_repeated(op, av):
+    return op in _repeats and av[1] > 1 and av[0] != av[1]
+
+
+# A repeated group containing another repeat, e.g. (a+)+, can match a string
+# in exponentially many ways
+def has_nested_quantifiers(regex):
+    for op, av in walk(parse_regex(regex)):
+        if _is_repeated(op, av) and any(
+            _is_repeated(inner_op, inner_av) for inner_op, inner_av in walk(av[2])
+        ):
+            return True
+    return False
+
+
+# A repeated alternation whose branches may start with the same character,
+# e.g. (\w+|\d+)*, can match a string in exponentially many ways
+def has_ambiguous_alternation(regex):
+    for op, av in walk(parse_regex(regex)):
+        if not _is_repeated(op, av):
+            continue
+        for inner_op, inner_av in walk(av[2]):
+            if inner_op != sre_constants.BRANCH:
+                continue
+            firsts = [_first(branch)[0] for branch in inner_av[1]]
+            for i, chars in enumerate(firsts):
+                if any(chars & other for other in firsts[i + 1 :]):
+                    return True
+    return False
+
+
+def _fuzz_alphabet(regex):
+    characters = dict.fromkeys(_fuzz_characters)
+    for op, av in walk(parse_regex(regex)):
+        if op == sre_constants.LITERAL:
+            characters[chr(av)] = None
+    return list(characters)
+
+
+def _fuzz_lengths():
+    length = 4
+    while length < max_input_length:
+        yield length
+        length = int(length * 1.25) + 1
+    yield max_input_length
+
+
+# Adversarial inputs for the regex of the given length, repetitions of one or
+# two characters which occur in the regex followed by a character no regex
+# is expected to match
+def fuzz_inputs(regex, length):
+    alphabet = _fuzz_alphabet(regex)
+    for first in alphabet:
+        for second in alphabet:
+            yield ((first + second) * length)[:length] + _fuzz_end
+
+
+# Returns the worst match time in seconds and the input giving it. Inputs
+# grow up to max_input_length but growing stops once a match takes longer
+# than max_match_time, as the next length could take hours to match.
+def worst_match_time(regex):
+    worst_time = 0.0
+    worst_input = ""
+    for length in _fuzz_lengths():
+        for fuzz_input in fuzz_inputs(regex, length):
+            start = time.perf_counter()
+            regex.search(fuzz_input)
+            elapsed = time.perf_counter() - start
+            if elapsed > worst_time:
+                worst_time = elapsed
+                worst_input = fuzz_input
+        if worst_time > max_match_time:
+            break
+    return worst_time, worst_input
+
+
+def lint_regex(tracker_type, location, regex, fuzz=True):
+    findings = []
+    if has_nested_quantifiers(regex):
+        findings.append(Finding(tracker_type, location, regex, "Nested quantifiers"))
+    if has_ambiguous_alternation(regex):
+        findings.append(
+            Finding(tracker_type, location, regex, "Ambiguous repeated alternation")
+        )
+    if fuzz:
+        match_time, fuzz_input = worst_match_time(regex)
+        if match_time > max_match_time:
+            findings.append(
+                Finding(
+                    tracker_type,
+                    location,
+                    regex,
+                    "Slow match, {:.0f} ms for input of length {}".format(
+                        match_time * 1000, len(fuzz_input)
+                    ),
+                )
+            )
+    return findings
+
+
+# Returns the findings for all regexes of the XML configs. Regexes shared by
+# several trackers are only fuzzed once.
+def lint_trackers(xml_configs, fuzz=True):
+    findings = []
+    fuzzed = set()
+    for tracker_type, xml_config in sorted(xml_configs.items()):
+        for location, regex in tracker_regexes(xml_config):
+            findings.extend(
+                lint_regex(tracker_type, location, regex, fuzz and regex not in fuzzed)
+            )
+            fuzzed.add(regex)
+    return findings
@@ -0,0 +1,31 @@
+import logging
+
+logger = logging.getLogger("ROUTING")
+
+# Trackers to parse a message, keyed by normalized (server, channel, nick) of
+# the announcer
+_routes = {}
+
+
+def _key(server, channel, nick):
+    return server.lower(), channel.lower(), nick.lower()
+
+
+# Replaces the routes with those of the given trackers. Must be called
+# whenever the tracker configurations change.
+def rebuild(trackers):
+    global _routes
+    routes = {}
+    for tracker in trackers:
+        for channel in tracker.config.irc_channels:
+            for announcer in tracker.config.announcer_names:
+                key = _key(tracker.config.irc_server, channel, announcer)
+                routes.setdefault(key, []).append(tracker)
+
+    _routes = {key: tuple(trackers) for key, trackers in routes.items()}
+    logger.debug("Routing index rebuilt with %d routes", len(_routes))
+
+
+# Returns the trackers announcing from nick in the channel on the server
+def route(server, channel, nick):
+    return _routes.get(_key(server, channel, nick), ())
@@ -19,12 +19,12 @@ class SessionProvider:
             await cls.session.close()
 
     @staticmethod
-    async def post(url, headers, json):
+    async def post(url, headers, data):
         try:
             async with SessionProvider.get_session().post(
                 url,
                 headers=headers,
-                json=json,
+                data=data,
             ) as http_response:
                 return await http_response.json()
         except OSError:
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("STARTUP")
+
+# Set once the database is initialized and the latest announcement and
+# snatch of each tracker are loaded. The database is initialized in the
+# background while connecting to IRC.
+db_ready = threading.Event()
+
+
+# Times the phases of the startup. Phases may run concurrently in different
+# threads. Times are relative to when this module is first imported, early
+# in the process start. The breakdown of all phases done by then is logged
+# once the first channel is joined, phases done later are logged as they
+# finish.
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+        self.first_join = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.done(name, start)
+
+    def done(self, name, start):
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, start - self.start, now - start))
+            first_join = self.first_join
+        logger.debug("Phase %s took %.0f ms", name, (now - start) * 1000)
+        if first_join is not None:
+            logger.info(
+                "Startup phase %s finished after first join: %.0f ms",
+                name,
+                (now - start) * 1000,
+            )
+
+    def joined(self):
+        with self._lock:
+            if self.first_join is not None:
+                return
+            self.first_join = time.perf_counter() - self.start
+            phases = list(self.phases)
+
+        logger.info(
+            "First channel joined %.0f ms into startup: %s",
+            self.first_join * 1000,
+            ", ".join(
+                "{} {:.0f} ms (at {:.0f} ms)".format(name, elapsed * 1000, at * 1000)
+                for name, at, elapsed in sorted(phases, key=lambda p: p[1])
+            ),
+        )
+
+
+timer = StartupTimer()
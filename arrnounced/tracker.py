@@ -1,3 +1,11 @@
+from types import MappingProxyType
+
+from arrnounced.announcement import (
+    compile_plan,
+    consumed_variables,
+    needed_line_matches,
+)
+
 observers = []
 
 
@@ -19,6 +27,8 @@ class Tracker:
     ):
         self.config = tracker_config
         self.status = TrackerStatus(tracker_config)
+        self.multiline_assembler = None
+        self.pattern_order = None
 
     @property
     def name(self):
@@ -179,101 +189,93 @@ class TrackerStatus:
         notify_observers(self.irc_status)
 
 
-class TrackerConfig:
-    def __init__(self, user_tracker, xml_config):
-        self._xml_config = xml_config
-        self._user_tracker = user_tracker.tracker
-
-        self._always_backends = (
-            [b.strip() for b in self._user_tracker.get("notify_backends").split(",")]
-            if self._user_tracker.get("notify_backends")
-            else []
-        )
-
-    def setting(self, key):
-        return self._user_tracker["settings"].get(key)
-
-    @property
-    def irc_port(self):
-        return int(self._user_tracker["irc_port"])
-
-    @property
-    def irc_nickname(self):
-        return self._user_tracker["irc_nickname"]
-
-    @property
-    def irc_server(self):
-        return str(self._user_tracker["irc_server"])
-
-    @property
-    def irc_tls(self):
-        return self._user_tracker["irc_tls"]
+def _optional_str(value):
+    return None if value is None else str(value)
 
-    @property
-    def irc_tls_verify(self):
-        return self._user_tracker["irc_tls_verify"]
 
-    @property
-    def irc_ident_password(self):
-        return self._user_tracker.get("irc_ident_password")
+def _split(value):
+    return tuple(x.strip() for x in value.split(",")) if value else ()
 
-    @property
-    def irc_inviter(self):
-        return self._user_tracker.get("irc_inviter")
 
-    @property
-    def irc_invite_cmd(self):
-        return self._user_tracker.get("irc_invite_cmd")
-
-    @property
-    def torrent_https(self):
-        return self._user_tracker["torrent_https"]
-
-    @property
-    def announce_delay(self):
-        return self._user_tracker["announce_delay"]
-
-    @property
-    def always_notify_backends(self):
-        return self._always_backends
-
-    @property
-    def category_notify_backends(self):
-        return self._user_tracker["category"]
-
-    @property
-    def short_name(self):
-        return self._xml_config.tracker_info["shortName"]
-
-    @property
-    def long_name(self):
-        return self._xml_config.tracker_info["longName"]
-
-    @property
-    def type(self):
-        return self._xml_config.tracker_info["type"]
+# Immutable snapshot of a tracker's user and XML configuration. Values are
+# converted from TOML items to plain Python values once, at startup.
+class TrackerConfig:
+    __slots__ = (
+        "_xml_config",
+        "_line_matched_plans",
+        "settings",
+        "irc_nickname",
+        "irc_server",
+        "irc_port",
+        "irc_tls",
+        "irc_tls_verify",
+        "irc_ident_password",
+        "irc_inviter",
+        "irc_invite_cmd",
+        "torrent_https",
+        "announce_delay",
+        "multiline_timeout",
+        "multiline_max_pending",
+        "pin_pattern_order",
+        "always_notify_backends",
+        "category_notify_backends",
+        "short_name",
+        "long_name",
+        "type",
+        "user_channels",
+        "irc_channels",
+        "announcer_names",
+    )
 
-    @property
-    def user_channels(self):
-        return [
-            x.strip().lower() for x in self._user_tracker["irc_channels"].split(",")
-        ]
+    def __init__(self, user_tracker, xml_config):
+        user_tracker = user_tracker.tracker
+        values = {
+            "_xml_config": xml_config,
+            "_line_matched_plans": {},
+            "settings": MappingProxyType(
+                {str(k): str(v) for k, v in user_tracker["settings"].items()}
+            ),
+            "irc_nickname": str(user_tracker["irc_nickname"]),
+            "irc_server": str(user_tracker["irc_server"]),
+            "irc_port": int(user_tracker["irc_port"]),
+            "irc_tls": bool(user_tracker["irc_tls"]),
+            "irc_tls_verify": bool(user_tracker["irc_tls_verify"]),
+            "irc_ident_password": _optional_str(user_tracker.get("irc_ident_password")),
+            "irc_inviter": _optional_str(user_tracker.get("irc_inviter")),
+            "irc_invite_cmd": _optional_str(user_tracker.get("irc_invite_cmd")),
+            "torrent_https": bool(user_tracker["torrent_https"]),
+            "announce_delay": int(user_tracker["announce_delay"]),
+            "multiline_timeout": int(user_tracker["multiline_timeout"]),
+            "multiline_max_pending": int(user_tracker["multiline_max_pending"]),
+            "pin_pattern_order": bool(user_tracker["pin_pattern_order"]),
+            "always_notify_backends": _split(user_tracker.get("notify_backends")),
+            "category_notify_backends": MappingProxyType(
+                {str(k): str(v) for k, v in user_tracker["category"].items()}
+            ),
+            "short_name": xml_config.tracker_info["shortName"],
+            "long_name": xml_config.tracker_info["longName"],
+            "type": xml_config.tracker_info["type"],
+            "user_channels": tuple(
+                c.lower() for c in _split(str(user_tracker["irc_channels"]))
+            ),
+        }
+        # Both channels from XML and user config
+        values["irc_channels"] = frozenset(
+            [c for server in xml_config.servers for c in server.channels]
+            + list(values["user_channels"])
+        )
+        values["announcer_names"] = frozenset(
+            a for server in xml_config.servers for a in server.announcers
+        )
 
-    # Return both channels from XML and user config
-    @property
-    def irc_channels(self):
-        for server in self._xml_config.servers:
-            for channel in server.channels:
-                yield channel
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
 
-        for channel in self.user_channels:
-            yield channel
+    def __setattr__(self, name, value):
+        raise AttributeError("TrackerConfig is immutable")
 
-    @property
-    def announcer_names(self):
-        for server in self._xml_config.servers:
-            for announcer in server.announcers:
-                yield announcer
+    def setting(self, key):
+        return self.settings.get(key)
 
     @property
     def line_patterns(self):
@@ -283,10 +285,34 @@ class TrackerConfig:
     def multiline_patterns(self):
         return self._xml_config.multiline_patterns
 
+    @property
+    def line_pattern_set(self):
+        return self._xml_config.line_pattern_set
+
+    @property
+    def multiline_pattern_set(self):
+        return self._xml_config.multiline_pattern_set
+
     @property
     def ignores(self):
         return self._xml_config.ignores
 
+    @property
+    def ignore_set(self):
+        return self._xml_config.ignore_set
+
     @property
     def line_matched(self):
         return self._xml_config.line_matched
+
+    # Compiled on first use as settings are folded into the plan. Unless
+    # full, only steps needed for the announcement variables are included.
+    def line_matched_plan(self, full=False):
+        if full not in self._line_matched_plans:
+            line_matched = self.line_matched
+            if not full:
+                line_matched = needed_line_matches(
+                    line_matched, consumed_variables(self)
+                )
+            self._line_matched_plans[full] = compile_plan(line_matched, self)
+        return self._line_matched_plans[full]
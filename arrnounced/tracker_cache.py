@@ -0,0 +1,216 @@
+import io
+import logging
+import os
+import pickle  # nosec B403: the cache is written by Arrnounced to its data directory
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from arrnounced import __version__
+from arrnounced.tracker_xml_config import parse_tracker_file, read_tracker_type
+from arrnounced.utils import compile_regex
+
+logger = logging.getLogger("TRACKER_CACHE")
+
+# Increment when the cache content changes
+_cache_format = 2
+_cache_file = "tracker_cache.pickle"
+# Files are parsed in worker processes when at least this many need parsing
+parallel_min_files = 16
+
+
+# Parsed XML tracker configs are cached in a pickle file in the data
+# directory. Each file's config is pickled separately and keyed by file name,
+# modification time and size. Only changed files are parsed again. Files of
+# trackers not in use are only indexed by their type, without data, and
+# parsed once their tracker is used.
+#
+# Compiled regexes are stored as pattern and flags and compiled through
+# compile_regex when loaded, so identical regexes stay shared between
+# trackers.
+class _Pickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, re.Pattern):
+            return ("regex", obj.pattern, obj.flags)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        kind, pattern, flags = pid
+        if kind != "regex":
+            raise pickle.UnpicklingError("Unknown persistent id: {}".format(kind))
+        # Unicode is implied for str patterns, as when compiled from the XML
+        if isinstance(pattern, str):
+            flags &= ~re.UNICODE
+        return compile_regex(pattern, flags)
+
+
+class CacheEntry:
+    def __init__(self, mtime, size, tracker_type, data=None):
+        self.mtime = mtime
+        self.size = size
+        self.tracker_type = tracker_type
+        self.data = data
+
+    def is_valid(self, stat):
+        return self.mtime == stat.st_mtime_ns and self.size == stat.st_size
+
+    def is_parsed(self):
+        return self.data is not None
+
+    def load(self):
+        return _Unpickler(io.BytesIO(self.data)).load()  # nosec B301
+
+
+def _dumps(xml_config):
+    buffer = io.BytesIO()
+    _Pickler(buffer, pickle.HIGHEST_PROTOCOL).dump(xml_config)
+    return buffer.getvalue()
+
+
+def cache_path(data_path):
+    return os.path.join(data_path, _cache_file)
+
+
+# Returns the cache entries by file name, empty if there is no usable cache
+def _read(path):
+    if not os.path.isfile(path):
+        return {}
+
+    try:
+        with open(path, "rb") as f:
+            version, entries = pickle.load(f)  # nosec B301
+    except Exception as e:
+        logger.warning("Could not read tracker cache '%s', rebuilding: %s", path, e)
+        return {}
+
+    if version != (_cache_format, __version__):
+        logger.info("Tracker cache is from another version, rebuilding")
+        return {}
+    return entries
+
+
+def _write(path, entries):
+    temporary = path + ".tmp"
+    try:
+        with open(temporary, "wb") as f:
+            pickle.dump(
+                ((_cache_format, __version__), entries), f, pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(temporary, path)
+    except OSError as e:
+        logger.warning("Could not write tracker cache '%s': %s", path, e)
+
+
+def _is_used(tracker_type, tracker_types):
+    return tracker_types is None or tracker_type in tracker_types
+
+
+def _index(tracker_config_path, tracker_file, stat):
+    tracker_type = read_tracker_type(tracker_config_path, tracker_file)
+    if tracker_type is None:
+        return None
+    return CacheEntry(stat.st_mtime_ns, stat.st_size, tracker_type)
+
+
+# Returns the pickled config of the XML tracker file or None if it is invalid.
+# Runs in a worker when parsing in parallel.
+def _parse(tracker_config_path, tracker_file):
+    xml_config = parse_tracker_file(tracker_config_path, tracker_file)
+    if xml_config is None:
+        return None
+    return _dumps(xml_config)
+
+
+# Parses the XML tracker files, in worker processes if there are many and
+# more than one CPU. Returns the pickled configs in the same order.
+def _parse_all(tracker_config_path, tracker_files):
+    workers = min(os.cpu_count() or 1, len(tracker_files))
+    if len(tracker_files) >= parallel_min_files and workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(
+                    executor.map(
+                        partial(_parse, tracker_config_path),
+                        tracker_files,
+                        chunksize=len(tracker_files) // (workers * 4) + 1,
+                    )
+                )
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning("Could not parse tracker XML configs in parallel: %s", e)
+
+    return [_parse(tracker_config_path, f) for f in tracker_files]
+
+
+# Returns the cache entries for all valid XML tracker files, by file name.
+# Files missing in the cache or changed since are indexed by their type and
+# parsed if their type is in tracker_types, or always if it is None. Returns
+# whether any entry was added, changed or removed as well.
+def _update(tracker_config_path, entries, tracker_types):
+    updated = {}
+    for tracker_file in sorted(os.listdir(tracker_config_path)):
+        stat = os.stat(os.path.join(tracker_config_path, tracker_file))
+        entry = entries.get(tracker_file)
+        if entry is None or not entry.is_valid(stat):
+            entry = _index(tracker_config_path, tracker_file, stat)
+        if entry is not None:
+            updated[tracker_file] = entry
+
+    unparsed = [
+        f
+        for f, e in updated.items()
+        if not e.is_parsed() and _is_used(e.tracker_type, tracker_types)
+    ]
+    for tracker_file, data in zip(unparsed, _parse_all(tracker_config_path, unparsed)):
+        if data is None:
+            del updated[tracker_file]
+        else:
+            entry = updated[tracker_file]
+            updated[tracker_file] = CacheEntry(
+                entry.mtime, entry.size, entry.tracker_type, data
+            )
+
+    changed = updated.keys() != entries.keys() or any(
+        entries[f] is not e for f, e in updated.items()
+    )
+    return updated, changed
+
+
+# Returns the cache entries by file name, reading the cache in the data
+# directory and updating it with changed XML tracker files
+def load_entries(tracker_config_path, data_path, tracker_types=None):
+    path = cache_path(data_path)
+    entries, changed = _update(tracker_config_path, _read(path), tracker_types)
+    if changed:
+        _write(path, entries)
+    return entries
+
+
+# Same as get_tracker_xml_configs but only parses files changed since they
+# were cached
+def get_tracker_xml_configs(tracker_config_path, data_path, tracker_types=None):
+    start = time.perf_counter()
+    if tracker_types is not None:
+        tracker_types = set(tracker_types)
+    entries = load_entries(tracker_config_path, data_path, tracker_types)
+    xml_configs = {
+        e.tracker_type: e.load()
+        for e in entries.values()
+        if e.is_parsed() and _is_used(e.tracker_type, tracker_types)
+    }
+    logger.info(
+        "Loaded %s XML tracker configs in %.0f ms",
+        len(xml_configs),
+        (time.perf_counter() - start) * 1000,
+    )
+    return xml_configs
+
+
+# Parses all XML tracker files and replaces the cache
+def rebuild(tracker_config_path, data_path):
+    entries, _ = _update(tracker_config_path, {}, None)
+    _write(cache_path(data_path), entries)
+    return len(entries)
@@ -14,9 +14,10 @@ from arrnounced.announcement import (
     SetRegex,
     If,
 )
+from arrnounced.pattern_set import IgnoreSet, PatternSet
+from arrnounced.utils import compile_regex
 
 
-# TODO: compile and store regex
 logger = logging.getLogger("TRACKER_CONF")
 debug = False
 
@@ -24,23 +25,72 @@ Server = namedtuple("Server", "names channels announcers")
 Ignore = namedtuple("Ignore", "regex expected")
 
 
-def get_tracker_xml_configs(tracker_config_path):
-    xml_configs = {}
+# Returns the parsed config of an XML tracker file or None if it is invalid
+def parse_tracker_file(tracker_config_path, tracker_file):
+    tree = ET.parse(os.path.join(tracker_config_path, tracker_file))
+    tracker = TrackerXmlConfig()
+
+    try:
+        if tracker.parse_config(tree.getroot()):
+            return tracker
+        logger.error("Could not parse tracker XML config '%s'", tracker_file)
+    except KeyError as e:
+        logger.error(
+            "Could not parse tracker XML config '%s', missing attribute %s",
+            tracker_file,
+            e,
+        )
+    except re.error as e:
+        logger.error(
+            "Could not parse tracker XML config '%s', invalid regex '%s': %s",
+            tracker_file,
+            e.pattern,
+            e,
+        )
+    return None
+
+
+# Returns the type of an XML tracker file or None if it cannot be read.
+# Parsing stops at the root element, the rest of the file is not read.
+def read_tracker_type(tracker_config_path, tracker_file):
+    try:
+        with open(os.path.join(tracker_config_path, tracker_file), "rb") as f:
+            for _, root in ET.iterparse(f, events=("start",)):
+                if "type" not in root.attrib:
+                    logger.error(
+                        "Could not read tracker XML config '%s', missing attribute type",
+                        tracker_file,
+                    )
+                return root.attrib.get("type")
+    except ET.ParseError as e:
+        logger.error("Could not read tracker XML config '%s': %s", tracker_file, e)
+    return None
+
+
+# Returns the XML tracker file names by tracker type
+def get_tracker_index(tracker_config_path):
+    index = {}
     for tracker_file in sorted(os.listdir(tracker_config_path)):
-        tree = ET.parse(tracker_config_path + "/" + tracker_file)
-        tracker = TrackerXmlConfig()
-
-        try:
-            if tracker.parse_config(tree.getroot()):
-                xml_configs[tracker.tracker_info["type"]] = tracker
-            else:
-                logger.error("Could not parse tracker XML config '%s'", tracker_file)
-        except KeyError as e:
-            logger.error(
-                "Could not parse tracker XML config '%s', missing attribute %s",
-                tracker_file,
-                e,
-            )
+        tracker_type = read_tracker_type(tracker_config_path, tracker_file)
+        if tracker_type is not None:
+            index[tracker_type] = tracker_file
+    return index
+
+
+# Returns the XML tracker configs by type. With tracker_types given only the
+# files of those types are parsed.
+def get_tracker_xml_configs(tracker_config_path, tracker_types=None):
+    if tracker_types is None:
+        tracker_files = sorted(os.listdir(tracker_config_path))
+    else:
+        index = get_tracker_index(tracker_config_path)
+        tracker_files = sorted(index[t] for t in set(tracker_types) if t in index)
+
+    xml_configs = {}
+    for tracker_file in tracker_files:
+        tracker = parse_tracker_file(tracker_config_path, tracker_file)
+        if tracker is not None:
+            xml_configs[tracker.tracker_info["type"]] = tracker
 
     return xml_configs
 
@@ -146,6 +196,28 @@ class TrackerXmlConfig:
         self.line_patterns = []
         self.multiline_patterns = []
         self.ignores = []
+        self._line_pattern_set = None
+        self._multiline_pattern_set = None
+        self._ignore_set = None
+
+    # Pattern sets are created on first use from the pattern lists
+    @property
+    def line_pattern_set(self):
+        if self._line_pattern_set is None:
+            self._line_pattern_set = PatternSet(self.line_patterns)
+        return self._line_pattern_set
+
+    @property
+    def multiline_pattern_set(self):
+        if self._multiline_pattern_set is None:
+            self._multiline_pattern_set = PatternSet(self.multiline_patterns)
+        return self._multiline_pattern_set
+
+    @property
+    def ignore_set(self):
+        if self._ignore_set is None:
+            self._ignore_set = IgnoreSet(self.ignores)
+        return self._ignore_set
 
     def parse_config(self, root):  # noqa: C901
         self.tracker_info = root.attrib
@@ -175,7 +247,7 @@ class TrackerXmlConfig:
         for ignore in root.findall("./parseinfo/ignore/*"):
             self.ignores.append(
                 Ignore(
-                    ignore.attrib["value"],
+                    compile_regex(ignore.attrib["value"]),
                     (
                         "expected" not in ignore.attrib
                         or ignore.attrib["expected"] == "true"
@@ -199,17 +271,17 @@ class TrackerXmlConfig:
                 print("\t\t", var.varType, ": ", var.name)
             print("\tLinePatterns")
             for pattern in self.line_patterns:
-                print("\t\t", pattern.regex, pattern.optional)
+                print("\t\t", pattern.regex.pattern, pattern.optional)
                 for group in pattern.groups:
                     print("\t\t\t", group)
             print("\tMultiLinePattern")
             for pattern in self.multiline_patterns:
-                print("\t\t", pattern.regex, pattern.optional)
+                print("\t\t", pattern.regex.pattern, pattern.optional)
                 for group in pattern.groups:
                     print("\t\t\t", group)
             print("\tIgnores")
             for ignore in self.ignores:
-                print("\t\t", ignore.regex, "-", ignore.expected)
+                print("\t\t", ignore.regex.pattern, "-", ignore.expected)
 
         if self.tracker_info is None:
             logger.error("No 'tracker_info' found")
@@ -1,16 +1,48 @@
 import datetime
 import logging
 import re
+from collections.abc import MutableMapping
 
 
 logger = logging.getLogger("UTILS")
 
+# Compiled regexes shared between all tracker configurations, keyed by
+# pattern and flags.
+_regex_cache = {}
 
-def strip_irc_color_codes(line):
+
+# Return a compiled regex. Identical patterns share the same compiled object.
+def compile_regex(pattern, flags=0):
+    if isinstance(pattern, re.Pattern):
+        return pattern
+
+    key = (pattern, flags)
+    compiled = _regex_cache.get(key)
+    if compiled is None:
+        compiled = re.compile(pattern, flags)
+        _regex_cache[key] = compiled
+    return compiled
+
+
+_irc_formatting = re.compile(r"\x03\d\d?(?:,\d\d?)?|[\x01-\x1F]")
+
+
+# The formatting codes used to be stripped in three passes, colors with
+# background, colors and then all control characters. Removing a color may
+# join a preceding color character with the digits after it, which the
+# following pass then strips as well. That only happens for two consecutive
+# color characters, such lines are stripped in passes to give the same result.
+def _strip_irc_color_codes_in_passes(line):
     line = re.sub(r"\x03\d\d?,\d\d?", "", line)
     line = re.sub(r"\x03\d\d?", "", line)
-    line = re.sub(r"[\x01-\x1F]", "", line)
-    return line
+    return re.sub(r"[\x01-\x1F]", "", line)
+
+
+# Strips mIRC colors, bold, underline, reset and other control characters
+def strip_irc_color_codes(line):
+    if "\x03\x03" in line:
+        return _strip_irc_color_codes_in_passes(line)
+    return _irc_formatting.sub("", line)
 
 
 def replace_spaces(text, new):
@@ -62,36 +94,130 @@ def human_datetime(date_time):
     return ", ".join(datelets) + " ago."
 
 
+# Variables known by autodl, all of them set to an empty string by default
+_default_names = (
+    "releaseType",
+    "freeleech",
+    "freeleechPercent",
+    "origin",
+    "releaseGroup",
+    "category",
+    "torrentName",
+    "uploader",
+    "torrentSize",
+    "preTime",
+    "torrentUrl",
+    "torrentSslUrl",
+    "year",
+    "name1",  # artist, show, movie
+    "name2",  # album
+    "season",
+    "episode",
+    "resolution",
+    "source",
+    "encoder",
+    "container",
+    "format",
+    "bitrate",
+    "media",
+    "tags",
+    "scene",
+    "log",
+    "logScore",
+    "cue",
+)
+_default_indexes = {name: i for i, name in enumerate(_default_names)}
+_defaults = ("",) * len(_default_names)
+_deleted = object()
+
+
+# Mapping of announcement variables. The variables known by autodl are kept
+# in a list, indexed by name, and other variables in a dict. The list is
+# shared default values until a known variable is set.
+class Variables(MutableMapping):
+    __slots__ = ("_known", "_other")
+
+    def __init__(self):
+        self._known = _defaults
+        self._other = None
+
+    def __getitem__(self, key):
+        index = _default_indexes.get(key)
+        if index is None:
+            if self._other is None:
+                raise KeyError(key)
+            return self._other[key]
+
+        value = self._known[index]
+        if value is _deleted:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        index = _default_indexes.get(key)
+        if index is None:
+            if self._other is None:
+                self._other = {}
+            self._other[key] = value
+        else:
+            if self._known is _defaults:
+                self._known = list(_defaults)
+            self._known[index] = value
+
+    def __delitem__(self, key):
+        self[key]  # Raises KeyError if not set
+        index = _default_indexes.get(key)
+        if index is None:
+            del self._other[key]
+        else:
+            if self._known is _defaults:
+                self._known = list(_defaults)
+            self._known[index] = _deleted
+
+    def __contains__(self, key):
+        index = _default_indexes.get(key)
+        if index is None:
+            return self._other is not None and key in self._other
+        return self._known[index] is not _deleted
+
+    def get(self, key, default=None):
+        index = _default_indexes.get(key)
+        if index is None:
+            return default if self._other is None else self._other.get(key, default)
+        value = self._known[index]
+        return default if value is _deleted else value
+
+    def __iter__(self):
+        for name, value in zip(_default_names, self._known):
+            if value is not _deleted:
+                yield name
+        if self._other is not None:
+            yield from self._other
+
+    def __len__(self):
+        known = len(_default_names)
+        if self._known is not _defaults:
+            known -= self._known.count(_deleted)
+        return known + (0 if self._other is None else len(self._other))
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, dict) and not kwargs:
+            for key, value in other.items():
+                self[key] = value
+        else:
+            super().update(other, **kwargs)
+
+    def copy(self):
+        variables = Variables()
+        if self._known is not _defaults:
+            variables._known = list(self._known)
+        if self._other is not None:
+            variables._other = dict(self._other)
+        return variables
+
+    def __repr__(self):
+        return "Variables({})".format(dict(self))
+
+
 def get_default_variables():
-    variables = {
-        "releaseType": "",
-        "freeleech": "",
-        "freeleechPercent": "",
-        "origin": "",
-        "releaseGroup": "",
-        "category": "",
-        "torrentName": "",
-        "uploader": "",
-        "torrentSize": "",
-        "preTime": "",
-        "torrentUrl": "",
-        "torrentSslUrl": "",
-        "year": "",
-        "name1": "",  # artist, show, movie
-        "name2": "",  # album
-        "season": "",
-        "episode": "",
-        "resolution": "",
-        "source": "",
-        "encoder": "",
-        "container": "",
-        "format": "",
-        "bitrate": "",
-        "media": "",
-        "tags": "",
-        "scene": "",
-        "log": "",
-        "logScore": "",
-        "cue": "",
-    }
-    return variables
+    return Variables()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# Messages per second through parsing single line announcements of the
+# bundled test trackers on the event loop and in worker processes, and the
+# longest time the event loop is blocked meanwhile.
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+from common import TRACKERS_PATH, load_trackers, report, user_tracker
+
+from arrnounced import message_handler, parse_executor
+
+
+async def _watch_loop(blocked):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        blocked[0] = max(blocked[0], time.perf_counter() - start)
+
+
+async def _run(work, rounds):
+    blocked = [0.0]
+    watcher = asyncio.ensure_future(_watch_loop(blocked))
+    start = time.perf_counter()
+    count = 0
+    for _ in range(rounds):
+        count += len(await work())
+    elapsed = time.perf_counter() - start
+    watcher.cancel()
+    return count / elapsed, blocked[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse workers")
+    parser.add_argument("-r", "--rounds", type=int, default=50, help="Rounds")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="Workers")
+    args = parser.parse_args()
+
+    trackers = [(t, m) for t, m in load_trackers() if not t.config.multiline_patterns]
+
+    async def inline():
+        results = []
+        for tracker, messages in trackers:
+            for message in messages:
+                results.append(message_handler._parse(tracker, message))
+                await asyncio.sleep(0)
+        return results
+
+    async def pooled():
+        return await asyncio.gather(
+            *(
+                parse_executor.parse(tracker, message)
+                for tracker, messages in trackers
+                for message in messages
+            )
+        )
+
+    rate, blocked = asyncio.run(_run(inline, args.rounds))
+    report("inline", rate, "messages/s")
+    report("inline longest block", blocked * 1e6, "us")
+
+    user_trackers = [
+        user_tracker(t.config.type, t.config._xml_config) for t, _ in trackers
+    ]
+    with tempfile.TemporaryDirectory() as data_path:
+        parse_executor.start(
+            [t for t, _ in trackers],
+            user_trackers,
+            TRACKERS_PATH,
+            data_path,
+            args.workers,
+        )
+        rate, blocked = asyncio.run(_run(pooled, args.rounds))
+        parse_executor.stop()
+    report("{} workers".format(args.workers), rate, "messages/s")
+    report("{} workers longest block".format(args.workers), blocked * 1e6, "us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Memory allocated, as traced by tracemalloc, for the variables of parsed
+# announcements and of incomplete multiline announcements. Measured as the
+# memory still allocated while the results are kept.
+
+import argparse
+import tracemalloc
+
+from common import load_trackers, report
+
+from arrnounced import announce_parser
+from arrnounced.announcement import create_announcement
+
+
+def _traced(func):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def _parse_all(tracker, messages, rounds):
+    parsed = []
+    for _ in range(rounds):
+        for message in messages:
+            variables = announce_parser.parse(tracker, message)
+            if variables is not None:
+                create_announcement(tracker, variables)
+                parsed.append(variables)
+    tracker.multiline_assembler = None
+    return parsed
+
+
+def _start_multiline(tracker, first_line, count):
+    for _ in range(count):
+        announce_parser.parse(tracker, first_line)
+    return tracker.multiline_assembler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark variables memory")
+    parser.add_argument(
+        "-r", "--rounds", type=int, default=100, help="Rounds over the messages"
+    )
+    args = parser.parse_args()
+
+    for tracker, messages in load_trackers():
+        # Warm up caches, e.g. compiled plans, before tracing
+        _parse_all(tracker, messages, 1)
+        size, parsed = _traced(lambda: _parse_all(tracker, messages, args.rounds))
+        report(
+            "{} per announcement".format(tracker.config.type),
+            size / len(parsed),
+            "bytes",
+        )
+
+        if len(tracker.config.multiline_patterns) > 0:
+            count = tracker.config.multiline_max_pending
+            size, _ = _traced(lambda: _start_multiline(tracker, messages[0], count))
+            report(
+                "{} per incomplete announcement".format(tracker.config.type),
+                size / count,
+                "bytes",
+            )
+            tracker.multiline_assembler = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# Messages per second through multiline parsing when announcements are
+# interleaved, i.e. the first line of a number of announcements arrives
+# before the remaining lines of any of them. Also measures assembling
+# announcements with and without a multiprocessing lock around each update,
+# which the parser used to take for every multiline message.
+
+import argparse
+from multiprocessing import Lock
+
+from common import load_trackers, measure, report
+
+from arrnounced import announce_parser
+
+
+def _announcements(messages):
+    announcements = [[]]
+    for message in messages:
+        if message.startswith("-"):
+            announcements.append([])
+        else:
+            announcements[-1].append(message)
+    return [a for a in announcements if len(a) > 0]
+
+
+# Line n of every announcement is sent before line n + 1 of any of them
+def _interleave(announcements, count):
+    announcements = [announcements[i % len(announcements)] for i in range(count)]
+    longest = max(len(a) for a in announcements)
+    return [a[n] for n in range(longest) for a in announcements if n < len(a)]
+
+
+def _run_messages(tracker, messages):
+    for message in messages:
+        announce_parser.parse(tracker, message)
+    tracker.multiline_assembler = None
+
+
+def _assemble(assembler, indexes, lock=None):
+    for index in indexes:
+        if lock is None:
+            assembler.update(index, {})
+        else:
+            with lock:
+                assembler.update(index, {})
+
+
+def _measure_lock(tracker, seconds):
+    patterns = tracker.config.multiline_patterns
+    assembler = announce_parser.MultilineAssembler(patterns)
+    indexes = [i for i, pattern in enumerate(patterns) if not pattern.optional]
+    for name, lock in (("without lock", None), ("with lock", Lock())):
+        rate = measure(lambda: _assemble(assembler, indexes, lock), seconds)
+        report(
+            "{} assemble {}".format(tracker.config.type, name),
+            rate * len(indexes),
+            "messages/s",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multiline parsing")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=2.0, help="Seconds per measurement"
+    )
+    args = parser.parse_args()
+
+    for tracker, messages in load_trackers():
+        if len(tracker.config.multiline_patterns) == 0:
+            continue
+        announcements = _announcements(messages)
+        for count in (1, 10, 100, 1000):
+            interleaved = _interleave(announcements, count)
+            rate = measure(lambda: _run_messages(tracker, interleaved), args.seconds)
+            report(
+                "{} interleaved {}".format(tracker.config.type, count),
+                rate * len(interleaved),
+                "messages/s",
+            )
+        _measure_lock(tracker, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# Messages per second through parsing and announcement creation for the
+# bundled test trackers, tests/trackers, using the messages in
+# tests/announcements.
+
+import argparse
+
+from common import load_trackers, measure, report
+
+from arrnounced import announce_parser
+from arrnounced import utils
+from arrnounced.announcement import create_announcement
+
+
+def _run_messages(tracker, messages):
+    for message in messages:
+        variables = announce_parser.parse(tracker, utils.strip_irc_color_codes(message))
+        if variables is not None:
+            create_announcement(tracker, variables)
+    tracker.multiline_assembler = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark announcement parsing")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=2.0, help="Seconds per tracker"
+    )
+    parser.add_argument(
+        "-a",
+        "--adaptive",
+        action="store_true",
+        help="Learn the pattern order from hits, see [parser] adaptive_order",
+    )
+    args = parser.parse_args()
+    announce_parser.adaptive_order = args.adaptive
+
+    total_messages = 0
+    total_time = 0.0
+    for tracker, messages in load_trackers():
+        rate = measure(lambda: _run_messages(tracker, messages), args.seconds)
+        report(tracker.config.type, rate * len(messages), "messages/s")
+        total_messages += len(messages)
+        total_time += 1 / rate
+
+    report("all", total_messages / total_time, "messages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Announcements per second through the linematched elements of the bundled
+# test trackers: interpreted element by element, as a compiled plan of all
+# elements and as a compiled plan of the elements needed for announcements.
+
+import argparse
+
+from common import load_trackers, measure, report
+
+from arrnounced import announce_parser
+
+
+def _parsed_variables(tracker, messages):
+    parsed = []
+    for message in messages:
+        variables = announce_parser.parse(tracker, message)
+        if variables is not None:
+            parsed.append(variables)
+    return parsed
+
+
+def _run_interpreted(tracker_config, parsed):
+    for variables in parsed:
+        variables = dict(variables)
+        for line_match in tracker_config.line_matched:
+            line_match.process(tracker_config, variables)
+
+
+def _run_compiled(tracker_config, parsed):
+    for variables in parsed:
+        variables = dict(variables)
+        for step in tracker_config.line_matched_plan(True):
+            step(variables)
+
+
+def _run_needed(tracker_config, parsed):
+    for variables in parsed:
+        variables = dict(variables)
+        for step in tracker_config.line_matched_plan():
+            step(variables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark linematched plans")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=2.0, help="Seconds per measurement"
+    )
+    args = parser.parse_args()
+
+    for tracker, messages in load_trackers():
+        parsed = _parsed_variables(tracker, messages)
+        for name, run in (
+            ("interpreted", _run_interpreted),
+            ("compiled", _run_compiled),
+            ("compiled needed", _run_needed),
+        ):
+            rate = measure(lambda: run(tracker.config, parsed), args.seconds)
+            report(
+                "{} {}".format(tracker.config.type, name),
+                rate * len(parsed),
+                "announcements/s",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Line pattern and ignore evaluation with and without the literal prefilter,
+# for announcements and for chat noise.
+
+import argparse
+from unittest import mock
+
+from common import load_trackers, measure, report
+
+from arrnounced import pattern_set
+
+noise = [
+    "anyone know when the site is back up?",
+    "lol",
+    "I uploaded a new episode yesterday - check it out",
+    "Please do not request in this channel",
+    "ping",
+    "brb",
+    "Has anyone else noticed that the new episodes of that show are encoded "
+    "with a different release group now? The old ones were fine but these have "
+    "a strange audio sync issue somewhere around the 20 minute mark, at least "
+    "on my player. Not sure if it is a problem with the source or the encode.",
+]
+
+
+def _run(patterns, ignores, messages):
+    for message in messages:
+        if patterns.match(message)[0] == -1:
+            ignores.ignore(message)
+
+
+def _measure(xml_config, messages, seconds):
+    patterns = pattern_set.PatternSet(
+        xml_config.line_patterns or xml_config.multiline_patterns
+    )
+    ignores = pattern_set.IgnoreSet(xml_config.ignores)
+    rate = measure(lambda: _run(patterns, ignores, messages), seconds)
+    return rate * len(messages)
+
+
+def _measure_without_prefilter(xml_config, messages, seconds):
+    extracts = xml_config.line_patterns + xml_config.multiline_patterns
+    literals = [e.literal for e in extracts]
+    for extract in extracts:
+        extract.literal = None
+    with mock.patch.object(pattern_set, "prefilter_literal", lambda regex: None):
+        rate = _measure(xml_config, messages, seconds)
+    for extract, literal in zip(extracts, literals):
+        extract.literal = literal
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark literal prefilter")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=1.0, help="Seconds per measurement"
+    )
+    args = parser.parse_args()
+
+    for tracker, messages in load_trackers():
+        xml_config = tracker.config._xml_config
+        for name, corpus in (("announcements", messages), ("noise", noise)):
+            label = "{} {}".format(tracker.config.type, name)
+            report(
+                label + " without",
+                _measure_without_prefilter(xml_config, corpus, args.seconds),
+                "messages/s",
+            )
+            report(
+                label + " with",
+                _measure(xml_config, corpus, args.seconds),
+                "messages/s",
+            )
+
+
+if __name__ == "__main__":
+    main()
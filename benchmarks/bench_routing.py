@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Messages per second through routing messages to trackers, for a growing
+# number of configured trackers. Compared to checking every tracker's
+# channels and announcers in turn.
+
+import argparse
+
+from common import measure, report
+
+from arrnounced import routing
+
+
+class _TrackerConfig:
+    def __init__(self, i):
+        self.irc_server = "irc{}.example.com".format(i % 5)
+        self.irc_channels = frozenset(["#announce{}".format(i), "#chat{}".format(i)])
+        self.announcer_names = frozenset(["Bot{}".format(i)])
+
+
+class _Tracker:
+    def __init__(self, i):
+        self.config = _TrackerConfig(i)
+
+
+# Each tracker gets an announcement and chatter in its channel
+def _messages(count):
+    messages = []
+    for i in range(count):
+        server = "irc{}.example.com".format(i % 5)
+        messages.append((server, "#announce{}".format(i), "Bot{}".format(i)))
+        messages.append((server, "#announce{}".format(i), "user{}".format(i)))
+    return messages[:200]
+
+
+def _run_routed(messages):
+    for server, channel, nick in messages:
+        routing.route(server, channel, nick)
+
+
+def _run_scanned(trackers, messages):
+    for server, channel, nick in messages:
+        [
+            t
+            for t in trackers
+            if t.config.irc_server == server
+            and nick in t.config.announcer_names
+            and channel in t.config.irc_channels
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message routing")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=1.0, help="Seconds per measurement"
+    )
+    args = parser.parse_args()
+
+    for count in (1, 10, 100, 1000):
+        trackers = [_Tracker(i) for i in range(count)]
+        routing.rebuild(trackers)
+        messages = _messages(count)
+
+        rate = measure(lambda: _run_routed(messages), args.seconds)
+        report("{} trackers routed".format(count), rate * len(messages), "messages/s")
+        rate = measure(lambda: _run_scanned(trackers, messages), args.seconds)
+        report("{} trackers scanned".format(count), rate * len(messages), "messages/s")
+
+
+if __name__ == "__main__":
+    main()
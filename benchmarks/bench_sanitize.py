@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Messages per second through sanitizing, i.e. stripping IRC formatting and
+# unescaping character references, compared to the previous three regex
+# passes and unconditional unescaping.
+
+import argparse
+import html
+import re
+
+from common import measure, report
+
+from arrnounced import message_handler
+
+_messages = {
+    "plain": "New Torrent: Some.Show.S01E02.1080p.WEB.H264-GRP - Size: 1.2 GB",
+    "colored": (
+        "\x0304,01New Torrent:\x03 \x02Some.Show.S01E02.1080p.WEB.H264-GRP\x02"
+        " \x0312-\x03 Size: \x1f1.2 GB\x1f\x0f"
+    ),
+    "escaped": "New Torrent: Tom &amp; Jerry &#39;1940&#39; - Size: 1.2 GB",
+}
+
+
+def _sanitize_in_passes(message):
+    message = re.sub(r"\x03\d\d?,\d\d?", "", message)
+    message = re.sub(r"\x03\d\d?", "", message)
+    message = re.sub(r"[\x01-\x1F]", "", message)
+    return html.unescape(message)
+
+
+def _run(sanitize, message, count=100):
+    for _ in range(count):
+        sanitize(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message sanitizing")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=1.0, help="Seconds per measurement"
+    )
+    args = parser.parse_args()
+
+    for name, message in _messages.items():
+        rate = measure(
+            lambda: _run(message_handler._sanitize_message, message), args.seconds
+        )
+        report("{} single pass".format(name), rate * 100, "messages/s")
+        rate = measure(lambda: _run(_sanitize_in_passes, message), args.seconds)
+        report("{} three passes".format(name), rate * 100, "messages/s")
+
+
+if __name__ == "__main__":
+    main()
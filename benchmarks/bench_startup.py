@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Time from starting the Arrnounced process until its first channel is
+# joined, against a minimal IRC server on localhost. The startup phase
+# breakdown logged by Arrnounced is printed for the last run.
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+
+from common import ROOT, TRACKERS_PATH, report
+
+_settings = """
+[webui]
+host = "127.0.0.1"
+port = {web_port}
+
+[log]
+to_file = true
+to_console = false
+
+[backends.bench]
+type = "sonarr"
+url = "http://127.0.0.1:{backend_port}"
+apikey = "bench"
+
+[trackers.alpha]
+irc_nickname = "bench"
+irc_server = "127.0.0.1"
+irc_port = {irc_port}
+irc_channels = "#alpha-announce"
+
+[trackers.alpha.settings]
+passkey = "bench"
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Answers just enough of the IRC protocol for a client to register and join
+# channels. Sets joined once the first JOIN is received.
+class _IrcServer:
+    def __init__(self):
+        self.joined = asyncio.Event()
+        self.nick = "bench"
+
+    async def handle(self, reader, writer):
+        def send(line):
+            writer.write((line + "\r\n").encode())
+
+        while not reader.at_eof():
+            words = (await reader.readline()).decode().strip().split(" ")
+            command = words[0].upper()
+            if command == "CAP" and words[1:2] == ["LS"]:
+                send(":bench.local CAP * LS :")
+            elif command == "NICK":
+                self.nick = words[1]
+            elif command == "USER":
+                send(":bench.local 001 {} :Welcome".format(self.nick))
+                send(":bench.local 422 {} :No MOTD".format(self.nick))
+            elif command == "PING":
+                send(":bench.local PONG bench.local :{}".format(words[-1]))
+            elif command == "JOIN":
+                for channel in words[1].split(","):
+                    send(":{0}!{0}@localhost JOIN {1}".format(self.nick, channel))
+                self.joined.set()
+            await writer.drain()
+
+
+async def _run_once(data_path, settings_path):
+    irc_server = _IrcServer()
+    server = await asyncio.start_server(irc_server.handle, "127.0.0.1", 0)
+    with open(settings_path, "w") as f:
+        f.write(
+            _settings.format(
+                web_port=_free_port(),
+                backend_port=_free_port(),
+                irc_port=server.sockets[0].getsockname()[1],
+            )
+        )
+
+    start = time.perf_counter()
+    process = subprocess.Popen(  # nosec B603
+        [
+            sys.executable,
+            "-m",
+            "arrnounced.cli",
+            "-d",
+            data_path,
+            "-c",
+            settings_path,
+            "-t",
+            TRACKERS_PATH,
+        ],
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    try:
+        await asyncio.wait_for(irc_server.joined.wait(), timeout=60)
+        return time.perf_counter() - start
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        server.close()
+        await server.wait_closed()
+
+
+def _breakdown(data_path):
+    with open(os.path.join(data_path, "arrnounced.log")) as f:
+        lines = [line for line in f if "First channel joined" in line]
+    return lines[-1].strip() if lines else "No startup breakdown logged"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="Runs")
+    args = parser.parse_args()
+
+    times = []
+    with tempfile.TemporaryDirectory() as data_path:
+        settings_path = os.path.join(data_path, "settings.toml")
+        for _ in range(args.runs):
+            times.append(asyncio.run(_run_once(data_path, settings_path)))
+
+        report("Start to first join, fastest", min(times) * 1000, "ms")
+        report("Start to first join, median", statistics.median(times) * 1000, "ms")
+        print(_breakdown(data_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Tags per second through extracttags with a music tracker's worth of
+# setvarif rules, compared to trying every rule in order for each tag.
+
+import argparse
+
+from common import measure, report
+
+from arrnounced.announcement import ExtractTags
+
+_formats = ["MP3", "FLAC", "AAC", "AC3", "DTS", "Ogg", "ALAC", "WavPack"]
+_bitrates = ["192", "V2 (VBR)", "V0 (VBR)", "320", "Lossless", "24bit Lossless"]
+_media = ["CD", "DVD", "Vinyl", "Soundboard", "SACD", "DAT", "Cassette", "WEB"]
+_tags = "FLAC / Lossless / Log / 100% / Cue / CD / Scene / jazz.rock / vocal"
+
+
+def _setvarifs():
+    setvarifs = []
+    for name, values in (("format", _formats), ("bitrate", _bitrates)):
+        for value in values:
+            setvarifs.append(ExtractTags.SetVarIf(name, None, value, None))
+    setvarifs.append(ExtractTags.SetVarIf("log", "^Log", None, None))
+    setvarifs.append(ExtractTags.SetVarIf("logScore", r"^(\d+)%$", None, None))
+    setvarifs.append(ExtractTags.SetVarIf("cue", "^Cue$", None, "true"))
+    setvarifs.append(ExtractTags.SetVarIf("scene", "^Scene$", None, "true"))
+    for value in _media:
+        setvarifs.append(ExtractTags.SetVarIf("media", None, value, None))
+    return setvarifs
+
+
+def _run_in_order(extracttags, tags):
+    for tag_name in tags:
+        for setvarif in extracttags.setvarifs:
+            if setvarif.get_value(tag_name) is not None:
+                break
+
+
+def _run_indexed(extracttags, tags):
+    for tag_name in tags:
+        extracttags.first_match(tag_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extracttags")
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=1.0, help="Seconds per measurement"
+    )
+    args = parser.parse_args()
+
+    extracttags = ExtractTags("tags", "/", _setvarifs())
+    tags = [t.strip() for t in extracttags.split.split(_tags)]
+
+    rate = measure(lambda: _run_indexed(extracttags, tags), args.seconds)
+    report("indexed", rate * len(tags), "tags/s")
+    rate = measure(lambda: _run_in_order(extracttags, tags), args.seconds)
+    report("in order", rate * len(tags), "tags/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from arrnounced.config import UserConfig  # noqa: E402
+from arrnounced.tracker import Tracker, TrackerConfig  # noqa: E402
+from arrnounced.tracker_xml_config import get_tracker_xml_configs  # noqa: E402
+
+TRACKERS_PATH = os.path.join(ROOT, "tests", "trackers")
+ANNOUNCEMENTS_PATH = os.path.join(ROOT, "tests", "announcements")
+
+# Benchmarks run a lot of non matching messages which would otherwise be logged
+logging.disable(logging.CRITICAL)
+
+
+def user_tracker(tracker_type, xml_config):
+    return UserConfig.UserTracker(
+        tracker_type,
+        {
+            "irc_nickname": "bench",
+            "irc_server": "irc.example.com",
+            "irc_port": 6667,
+            "irc_channels": "#bench",
+            "irc_tls": False,
+            "irc_tls_verify": False,
+            "torrent_https": False,
+            "announce_delay": 0,
+            "multiline_timeout": 15,
+            "multiline_max_pending": 100,
+            "pin_pattern_order": False,
+            "category": {},
+            "settings": {s: "bench_" + s for s in xml_config.settings},
+        },
+    )
+
+
+def load_messages(tracker_type):
+    with open(os.path.join(ANNOUNCEMENTS_PATH, tracker_type + ".txt")) as f:
+        return [line.rstrip("\n") for line in f]
+
+
+# Returns a list of (tracker, messages) for all bundled test trackers
+def load_trackers():
+    trackers = []
+    xml_configs = get_tracker_xml_configs(TRACKERS_PATH)
+    for tracker_type, xml_config in sorted(xml_configs.items()):
+        tracker = Tracker(
+            TrackerConfig(user_tracker(tracker_type, xml_config), xml_config)
+        )
+        trackers.append((tracker, load_messages(tracker_type)))
+    return trackers
+
+
+def _measure_once(func, seconds):
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        func()
+        calls += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+# Call func repeatedly for roughly the given number of seconds, split in a
+# number of rounds. Returns calls per second of the fastest round.
+def measure(func, seconds=1.0, rounds=5):
+    return max(_measure_once(func, seconds / rounds) for _ in range(rounds))
+
+
+def report(name, value, unit):
+    print("{:<40} {:>14,.0f} {}".format(name, value, unit))
@@ -1,6 +1,7 @@
 import unittest
 
 from arrnounced import announcement, announce_parser, tracker, tracker_xml_config, utils
+from arrnounced.config import UserConfig
 from tracker_xml_config import Ignore
 from unittest import mock
 
@@ -11,63 +12,72 @@ class HelperVar:
         self.name = name
 
 
+trackers = []
+
+
 def multi_post_condition(func):
     def func_wrapper(self):
         func(self)
-        self.assertEqual(len(announce_parser.multiline_matches["trackertype"]), 0)
+        for th in trackers:
+            self.assertEqual(len(th.multiline_assembler), 0)
 
     return func_wrapper
 
 
 class TrackerHelper:
-    def __init__(self):
-        self.config = TrackerConfigHelper()
+    def __init__(self, **user_values):
+        self.config = TrackerConfigHelper(**user_values)
+        self.multiline_assembler = None
+        self.pattern_order = None
+        trackers.append(self)
 
 
 class TrackerConfigHelper(tracker.TrackerConfig):
     def __init__(
-        self,
-        regex=None,
-        regex_groups=[],
-        url_vars=[],
-        tracker_name="trackername",
-        tracker_type="trackertype",
+        self, tracker_name="trackername", tracker_type="trackertype", **user_values
     ):
-        self._user_config = {}
-        self._user_config["notify_sonarr"] = False
-        self._user_config["notify_radarr"] = False
-        self._user_config["notify_lidarr"] = False
-        self._user_config["category_sonarr"] = False
-        self._user_config["category_radarr"] = False
-        self._user_config["category_lidarr"] = False
-
-        self._xml_config = tracker_xml_config.TrackerXmlConfig()
-        self._xml_config.tracker_info = {
+        user_tracker = {
+            "irc_nickname": "nick",
+            "irc_server": "server",
+            "irc_port": 6667,
+            "irc_channels": "#channel",
+            "irc_tls": False,
+            "irc_tls_verify": False,
+            "torrent_https": False,
+            "announce_delay": 0,
+            "multiline_timeout": 15,
+            "multiline_max_pending": 100,
+            "pin_pattern_order": False,
+            "category": {},
+            "settings": {},
+        }
+        user_tracker.update(user_values)
+
+        xml_config = tracker_xml_config.TrackerXmlConfig()
+        xml_config.tracker_info = {
             "shortName": tracker_name,
+            "longName": tracker_name,
             "type": tracker_type,
         }
-        self._xml_config.line_patterns = []
-        self._xml_config.multiline_patterns = []
-        self._xml_config.ignores = []
-        self._xml_config.line_matched = []
+        super().__init__(UserConfig.UserTracker(tracker_type, user_tracker), xml_config)
 
     def insert_regex(self, regex, regex_groups):
-        self._xml_config.line_patterns.append(
+        self.line_patterns.append(
             announcement.Extract(None, regex, regex_groups, False)
         )
 
     def insert_multi_regex(self, regex, regex_groups, optional=False):
-        self._xml_config.multiline_patterns.append(
+        self.multiline_patterns.append(
             announcement.Extract(None, regex, regex_groups, optional)
         )
 
     def insert_ignore(self, regex, expected):
-        self._xml_config.ignores.append(Ignore(regex, expected))
+        self.ignores.append(Ignore(utils.compile_regex(regex), expected))
 
 
 class ParserTest(unittest.TestCase):
     def setUp(self):
-        announce_parser.multiline_matches = {}
+        trackers.clear()
 
     def test_single_line_pattern_no_match(self):
         th = TrackerHelper()
@@ -146,6 +156,93 @@ class ParserTest(unittest.TestCase):
         self.assertEqual(var["torrentName"], "a_name", "Name did not match")
         self.assertEqual(var["$g2"], "a_group", "g2 did not match")
 
+    def test_single_line_statistics(self):
+        th = TrackerHelper()
+        th.config.insert_regex(
+            regex=r"(.*) / (.*)",
+            regex_groups=["torrentName", "$g2"],
+        )
+        th.config.insert_ignore(r"^noise", True)
+        announce_parser.statistics = {}
+
+        announce_parser.parse(th, "a_name / a_group")
+        announce_parser.parse(th, "noise message")
+        announce_parser.parse(th, "noise again")
+        announce_parser.parse(th, "something else")
+
+        statistics = announce_parser.get_statistics("trackertype")
+        self.assertEqual(statistics.matched, 1)
+        self.assertEqual(statistics.ignored, 2)
+        self.assertEqual(statistics.unmatched, 1)
+
+    @mock.patch.object(announce_parser, "reorder_interval", 4)
+    @mock.patch.object(announce_parser, "adaptive_order", True)
+    def test_single_line_adaptive_order(self):
+        th = TrackerHelper()
+        th.config.insert_regex(r"^Old: (.*)", ["torrentName"])
+        th.config.insert_regex(r"^New: (.*)", ["torrentName"])
+        th.config.insert_regex(r"^Old: (.*) / (.*)", ["torrentName", "$g2"])
+        th.config.insert_ignore(r"^Chat", True)
+        th.config.insert_ignore(r"^New", False)
+        announce_parser.statistics = {}
+
+        announce_parser.parse(th, "New: name1")
+        announce_parser.parse(th, "New: name2")
+        announce_parser.parse(th, "Chat message")
+        self.assertEqual(th.config.line_pattern_set.order, [0, 1, 2])
+        announce_parser.parse(th, "New: name3")
+        self.assertEqual(th.config.line_pattern_set.order, [1, 0, 2])
+
+        # Still matched by the first pattern, not the overlapping third
+        var = announce_parser.parse(th, "Old: name4 / group")
+        self.assertEqual(var["torrentName"], "name4 / group")
+
+        with mock.patch.object(th.config.ignore_set, "ignore") as ignore:
+            var = announce_parser.parse(th, "Chat again")
+            self.assertEqual(var, None)
+            ignore.assert_not_called()
+
+        statistics = announce_parser.get_statistics("trackertype")
+        self.assertEqual(statistics.pattern_hits, {0: 1, 1: 3})
+        self.assertEqual(statistics.ignore_hits, {0: 2})
+        self.assertEqual(statistics.ignored, 2)
+
+        with mock.patch.object(announce_parser.logger, "info") as info:
+            announce_parser.log_statistics()
+            info.assert_called_with(
+                "%s: Line pattern hits, %s. Ignore hits, %s",
+                "trackertype",
+                "0: 1, 1: 3",
+                "0: 2",
+            )
+
+    @mock.patch.object(announce_parser, "reorder_interval", 1)
+    @mock.patch.object(announce_parser, "adaptive_order", True)
+    def test_single_line_adaptive_order_ignore_overlaps(self):
+        th = TrackerHelper()
+        th.config.insert_regex(r"^New: (.*)", ["torrentName"])
+        th.config.insert_ignore(r"^New: Chat", True)
+        announce_parser.statistics = {}
+
+        announce_parser.parse(th, "New: Chat")
+        self.assertEqual(th.pattern_order.first_ignore, None)
+        var = announce_parser.parse(th, "New: Chat")
+        self.assertEqual(var["torrentName"], "Chat")
+
+    @mock.patch.object(announce_parser, "reorder_interval", 1)
+    @mock.patch.object(announce_parser, "adaptive_order", True)
+    def test_single_line_pinned_order(self):
+        th = TrackerHelper(pin_pattern_order=True)
+        th.config.insert_regex(r"^Old: (.*)", ["torrentName"])
+        th.config.insert_regex(r"^New: (.*)", ["torrentName"])
+        announce_parser.statistics = {}
+
+        announce_parser.parse(th, "New: name1")
+        announce_parser.parse(th, "New: name2")
+        self.assertEqual(th.pattern_order, None)
+        self.assertEqual(th.config.line_pattern_set.order, [0, 1])
+        self.assertEqual(announce_parser.get_statistics("trackertype").pattern_hits, {})
+
     def test_single_non_capture_group(self):
         th = TrackerHelper()
         th.config.insert_regex(
@@ -205,7 +302,7 @@ class ParserTest(unittest.TestCase):
         var = announce_parser.parse(th, "something else")
         self.assertEqual(var, None, "No match should return None")
 
-        self.assertEqual(len(announce_parser.multiline_matches), 0)
+        self.assertEqual(th.multiline_assembler, None)
 
     @multi_post_condition
     def test_multi_line_pattern_simple(self):
@@ -429,8 +526,8 @@ class ParserTest(unittest.TestCase):
             var, None, "Announcement should be discarded for being too old"
         )
 
-    # Mock value: (insert1), (check1, insert2), (check1, log warning, check2)
-    @mock.patch("time.time", mock.MagicMock(side_effect=[0, 10, 10, 16, 16, 16]))
+    # Mock value: (insert1), (insert2), (check, log warning)
+    @mock.patch("time.time", mock.MagicMock(side_effect=[0, 10, 16, 16]))
     @multi_post_condition
     def test_multi_line_pattern_parallell_first_too_old(self):
         th = TrackerHelper()
@@ -494,6 +591,83 @@ class ParserTest(unittest.TestCase):
         for key in utils.get_default_variables():
             self.assertEqual(var[key], "", "default value did not match")
 
+    @multi_post_condition
+    def test_multi_line_pattern_many_in_parallel(self):
+        th = TrackerHelper()
+        th.config.insert_multi_regex(
+            regex=r"Row1 name: (.*)", regex_groups=["torrentName"]
+        )
+        th.config.insert_multi_regex(
+            regex=r"Row2 g2: (.*)", regex_groups=["$g2"], optional=True
+        )
+        th.config.insert_multi_regex(regex=r"Row3 g3: (.*)", regex_groups=["$g3"])
+
+        for i in range(100):
+            var = announce_parser.parse(th, "Row1 name: name{}".format(i))
+            self.assertEqual(var, None, "No match should return None")
+        # Goes to the oldest announcements waiting for row 2
+        for i in range(50):
+            var = announce_parser.parse(th, "Row2 g2: g2_{}".format(i))
+            self.assertEqual(var, None, "No match should return None")
+
+        assembler = th.multiline_assembler
+        self.assertEqual(len(assembler), 100)
+
+        for i in range(100):
+            var = announce_parser.parse(th, "Row3 g3: g3_{}".format(i))
+            self.assertEqual(var["torrentName"], "name{}".format(i))
+            self.assertEqual(var.get("$g2"), "g2_{}".format(i) if i < 50 else None)
+            self.assertEqual(var["$g3"], "g3_{}".format(i))
+
+        for message in ["Row2 g2: g2_text", "Row3 g3: g3_text"]:
+            var = announce_parser.parse(th, message)
+            self.assertEqual(var, None, "No match should return None")
+        for waiting in assembler.waiting.values():
+            self.assertEqual(len(waiting), 0, "Stale index entries should be dropped")
+
+    # Mock value: (insert), (check). Warnings are not logged.
+    @mock.patch("time.time", mock.MagicMock(side_effect=[0, 5.1]))
+    @multi_post_condition
+    def test_multi_line_pattern_tracker_timeout(self):
+        announce_parser.statistics = {}
+        th = TrackerHelper(multiline_timeout=5)
+        th.config.insert_multi_regex(
+            regex=r"Row1 name: (.*)", regex_groups=["torrentName"]
+        )
+        th.config.insert_multi_regex(regex=r"Row2 g2: (.*)", regex_groups=["$g2"])
+
+        var = announce_parser.parse(th, "Row1 name: a_name")
+        self.assertEqual(var, None, "No match should return None")
+        with mock.patch.object(announce_parser.logger, "warning"):
+            var = announce_parser.parse(th, "Row2 g2: g2_text")
+        self.assertEqual(var, None, "Announcement should be discarded")
+        self.assertEqual(announce_parser.get_statistics("trackertype").expired, 1)
+
+    @multi_post_condition
+    def test_multi_line_pattern_evict_oldest(self):
+        announce_parser.statistics = {}
+        th = TrackerHelper(multiline_max_pending=2)
+        th.config.insert_multi_regex(
+            regex=r"Row1 name: (.*)", regex_groups=["torrentName"]
+        )
+        th.config.insert_multi_regex(regex=r"Row2 g2: (.*)", regex_groups=["$g2"])
+
+        with mock.patch.object(announce_parser.logger, "warning"):
+            for i in range(50):
+                var = announce_parser.parse(th, "Row1 name: name{}".format(i))
+                self.assertEqual(var, None, "No match should return None")
+                self.assertLessEqual(len(th.multiline_assembler), 2)
+
+        statistics = announce_parser.get_statistics("trackertype")
+        self.assertEqual(statistics.evicted, 48)
+        self.assertLessEqual(len(th.multiline_assembler.expiry), 4)
+        self.assertLessEqual(len(th.multiline_assembler.waiting[1]), 4)
+
+        var = announce_parser.parse(th, "Row2 g2: g2_text")
+        self.assertEqual(var["torrentName"], "name48", "Name did not match")
+        var = announce_parser.parse(th, "Row2 g2: g2_text")
+        self.assertEqual(var["torrentName"], "name49", "Name did not match")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,11 @@
+import os
+import random
 import unittest
 from datetime import datetime
+from unittest import mock
 
-from arrnounced import announcement, tracker, tracker_xml_config
+from arrnounced import announcement, announce_parser, tracker, tracker_xml_config
+from arrnounced.config import UserConfig
 from announcement import (
     Var,
     Http,
@@ -27,50 +31,50 @@ def get_time_passed(announce_time):
 
 
 class TrackerHelper:
-    def __init__(self):
-        self.config = TrackerConfigHelper()
+    def __init__(self, **user_values):
+        self.config = TrackerConfigHelper(**user_values)
 
 
 class TrackerConfigHelper(tracker.TrackerConfig):
     def __init__(
-        self,
-        regex=None,
-        regex_groups=[],
-        url_vars=[],
-        tracker_name="trackername",
-        tracker_type="trackertype",
+        self, tracker_name="trackername", tracker_type="trackertype", **user_values
     ):
-        self._user_tracker = {}
-        self._user_tracker["notify_backends"] = None
-        self._user_tracker["category"] = {}
-        self._user_tracker["torrent_https"] = False
-        self._user_tracker["settings"] = {}
-
-        self._xml_config = tracker_xml_config.TrackerXmlConfig()
-        self._xml_config.tracker_info = {
+        user_tracker = {
+            "irc_nickname": "nick",
+            "irc_server": "server",
+            "irc_port": 6667,
+            "irc_channels": "#channel",
+            "irc_tls": False,
+            "irc_tls_verify": False,
+            "torrent_https": False,
+            "announce_delay": 0,
+            "multiline_timeout": 15,
+            "multiline_max_pending": 100,
+            "pin_pattern_order": False,
+            "category": {},
+            "settings": {},
+        }
+        user_tracker.update(user_values)
+
+        xml_config = tracker_xml_config.TrackerXmlConfig()
+        xml_config.tracker_info = {
             "shortName": tracker_name,
+            "longName": tracker_name,
             "type": tracker_type,
         }
-        self._xml_config.line_patterns = []
-        self._xml_config.multiline_patterns = []
-        self._xml_config.ignores = []
-        self._xml_config.line_matched = []
+        super().__init__(UserConfig.UserTracker(tracker_type, user_tracker), xml_config)
 
     def insert_var(self, var_name, elements):
-        self._xml_config.line_matched.append(Var(var_name, elements))
+        self.line_matched.append(Var(var_name, elements))
 
     def insert_extract(self, srcvar, regex, regex_groups, optional):
-        self._xml_config.line_matched.append(
-            Extract(srcvar, regex, regex_groups, optional)
-        )
-
-    def __setitem__(self, key, value):
-        self._user_tracker["settings"][key] = value
+        self.line_matched.append(Extract(srcvar, regex, regex_groups, optional))
 
 
 class AnnouncementTest(unittest.TestCase):
+    @mock.patch.object(announcement, "full_evaluation", True)
     def test_no_torrent_name(self):
-        th = TrackerHelper()
+        th = TrackerHelper(settings={"tc1": "config_text1%", "tc2": "config_text2%"})
         elements1 = [
             HelperXml(x)
             for x in [
@@ -91,9 +95,6 @@ class AnnouncementTest(unittest.TestCase):
 
         elements3 = [HelperXml(x) for x in [["string", "value", "a_category"]]]
 
-        th.config["tc1"] = "config_text1%"
-        th.config["tc2"] = "config_text2%"
-
         th.config.insert_var("first_var", elements1)
         th.config.insert_var("torrentUrl", elements2)
         th.config.insert_var("category", elements3)
@@ -117,8 +118,9 @@ class AnnouncementTest(unittest.TestCase):
             "Variable not correct",
         )
 
+    @mock.patch.object(announcement, "full_evaluation", True)
     def test_no_torrent_url(self):
-        th = TrackerHelper()
+        th = TrackerHelper(settings={"tc1": "config_text1%", "tc2": "config_text2%"})
         elements1 = [
             HelperXml(x)
             for x in [
@@ -139,9 +141,6 @@ class AnnouncementTest(unittest.TestCase):
 
         elements3 = [HelperXml(x) for x in [["string", "value", "a_category"]]]
 
-        th.config["tc1"] = "config_text1%"
-        th.config["tc2"] = "config_text2%"
-
         th.config.insert_var("torrentName", elements1)
         th.config.insert_var("second_var", elements2)
         th.config.insert_var("category", elements3)
@@ -166,7 +165,7 @@ class AnnouncementTest(unittest.TestCase):
         )
 
     def test_no_torrent_ssl_url(self):
-        th = TrackerHelper()
+        th = TrackerHelper(torrent_https=True)
         elements1 = [
             HelperXml(x)
             for x in [
@@ -176,7 +175,6 @@ class AnnouncementTest(unittest.TestCase):
             ]
         ]
 
-        th.config["torrent_https"] = True
         th.config.insert_var("torrentName", elements1)
 
         variables = {"var1": "testvar1&", "var2": "testvar2&"}
@@ -189,7 +187,7 @@ class AnnouncementTest(unittest.TestCase):
         )
 
     def test_no_torrent_ssl_url_created_from_http(self):
-        th = TrackerHelper()
+        th = TrackerHelper(torrent_https=True)
         elements1 = [
             HelperXml(x)
             for x in [
@@ -208,7 +206,6 @@ class AnnouncementTest(unittest.TestCase):
             ]
         ]
 
-        th.config["torrent_https"] = True
         th.config.insert_var("torrentName", elements1)
         th.config.insert_var("torrentUrl", elements2)
 
@@ -232,7 +229,7 @@ class AnnouncementTest(unittest.TestCase):
         )
 
     def test_no_torrent_ssl_url_created_from_https(self):
-        th = TrackerHelper()
+        th = TrackerHelper(torrent_https=True)
         elements1 = [
             HelperXml(x)
             for x in [
@@ -251,7 +248,6 @@ class AnnouncementTest(unittest.TestCase):
             ]
         ]
 
-        th.config["torrent_https"] = True
         th.config.insert_var("torrentName", elements1)
         th.config.insert_var("torrentUrl", elements2)
 
@@ -274,8 +270,9 @@ class AnnouncementTest(unittest.TestCase):
             "Variable not correct",
         )
 
+    @mock.patch.object(announcement, "full_evaluation", True)
     def test_var_not_valid(self):
-        th = TrackerHelper()
+        th = TrackerHelper(settings={"tc1": "config_text1%", "tc2": "config_text2%"})
         elements1 = [
             HelperXml(x)
             for x in [
@@ -294,9 +291,6 @@ class AnnouncementTest(unittest.TestCase):
             ]
         ]
 
-        th.config["tc1"] = "config_text1%"
-        th.config["tc2"] = "config_text2%"
-
         th.config.insert_var("first_var", elements1)
         th.config.insert_var("second_var", elements2)
         variables = {"var1": "testvar1&", "var2": "testvar2&"}
@@ -314,7 +308,7 @@ class AnnouncementTest(unittest.TestCase):
         )
 
     def test_var_valid(self):
-        th = TrackerHelper()
+        th = TrackerHelper(settings={"tc1": "config_text1%", "tc2": "config_text2%"})
         elements1 = [
             HelperXml(x)
             for x in [
@@ -333,9 +327,6 @@ class AnnouncementTest(unittest.TestCase):
             ]
         ]
 
-        th.config["tc1"] = "config_text1%"
-        th.config["tc2"] = "config_text2%"
-
         th.config.insert_var("torrentName", elements1)
         th.config.insert_var("torrentUrl", elements2)
         variables = {"var1": "testvar1&", "var2": "testvar2&"}
@@ -353,6 +344,7 @@ class AnnouncementTest(unittest.TestCase):
         self.assertEqual(announce.indexer, "trackername", "Wrong indexer")
         self.assertTrue(get_time_passed(announce.date) < 0.005, "Date is wrong")
 
+    @mock.patch.object(announcement, "full_evaluation", True)
     def test_extract_not_valid(self):
         th = TrackerHelper()
         variables = {"mysrc": "group1  -  group2", "anothersrc": " group3  :  group4"}
@@ -666,6 +658,58 @@ class AnnouncementTest(unittest.TestCase):
         extracttags.process(tc_helper, variables)
         self.assertEqual(variables["name1"], "eurT")
 
+    def test_extracttags_first_match_order(self):
+        tc_helper = TrackerConfigHelper()
+
+        setvarifs = []
+        setvarifs.append(ExtractTags.SetVarIf("name1", "^fl", None, "regex"))
+        setvarifs.append(ExtractTags.SetVarIf("name1", None, "FLAC", "value"))
+        setvarifs.append(ExtractTags.SetVarIf("name2", None, "mp3", "value"))
+        setvarifs.append(ExtractTags.SetVarIf("name2", "mp", "MP3", "both"))
+        setvarifs.append(ExtractTags.SetVarIf("name3", "^(Log)$", None, None))
+        setvarifs.append(ExtractTags.SetVarIf("name3", r"(o)\1", None, "backref"))
+        setvarifs.append(ExtractTags.SetVarIf("name4", None, None, "any"))
+        extracttags = ExtractTags("srcvar", "/", setvarifs)
+
+        variables = {
+            "srcvar": "flac / MP3 / Log / Cue / Cool",
+        }
+
+        extracttags.process(tc_helper, variables)
+        self.assertEqual(variables["name1"], "regex")
+        self.assertEqual(variables["name2"], "value")
+        self.assertEqual(variables["name3"], "backref")
+        self.assertEqual(variables["name4"], "any")
+
+    def test_extracttags_same_as_in_order(self):
+        rand = random.Random(5)
+        words = ["flac", "FLAC", "mp3", "Log", "cue", "100%", "Scene", "x"]
+        regexes = ["^fl", "3$", "(?i)log", "^(cue|100%)$", r"(\w)\1", None]
+
+        for _ in range(200):
+            setvarifs = []
+            for i in range(rand.randint(1, 8)):
+                setvarifs.append(
+                    ExtractTags.SetVarIf(
+                        "name{}".format(i),
+                        rand.choice(regexes),
+                        rand.choice(words + [None]),
+                        rand.choice([None, "new"]),
+                    )
+                )
+            extracttags = ExtractTags("srcvar", "/", setvarifs)
+
+            for word in words:
+                expected = next(
+                    (
+                        i
+                        for i, setvarif in enumerate(setvarifs)
+                        if setvarif.get_value(word) is not None
+                    ),
+                    len(setvarifs),
+                )
+                self.assertEqual(extracttags.first_match(word), expected)
+
     def test_varreplace_missing_srcvar(self):
         tc_helper = TrackerConfigHelper()
 
@@ -883,5 +927,161 @@ class AnnouncementTest(unittest.TestCase):
         self.assertEqual(len(variables), 0)
 
 
+def _bundled_trackers():
+    trackers = []
+    xml_configs = tracker_xml_config.get_tracker_xml_configs("./tests/trackers")
+    for tracker_type, xml_config in sorted(xml_configs.items()):
+        user_tracker = UserConfig.UserTracker(
+            tracker_type,
+            {
+                "irc_nickname": "nick",
+                "irc_server": "server",
+                "irc_port": 6667,
+                "irc_channels": "#channel",
+                "irc_tls": False,
+                "irc_tls_verify": False,
+                "torrent_https": False,
+                "announce_delay": 0,
+                "multiline_timeout": 15,
+                "multiline_max_pending": 100,
+                "pin_pattern_order": False,
+                "category": {},
+                "settings": {s: "a setting&" + s for s in xml_config.settings},
+            },
+        )
+        path = os.path.join("./tests/announcements", tracker_type + ".txt")
+        with open(path) as f:
+            messages = [line.rstrip("\n") for line in f]
+        trackers.append(
+            (tracker.Tracker(tracker.TrackerConfig(user_tracker, xml_config)), messages)
+        )
+    return trackers
+
+
+class PlanTest(unittest.TestCase):
+    def test_var_folds_settings(self):
+        tc_helper = TrackerConfigHelper(settings={"passkey": "a key&"})
+        elements = [
+            HelperXml(x)
+            for x in [
+                ["string", "value", "https://"],
+                ["string", "value", "site/"],
+                ["var", "name", "id"],
+                ["string", "value", "?passkey="],
+                ["varenc", "name", "passkey"],
+            ]
+        ]
+        step = Var("torrentUrl", elements).compile(tc_helper)
+
+        with mock.patch.object(TrackerConfigHelper, "setting") as setting:
+            variables = {"id": "123"}
+            step(variables)
+            setting.assert_not_called()
+        self.assertEqual(variables["torrentUrl"], "https://site/123?passkey=a+key%26")
+
+        variables = {"id": "123", "passkey": "other key"}
+        step(variables)
+        self.assertEqual(variables["torrentUrl"], "https://site/123?passkey=other+key")
+
+        variables = {}
+        step(variables)
+        self.assertTrue("torrentUrl" not in variables)
+
+    def test_var_constant(self):
+        tc_helper = TrackerConfigHelper()
+        elements = [
+            HelperXml(x)
+            for x in [["string", "value", "a_"], ["string", "value", "category"]]
+        ]
+        variables = {}
+        Var("category", elements).compile(tc_helper)(variables)
+        self.assertEqual(variables["category"], "a_category")
+
+        elements.append(HelperXml(["string", "value", ""]))
+        variables = {}
+        Var("category", elements).compile(tc_helper)(variables)
+        self.assertTrue("category" not in variables)
+
+    def test_http_left_out(self):
+        tc_helper = TrackerConfigHelper()
+        plan = announcement.compile_plan([Http()], tc_helper)
+        self.assertEqual(len(plan), 0)
+
+    def test_plan_same_as_interpreted(self):
+        for tracker_, messages in _bundled_trackers():
+            matched = 0
+            for message in messages:
+                variables = announce_parser.parse(tracker_, message)
+                if variables is None:
+                    continue
+                matched += 1
+
+                interpreted = dict(variables)
+                for line_match in tracker_.config.line_matched:
+                    line_match.process(tracker_.config, interpreted)
+                compiled = dict(variables)
+                for step in tracker_.config.line_matched_plan(True):
+                    step(compiled)
+
+                self.assertEqual(interpreted, compiled, message)
+
+                needed = dict(variables)
+                for step in tracker_.config.line_matched_plan():
+                    step(needed)
+                for consumed in announcement.consumed_variables(tracker_.config):
+                    self.assertEqual(
+                        interpreted.get(consumed), needed.get(consumed), message
+                    )
+            self.assertGreater(matched, 0, tracker_.config.type)
+
+    def test_unused_variables_not_evaluated(self):
+        th = TrackerHelper(settings={"passkey": "key"})
+        elements1 = [HelperXml(["var", "name", "torrentName"])]
+        elements2 = [
+            HelperXml(x)
+            for x in [
+                ["string", "value", "http://site/"],
+                ["var", "name", "id"],
+                ["string", "value", "?key="],
+                ["var", "name", "passkey"],
+            ]
+        ]
+        th.config.insert_var("unused", elements1)
+        th.config.insert_extract("torrentName", "(\\d+)$", ["id"], False)
+        th.config.insert_extract("torrentName", "^(\\w+)", ["unused2"], False)
+        th.config.insert_var("torrentUrl", elements2)
+        th.config.insert_extract("torrentUrl", "^(\\w+)", ["unused3"], False)
+
+        variables = {"torrentName": "name 123"}
+        announce = announcement.create_announcement(th, variables)
+        self.assertEqual(announce.torrent_url, "http://site/123?key=key")
+        for unused in ["unused", "unused2", "unused3"]:
+            self.assertTrue(unused not in variables, unused)
+
+    def test_needed_line_matches_if(self):
+        tc_helper = TrackerConfigHelper()
+        line_matches = [
+            SetRegex("src", "a", "tmp", "x"),
+            If(
+                "src",
+                "b",
+                [
+                    VarReplace("unused", "src", "b", "c"),
+                    VarReplace("category", "tmp", "x", "y"),
+                ],
+            ),
+            If("src", "c", [VarReplace("unused2", "src", "c", "d")]),
+            Http(),
+        ]
+        needed = announcement.needed_line_matches(
+            line_matches, announcement.consumed_variables(tc_helper)
+        )
+        self.assertEqual(len(needed), 3)
+        self.assertTrue(isinstance(needed[0], SetRegex))
+        self.assertEqual([m.name for m in needed[1].line_matches], ["category"])
+        self.assertTrue(isinstance(needed[2], Http))
+        self.assertEqual(len(line_matches[1].line_matches), 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from arrnounced import backend
+
+
+class UserBackendHelper:
+    def __init__(self, name):
+        self.name = name
+        self.url = "http://" + name
+        self.apikey = name + "_key"
+        self.max_pushes = 1
+        self.push_queue_size = 100
+        self.push_overflow = "block"
+
+
+class AnnouncementHelper:
+    title = "Some.Release-GRP"
+    torrent_url = "https://example.com/some.torrent"
+    date = datetime(2024, 1, 2, 3, 4, 5)
+    indexer = "AlphaTracker"
+
+
+# Answers pushes to each backend after the given delay, approving or not
+class BackendServer:
+    def __init__(self, answers):
+        self.answers = answers
+        self.pushed = []
+        self.answered = []
+
+    async def post(self, url, headers, data):
+        name = url.split("/")[2]
+        self.pushed.append(name)
+        delay, approved = self.answers[name]
+        await asyncio.sleep(delay)
+        self.answered.append(name)
+        return [{"approved": approved}]
+
+
+class NotifyTest(unittest.TestCase):
+    def setUp(self):
+        self.sonarr = backend.Sonarr(UserBackendHelper("sonarr"))
+        self.radarr = backend.Radarr(UserBackendHelper("radarr"))
+        self.lidarr = backend.Lidarr(UserBackendHelper("lidarr"))
+        self.backends = [self.sonarr, self.radarr, self.lidarr]
+
+    def notify(self, policy, answers, hedge_delay=0.05):
+        server = BackendServer(answers)
+        with mock.patch.object(backend, "policy", policy), mock.patch.object(
+            backend, "hedge_delay", hedge_delay
+        ), mock.patch.object(backend.SessionProvider, "post", server.post):
+            approved = asyncio.run(backend.notify(AnnouncementHelper(), self.backends))
+        return approved, server
+
+    def test_sequential(self):
+        approved, server = self.notify(
+            "sequential",
+            {"sonarr": (0.01, False), "radarr": (0.01, True), "lidarr": (0, True)},
+        )
+        self.assertEqual(approved, [self.radarr])
+        self.assertEqual(server.pushed, ["sonarr", "radarr"])
+
+        approved, server = self.notify(
+            "sequential",
+            {"sonarr": (0, False), "radarr": (0, False), "lidarr": (0, False)},
+        )
+        self.assertEqual(approved, [])
+        self.assertEqual(server.pushed, ["sonarr", "radarr", "lidarr"])
+
+    def test_first(self):
+        approved, server = self.notify(
+            "first",
+            {"sonarr": (0.2, True), "radarr": (0.01, False), "lidarr": (0.02, True)},
+        )
+        self.assertEqual(approved, [self.lidarr])
+        self.assertEqual(server.pushed, ["sonarr", "radarr", "lidarr"])
+        # The slower push is cancelled
+        self.assertEqual(server.answered, ["radarr", "lidarr"])
+
+    def test_all(self):
+        approved, server = self.notify(
+            "all",
+            {"sonarr": (0.02, True), "radarr": (0.01, False), "lidarr": (0, True)},
+        )
+        self.assertEqual(approved, [self.sonarr, self.lidarr])
+        self.assertEqual(server.answered, ["lidarr", "radarr", "sonarr"])
+
+    def test_hedged(self):
+        # Sonarr does not answer in time so radarr is pushed to as well
+        approved, server = self.notify(
+            "hedged",
+            {"sonarr": (0.5, True), "radarr": (0.01, True), "lidarr": (0, True)},
+        )
+        self.assertEqual(approved, [self.radarr])
+        self.assertEqual(server.pushed, ["sonarr", "radarr"])
+
+        # A rejection moves on without waiting
+        approved, server = self.notify(
+            "hedged",
+            {"sonarr": (0, False), "radarr": (0.01, True), "lidarr": (0, True)},
+            hedge_delay=10,
+        )
+        self.assertEqual(approved, [self.radarr])
+        self.assertEqual(server.pushed, ["sonarr", "radarr"])
+
+    def test_bodies(self):
+        bodies = backend.Bodies(AnnouncementHelper())
+        other_sonarr = backend.Sonarr(UserBackendHelper("other"))
+
+        self.assertIs(bodies.get(self.sonarr), bodies.get(self.radarr))
+        self.assertIs(bodies.get(self.sonarr), bodies.get(other_sonarr))
+        self.assertEqual(
+            json.loads(bodies.get(self.sonarr)),
+            {
+                "title": "Some.Release-GRP",
+                "downloadUrl": "https://example.com/some.torrent",
+                "protocol": "Torrent",
+                "publishDate": "2024-01-02T03:04:05",
+                "indexer": "IrcAlphaTracker",
+            },
+        )
+        self.assertNotIn("indexer", json.loads(bodies.get(self.lidarr)))
+
+
+if __name__ == "__main__":
+    unittest.main()
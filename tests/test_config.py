@@ -27,6 +27,11 @@ class ConfigTest(unittest.TestCase):
 
         self.assertEqual(cfg.log_to_file, True, "Invalid default value")
         self.assertEqual(cfg.log_to_console, True, "Invalid default value")
+        self.assertEqual(cfg.adaptive_order, False, "Invalid default value")
+        self.assertEqual(cfg.match_budget_ms, 0, "Invalid default value")
+        self.assertEqual(cfg.parse_workers, 0, "Invalid default value")
+        self.assertEqual(cfg.notify_policy, "sequential", "Invalid default value")
+        self.assertEqual(cfg.notify_hedge_ms, 500, "Invalid default value")
 
         self.assertEqual(cfg.db_purge_days, 365, "Invalid default value")
 
@@ -85,6 +90,11 @@ class ConfigTest(unittest.TestCase):
         )
         self.assertEqual(tracker1["torrent_https"], False, "Invalid default value")
         self.assertEqual(tracker1["announce_delay"], 0, "Invalid default value")
+        self.assertEqual(tracker1["multiline_timeout"], 15, "Invalid default value")
+        self.assertEqual(
+            tracker1["multiline_max_pending"], 100, "Invalid default value"
+        )
+        self.assertEqual(tracker1["pin_pattern_order"], False, "Invalid default value")
         self.assertEqual(tracker1.get("notify_backends"), None, "Invalid default value")
         self.assertEqual(len(tracker1["category"]), 0)
 
@@ -103,6 +113,11 @@ class ConfigTest(unittest.TestCase):
 
         self.assertEqual(cfg.log_to_file, False, "Invalid log to file")
         self.assertEqual(cfg.log_to_console, False, "Invalid log to console")
+        self.assertEqual(cfg.adaptive_order, True, "Invalid adaptive order")
+        self.assertEqual(cfg.match_budget_ms, 50, "Invalid match budget")
+        self.assertEqual(cfg.parse_workers, 2, "Invalid parse workers")
+        self.assertEqual(cfg.notify_policy, "hedged", "Invalid notify policy")
+        self.assertEqual(cfg.notify_hedge_ms, 200, "Invalid hedge delay")
 
         sonarr = next(b for b in cfg.backends if b.name == "test_sonarr")
         self.assertEqual(sonarr.apikey, "sonapi", "Invalid sonarr api")
@@ -155,6 +170,9 @@ class ConfigTest(unittest.TestCase):
             9000,
             "Invalid announce delay",
         )
+        self.assertEqual(tracker1["multiline_timeout"], 30, "Invalid timeout")
+        self.assertEqual(tracker1["multiline_max_pending"], 5, "Invalid max pending")
+        self.assertEqual(tracker1["pin_pattern_order"], True, "Invalid pin order")
         always_notify = [b.strip() for b in tracker1["notify_backends"].split(",")]
         self.assertTrue("test_sonarr" in always_notify, "Invalid sonarr notify")
         self.assertTrue("test_radarr" in always_notify, "Invalid radarr notify")
@@ -284,6 +302,21 @@ class ConfigTest(unittest.TestCase):
         self.assertNotEqual(cfg, None, "Config is None")
         self.assertFalse(cfg.validate_config(), "Configuration is valid")
 
+    def test_invalid_match_budget(self):
+        cfg = config.init("./tests/configs/invalid_match_budget.toml")
+        self.assertNotEqual(cfg, None, "Config is None")
+        self.assertFalse(cfg.validate_config(), "Configuration is valid")
+
+    def test_invalid_notify_policy(self):
+        cfg = config.init("./tests/configs/invalid_notify_policy.toml")
+        self.assertNotEqual(cfg, None, "Config is None")
+        self.assertFalse(cfg.validate_config(), "Configuration is valid")
+
+    def test_invalid_multiline_max_pending(self):
+        cfg = config.init("./tests/configs/invalid_multiline_max_pending.toml")
+        self.assertNotEqual(cfg, None, "Config is None")
+        self.assertFalse(cfg.validate_config(), "Configuration is valid")
+
     def test_missing_channels(self):
         cfg = config.init("./tests/configs/missing_channels.toml")
         self.assertNotEqual(cfg, None, "Config is None")
@@ -0,0 +1,95 @@
+import asyncio
+import tempfile
+import unittest
+
+from arrnounced import announce_parser, message_handler, parse_executor
+from arrnounced.config import UserConfig
+from arrnounced.tracker import Tracker, TrackerConfig
+from arrnounced.tracker_xml_config import get_tracker_xml_configs
+
+tracker_path = "./tests/trackers"
+
+
+def _user_tracker(tracker_type):
+    return UserConfig.UserTracker(
+        tracker_type,
+        {
+            "irc_nickname": "nick",
+            "irc_server": "server",
+            "irc_port": 6667,
+            "irc_channels": "#channel",
+            "irc_tls": False,
+            "irc_tls_verify": False,
+            "torrent_https": False,
+            "announce_delay": 0,
+            "multiline_timeout": 15,
+            "multiline_max_pending": 100,
+            "pin_pattern_order": False,
+            "category": {},
+            "settings": {"passkey": "pass", "authkey": "auth", "torrent_pass": "tp"},
+        },
+    )
+
+
+class ParseExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.data = tempfile.TemporaryDirectory()
+        xml_configs = get_tracker_xml_configs(tracker_path)
+        self.user_trackers = [_user_tracker(t) for t in ("alpha", "delta")]
+        self.trackers = {
+            u.type: Tracker(TrackerConfig(u, xml_configs[u.type]))
+            for u in self.user_trackers
+        }
+        with open("./tests/announcements/alpha.txt") as f:
+            self.messages = [line.rstrip("\n") for line in f]
+
+    def tearDown(self):
+        parse_executor.stop()
+        self.data.cleanup()
+
+    def test_inline_by_default(self):
+        parse_executor.start(
+            self.trackers.values(), self.user_trackers, tracker_path, self.data.name, 0
+        )
+        self.assertFalse(parse_executor.is_pooled(self.trackers["alpha"]))
+        self.assertFalse(parse_executor.is_pooled(self.trackers["delta"]))
+
+    def test_parse_in_worker(self):
+        parse_executor.start(
+            self.trackers.values(), self.user_trackers, tracker_path, self.data.name, 1
+        )
+        alpha = self.trackers["alpha"]
+        self.assertTrue(parse_executor.is_pooled(alpha))
+        # Multiline trackers stay on the event loop
+        self.assertFalse(parse_executor.is_pooled(self.trackers["delta"]))
+
+        announce_parser.statistics = {}
+
+        async def parse_all():
+            return await asyncio.gather(
+                *(parse_executor.parse(alpha, m) for m in self.messages)
+            )
+
+        pooled = asyncio.run(parse_all())
+        pooled_statistics = str(announce_parser.get_statistics("alpha"))
+
+        announce_parser.statistics = {}
+        inline = [message_handler._parse(alpha, m) for m in self.messages]
+
+        self.assertEqual(
+            [(a.title, a.torrent_url, a.category) if a else None for a in pooled],
+            [(a.title, a.torrent_url, a.category) if a else None for a in inline],
+        )
+        self.assertTrue(any(a is not None for a in pooled))
+        self.assertEqual(
+            pooled_statistics, str(announce_parser.get_statistics("alpha"))
+        )
+        self.assertEqual(parse_executor._queue_depth, 0)
+        self.assertEqual(
+            sum(w.messages for w in parse_executor._workers.values()),
+            len(self.messages),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
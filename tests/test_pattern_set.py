@@ -0,0 +1,364 @@
+import os
+import random
+import re
+import unittest
+from unittest import mock
+
+from arrnounced import pattern_set
+from announcement import Extract
+from tracker_xml_config import get_tracker_xml_configs, Ignore
+from utils import compile_regex
+
+
+def _sequential_match(extracts, message):
+    for i, extract in enumerate(extracts):
+        match_groups = extract.process_string(message)
+        if match_groups is not None:
+            return i, match_groups
+    return -1, {}
+
+
+def _corpus():
+    path = "./tests/announcements"
+    messages = []
+    for announcement_file in sorted(os.listdir(path)):
+        with open(os.path.join(path, announcement_file)) as f:
+            messages.extend(line.rstrip("\n") for line in f)
+    return messages
+
+
+# Corpus messages with random characters removed or replaced, which gives
+# many messages just failing to contain a literal
+def _mutated_corpus(seed=1):
+    rand = random.Random(seed)
+    messages = []
+    for message in _corpus():
+        for _ in range(20):
+            chars = list(message)
+            for _ in range(rand.randint(1, 3)):
+                if not chars:
+                    break
+                i = rand.randrange(len(chars))
+                if rand.random() < 0.5:
+                    del chars[i]
+                else:
+                    chars[i] = rand.choice(" -:/'<>.aeN0")
+            messages.append("".join(chars))
+    return messages
+
+
+def _all_regexes(xml_config):
+    for extract in xml_config.line_patterns + xml_config.multiline_patterns:
+        yield extract.regex
+    for ignore in xml_config.ignores:
+        yield ignore.regex
+    for line_match in xml_config.line_matched:
+        regex = getattr(line_match, "regex", None)
+        if regex is not None:
+            yield regex
+
+
+def _sequential_ignore(ignores, message):
+    for ignore in ignores:
+        if bool(ignore.regex.search(message)) == ignore.expected:
+            return True
+    return False
+
+
+def _ignores(*regex_expected):
+    return [Ignore(compile_regex(r), e) for r, e in regex_expected]
+
+
+def _extract(regex, groups):
+    return Extract(None, regex, groups, False)
+
+
+class PatternSetTest(unittest.TestCase):
+    def assert_same_as_sequential(self, extracts, messages):
+        patterns = pattern_set.PatternSet(extracts)
+        for message in messages:
+            self.assertEqual(
+                patterns.match(message),
+                _sequential_match(extracts, message),
+                message,
+            )
+
+    def test_first_pattern_wins(self):
+        extracts = [
+            _extract(r"name: (\S+) end", ["torrentName"]),
+            _extract(r"^(\S+) name", ["$first"]),
+            _extract(r"name: (\S+)", ["$second"]),
+        ]
+        patterns = pattern_set.PatternSet(extracts)
+        self.assertEqual(len(patterns.segments), 1)
+
+        # Later patterns match earlier in the message but order decides
+        self.assertEqual(patterns.match("x name: y end"), (0, {"torrentName": "y"}))
+        self.assertEqual(patterns.match("x name: y"), (1, {"$first": "x"}))
+        self.assertEqual(patterns.match(" name: y"), (2, {"$second": "y"}))
+        self.assertEqual(patterns.match("nothing"), (-1, {}))
+
+    def test_group_namespaces(self):
+        extracts = [
+            _extract(r"^A (\w+) (\w+)$", ["g1", "g2"]),
+            _extract(r"^B (\w+)(?: (\w+))?$", ["g3", "g4"]),
+            _extract(r"^C (?:\w+) (\w+)", ["g5"]),
+        ]
+        self.assert_same_as_sequential(
+            extracts, ["A one two", "B three", "B three four", "C x five", "D"]
+        )
+        patterns = pattern_set.PatternSet(extracts)
+        self.assertEqual(patterns.match("B three"), (1, {"g3": "three"}))
+        self.assertEqual(patterns.match("C x five"), (2, {"g5": "five"}))
+
+    def test_unfusable_fallback(self):
+        extracts = [
+            _extract(r"^a (\w+)", ["g1"]),
+            _extract(r"^b (\w+) \1", ["g2"]),
+            _extract(r"(?i)^c (\w+)", ["g3"]),
+            _extract(r"^d (?P<name>\w+)", ["g4"]),
+            _extract(r"^e (\w+)", ["g5"]),
+            _extract(r"^f (\w+)", ["g6"]),
+        ]
+        patterns = pattern_set.PatternSet(extracts)
+        self.assertEqual(
+            [type(s).__name__ for s in patterns.segments],
+            ["_SingleSegment"] * 4 + ["_FusedSegment"],
+        )
+        self.assert_same_as_sequential(
+            extracts,
+            ["a x", "b x x", "b x y", "C x", "d x", "e x", "f x", "g x"],
+        )
+
+    def test_is_fusable(self):
+        compile_regex = pattern_set.re.compile
+        self.assertTrue(pattern_set.is_fusable(compile_regex(r"(a)(?:b)(?=c)")))
+        self.assertFalse(pattern_set.is_fusable(compile_regex(r"(a)\1")))
+        self.assertFalse(pattern_set.is_fusable(compile_regex(r"(a)?(?(1)b|c)")))
+        self.assertFalse(pattern_set.is_fusable(compile_regex(r"(?s)a.b")))
+        self.assertFalse(pattern_set.is_fusable(compile_regex(r"(a)"), 2))
+
+    def test_bundled_trackers(self):
+        messages = _corpus() + _mutated_corpus()
+
+        for xml_config in get_tracker_xml_configs("./tests/trackers").values():
+            self.assert_same_as_sequential(xml_config.line_patterns, messages)
+            self.assert_same_as_sequential(xml_config.multiline_patterns, messages)
+            self.assert_same_as_sequential(
+                list(reversed(xml_config.line_patterns)), messages
+            )
+
+
+class HitOrderTest(unittest.TestCase):
+    def test_anchored_prefix(self):
+        self.assertEqual(
+            pattern_set.anchored_prefix(re.compile(r"^New: (.*)")), "New: "
+        )
+        self.assertEqual(pattern_set.anchored_prefix(re.compile(r"^Ab?c")), "A")
+        self.assertEqual(pattern_set.anchored_prefix(re.compile(r"New: (.*)")), "")
+        self.assertEqual(pattern_set.anchored_prefix(re.compile(r"(?i)^New")), "")
+        self.assertEqual(pattern_set.anchored_prefix(re.compile(r"(?m)^New")), "")
+
+    def test_are_disjoint(self):
+        def disjoint(a, b):
+            return pattern_set.are_disjoint(re.compile(a), re.compile(b))
+
+        self.assertTrue(disjoint(r"^New: (.*)", r"^Old: (.*)"))
+        self.assertFalse(disjoint(r"^New: (.*)", r"^New(.*)"))
+        self.assertFalse(disjoint(r"^New: (.*)", r"Old: (.*)"))
+        self.assertFalse(disjoint(r"^(?:New|Old): (.*)", r"^Old: (.*)"))
+
+    def test_hit_order(self):
+        regexes = [re.compile(r) for r in [r"^a (\w+)", r"^b (\w+)", r"c", r"^d"]]
+        # Anchored b may pass a, but d may not pass the unanchored c
+        self.assertEqual(pattern_set.hit_order(regexes, {1: 5, 3: 10}), [1, 0, 2, 3])
+        self.assertEqual(pattern_set.hit_order(regexes, {}), [0, 1, 2, 3])
+        self.assertEqual(pattern_set.hit_order(regexes[:2], {1: 2, 0: 2}), [0, 1])
+
+    def test_reorder_same_as_sequential(self):
+        rand = random.Random(6)
+        messages = _corpus() + _mutated_corpus()
+
+        for xml_config in get_tracker_xml_configs("./tests/trackers").values():
+            extracts = xml_config.line_patterns + xml_config.multiline_patterns
+            patterns = pattern_set.PatternSet(extracts)
+            hits = {i: rand.randrange(100) for i in range(len(extracts))}
+            patterns.reorder(pattern_set.hit_order([e.regex for e in extracts], hits))
+            for message in messages:
+                self.assertEqual(
+                    patterns.match(message),
+                    _sequential_match(extracts, message),
+                    message,
+                )
+
+
+class MatchBudgetTest(unittest.TestCase):
+    @mock.patch.object(pattern_set, "match_budget", 0.5)
+    def test_quarantine(self):
+        extracts = [
+            _extract(r"^a (\w+)", ["g1"]),
+            _extract(r"^b (\w+)", ["g2"]),
+            _extract(r"^c (\w+)", ["g3"]),
+        ]
+        patterns = pattern_set.PatternSet(extracts)
+        self.assertEqual(len(patterns.segments), 1)
+
+        # Fused patterns over budget are split up
+        with mock.patch.object(pattern_set.time, "perf_counter", side_effect=[0, 1]):
+            self.assertEqual(patterns.match("b x"), (1, {"g2": "x"}))
+        self.assertEqual(len(patterns.segments), 3)
+
+        # The single pattern over budget is quarantined
+        with mock.patch.object(
+            pattern_set.time, "perf_counter", side_effect=[0, 0.1, 1, 2]
+        ):
+            with mock.patch.object(pattern_set.logger, "error") as error:
+                self.assertEqual(patterns.match("b x"), (1, {"g2": "x"}))
+                error.assert_called_once()
+        self.assertEqual(patterns.quarantined, {1})
+        self.assertEqual(patterns.match("b x"), (-1, {}))
+        self.assertEqual(patterns.match("c x"), (2, {"g3": "x"}))
+
+        patterns.reorder([2, 1, 0])
+        self.assertEqual([s.indexes for s in patterns.segments], [[2], [0]])
+
+    def test_no_budget(self):
+        patterns = pattern_set.PatternSet([_extract(r"^a (\w+)", ["g1"])])
+        with mock.patch.object(pattern_set.time, "perf_counter") as perf_counter:
+            self.assertEqual(patterns.match("a x"), (0, {"g1": "x"}))
+            perf_counter.assert_not_called()
+
+
+class PrefilterTest(unittest.TestCase):
+    def test_required_literals(self):
+        def literals(regex):
+            return pattern_set.required_literals(re.compile(regex))
+
+        self.assertEqual(
+            literals(r"^New Torrent: <([^>]*)> Name:'(.*)'"),
+            ["New Torrent: <", "> Name:'"],
+        )
+        self.assertEqual(literals(r"ab(cd|ef)gh"), ["ab", "gh"])
+        self.assertEqual(literals(r"ab(?:cd)+(?:ef)?(?:gh)*"), ["ab", "cd"])
+        self.assertEqual(literals(r"xy(?=ab)(?!cd)(?<=y)"), ["xy"])
+        self.assertEqual(literals(r"x(y(zz)w)"), ["zz"])
+        self.assertEqual(literals(r"ab(?i:cd)ef"), ["ab", "ef"])
+        self.assertEqual(literals(r"(?i)abc"), [])
+        self.assertEqual(literals(r"a.b[cd]e"), [])
+
+    def test_prefilter_bundled_trackers(self):
+        messages = _corpus() + _mutated_corpus()
+        for xml_config in get_tracker_xml_configs("./tests/trackers").values():
+            for regex in _all_regexes(xml_config):
+                self.assertEqual(
+                    pattern_set.check_prefilter(regex, messages), [], regex.pattern
+                )
+
+    def test_prefilter_random(self):
+        rand = random.Random(2)
+        regexes = [
+            re.compile(r"ab(?:cd)+e?"),
+            re.compile(r"x(?:yz){2,}w"),
+            re.compile(r"(?:ab|cd)ef(gh)?"),
+            re.compile(r"a\.b(?i:cd)ef"),
+        ]
+        strings = [
+            "".join(rand.choice("abcdefghwxyzCD.") for _ in range(rand.randint(0, 12)))
+            for _ in range(5000)
+        ]
+        for regex in regexes:
+            self.assertEqual(pattern_set.check_prefilter(regex, strings), [])
+
+    def test_verify_prefilter(self):
+        regex = re.compile("abc")
+        self.assertTrue(pattern_set.prefilter_rejects("xyz", regex, "abc"))
+
+        pattern_set.verify_prefilter = True
+        try:
+            with self.assertLogs("PATTERN_SET", level="ERROR"):
+                self.assertFalse(pattern_set.prefilter_rejects("xyz", regex, "abc"))
+            self.assertTrue(pattern_set.prefilter_rejects("xyz", regex, "abd"))
+        finally:
+            pattern_set.verify_prefilter = False
+
+    def test_verify_prefilter_parsing(self):
+        messages = _corpus() + _mutated_corpus()
+        pattern_set.verify_prefilter = True
+        try:
+            with mock.patch.object(pattern_set.logger, "error") as error:
+                for xml_config in get_tracker_xml_configs("./tests/trackers").values():
+                    for message in messages:
+                        xml_config.line_pattern_set.match(message)
+                        xml_config.multiline_pattern_set.match(message)
+                        xml_config.ignore_set.ignore(message)
+            error.assert_not_called()
+        finally:
+            pattern_set.verify_prefilter = False
+
+
+class IgnoreSetTest(unittest.TestCase):
+    messages = [
+        "",
+        "   ",
+        "cond1 something",
+        "something cond2",
+        "a / b",
+        "a / b cond1",
+        "x x",
+        "x y",
+        "https://example.com",
+    ]
+
+    def assert_same_as_sequential(self, ignores):
+        ignore_set = pattern_set.IgnoreSet(ignores)
+        for message in self.messages:
+            self.assertEqual(
+                ignore_set.ignore(message),
+                _sequential_ignore(ignores, message),
+                message,
+            )
+
+    def test_expected_index(self):
+        ignores = _ignores(("^a", False), ("b", True), ("c", True))
+        ignore_set = pattern_set.IgnoreSet(ignores)
+        self.assertEqual(ignore_set.expected_index("abc"), 1)
+        self.assertEqual(ignore_set.expected_index("ac"), 2)
+        self.assertEqual(ignore_set.expected_index("a"), -1)
+
+    def test_empty(self):
+        ignore_set = pattern_set.IgnoreSet([])
+        self.assertEqual(len(ignore_set), 0)
+        self.assertFalse(ignore_set.ignore("anything"))
+
+    def test_expected(self):
+        ignores = _ignores((r"^cond1 (.*)", True), (r"cond2", True))
+        ignore_set = pattern_set.IgnoreSet(ignores)
+        self.assertTrue(ignore_set.ignore("cond1 something"))
+        self.assertTrue(ignore_set.ignore("something cond2"))
+        self.assertFalse(ignore_set.ignore("something else"))
+        self.assert_same_as_sequential(ignores)
+
+    def test_unexpected(self):
+        ignores = _ignores((r".*/.*", False), (r"^a", False))
+        ignore_set = pattern_set.IgnoreSet(ignores)
+        self.assertFalse(ignore_set.ignore("a / b"))
+        self.assertTrue(ignore_set.ignore("b / a"))
+        self.assertTrue(ignore_set.ignore("a b"))
+        self.assert_same_as_sequential(ignores)
+
+    def test_mixed_and_unfusable(self):
+        self.assert_same_as_sequential(
+            _ignores(
+                (r"^\s*$", True),
+                (r"(x) \1", True),
+                (r"cond1", True),
+                (r"(?i)HTTPS?://", False),
+                (r"/|:", False),
+            )
+        )
+        self.assert_same_as_sequential(_ignores((r"(x) \1", False)))
+        self.assert_same_as_sequential(_ignores((r"(x) \1", False), (r"x", False)))
+
+
+if __name__ == "__main__":
+    unittest.main()
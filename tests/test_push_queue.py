@@ -0,0 +1,117 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from arrnounced import push_queue
+from arrnounced.push_queue import PushQueue
+
+
+# Pushes which finish once released, recording the most in flight
+class Sender:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.sent = []
+        self.release = None
+
+    def send(self, name):
+        async def _send():
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.sent.append(name)
+            await self.release.wait()
+            self.in_flight -= 1
+            return name
+
+        return _send
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class PushQueueTest(unittest.TestCase):
+    def run_pushes(self, queue, names, before_release=None):
+        sender = Sender()
+
+        async def run():
+            sender.release = asyncio.Event()
+            tasks = []
+            for name in names:
+                tasks.append(asyncio.ensure_future(queue.push(sender.send(name))))
+                await _settle()
+            if before_release is not None:
+                before_release(tasks)
+            sender.release.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            await queue.stop()
+            return results
+
+        return asyncio.run(run()), sender
+
+    def test_max_pushes(self):
+        queue = PushQueue("backend", 2, 10, "block")
+        results, sender = self.run_pushes(queue, ["a", "b", "c", "d"])
+        self.assertEqual(results, ["a", "b", "c", "d"])
+        self.assertEqual(sender.max_in_flight, 2)
+        self.assertEqual(queue.statistics.pushes, 4)
+        self.assertEqual(queue.statistics.max_depth, 2)
+
+    def test_block(self):
+        queue = PushQueue("backend", 1, 1, "block")
+        results, sender = self.run_pushes(queue, ["a", "b", "c"])
+        self.assertEqual(results, ["a", "b", "c"])
+        self.assertEqual(sender.sent, ["a", "b", "c"])
+
+    def test_drop_oldest(self):
+        queue = PushQueue("backend", 1, 1, "drop_oldest")
+        with mock.patch.object(push_queue.logger, "warning") as warning:
+            results, sender = self.run_pushes(queue, ["a", "b", "c"])
+            warning.assert_called_once()
+        # a is in flight, b waits and is replaced by c
+        self.assertEqual(results, ["a", None, "c"])
+        self.assertEqual(sender.sent, ["a", "c"])
+        self.assertEqual(queue.statistics.dropped, 1)
+
+    def test_reject(self):
+        queue = PushQueue("backend", 1, 1, "reject")
+        with mock.patch.object(push_queue.logger, "warning") as warning:
+            results, sender = self.run_pushes(queue, ["a", "b", "c"])
+            warning.assert_called_once()
+        self.assertEqual(results, ["a", "b", None])
+        self.assertEqual(sender.sent, ["a", "b"])
+        self.assertEqual(queue.statistics.rejected, 1)
+
+    def test_cancelled(self):
+        queue = PushQueue("backend", 1, 10, "block")
+        results, sender = self.run_pushes(
+            queue, ["a", "b", "c"], lambda tasks: tasks[1].cancel()
+        )
+        self.assertEqual(results[0], "a")
+        self.assertIsInstance(results[1], asyncio.CancelledError)
+        self.assertEqual(results[2], "c")
+        self.assertEqual(sender.sent, ["a", "c"])
+
+    def test_exception(self):
+        queue = PushQueue("backend", 1, 10, "block")
+
+        async def fail():
+            raise ValueError()
+
+        async def succeed():
+            return "a"
+
+        async def run():
+            with self.assertRaises(ValueError):
+                await queue.push(fail)
+            # The worker keeps pushing
+            result = await queue.push(succeed)
+            await queue.stop()
+            return result
+
+        self.assertEqual(asyncio.run(run()), "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
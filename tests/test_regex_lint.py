@@ -0,0 +1,71 @@
+import re
+import unittest
+from unittest import mock
+
+from arrnounced import regex_lint
+from tracker_xml_config import get_tracker_xml_configs
+
+
+class RegexLintTest(unittest.TestCase):
+    def test_nested_quantifiers(self):
+        def nested(pattern):
+            return regex_lint.has_nested_quantifiers(re.compile(pattern))
+
+        self.assertTrue(nested(r"(a+)+$"))
+        self.assertTrue(nested(r"^(\w+\s?)*$"))
+        self.assertTrue(nested(r"(?:x(?:\d+))*"))
+        self.assertFalse(nested(r"^(.*) - (.*)$"))
+        self.assertFalse(nested(r"(\d{2})+"))
+        self.assertFalse(nested(r"(a+)?b+"))
+
+    def test_ambiguous_alternation(self):
+        def ambiguous(pattern):
+            return regex_lint.has_ambiguous_alternation(re.compile(pattern))
+
+        self.assertTrue(ambiguous(r"(\w+|\d+)*x"))
+        self.assertTrue(ambiguous(r"(?:ab|[a-c]d)+e"))
+        self.assertTrue(ambiguous(r"(?:x?ab|xc)+"))
+        self.assertFalse(ambiguous(r"(?:ab|cd)+"))
+        self.assertFalse(ambiguous(r"(?:\d+|[a-z]+)+"))
+        self.assertFalse(ambiguous(r"^(?:New|Old): (.*)"))
+
+    def test_fuzz_slow_regex(self):
+        match_time, fuzz_input = regex_lint.worst_match_time(re.compile(r"^(a+)+$"))
+        self.assertGreater(match_time, regex_lint.max_match_time)
+        self.assertLess(len(fuzz_input), regex_lint.max_input_length)
+
+        findings = regex_lint.lint_regex(
+            "type", "linepatterns[0]", re.compile(r"(a+)+$")
+        )
+        self.assertEqual(
+            [f.message.split(",")[0] for f in findings],
+            ["Nested quantifiers", "Slow match"],
+        )
+
+    @mock.patch.object(regex_lint, "max_input_length", 64)
+    def test_fuzz_fast_regex(self):
+        match_time, fuzz_input = regex_lint.worst_match_time(
+            re.compile(r"^New: (.*) - (.*)$")
+        )
+        self.assertLess(match_time, regex_lint.max_match_time)
+        self.assertTrue(fuzz_input.endswith("\x00"))
+
+    def test_tracker_regexes(self):
+        xml_configs = get_tracker_xml_configs("./tests/trackers")
+        locations = [
+            location
+            for xml_config in xml_configs.values()
+            for location, _ in regex_lint.tracker_regexes(xml_config)
+        ]
+        for prefix in ["linepatterns", "multilinepatterns", "linematched", "ignore"]:
+            self.assertTrue(any(loc.startswith(prefix) for loc in locations), prefix)
+
+    @mock.patch.object(regex_lint, "max_input_length", 64)
+    def test_bundled_trackers(self):
+        xml_configs = get_tracker_xml_configs("./tests/trackers")
+        findings = regex_lint.lint_trackers(xml_configs)
+        self.assertEqual([str(f) for f in findings], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from arrnounced import message_handler, routing
+
+
+class TrackerHelper:
+    def __init__(self, server, channels, announcers):
+        self.config = mock.Mock()
+        self.config.irc_server = server
+        self.config.irc_channels = frozenset(channels)
+        self.config.announcer_names = frozenset(announcers)
+
+
+class RoutingTest(unittest.TestCase):
+    def setUp(self):
+        self.alpha = TrackerHelper("irc.example.com", ["#alpha"], ["AlphaBot"])
+        self.beta = TrackerHelper(
+            "irc.example.com", ["#alpha", "#beta"], ["AlphaBot", "BetaBot"]
+        )
+        self.gamma = TrackerHelper("irc.other.com", ["#alpha"], ["AlphaBot"])
+        routing.rebuild([self.alpha, self.beta, self.gamma])
+
+    def test_route(self):
+        self.assertEqual(
+            routing.route("irc.example.com", "#alpha", "AlphaBot"),
+            (self.alpha, self.beta),
+        )
+        self.assertEqual(
+            routing.route("irc.example.com", "#beta", "BetaBot"), (self.beta,)
+        )
+        self.assertEqual(
+            routing.route("irc.other.com", "#alpha", "AlphaBot"), (self.gamma,)
+        )
+
+    def test_route_normalized(self):
+        self.assertEqual(
+            routing.route("IRC.Example.com", "#Alpha", "alphabot"),
+            (self.alpha, self.beta),
+        )
+
+    def test_no_route(self):
+        self.assertEqual(routing.route("irc.example.com", "#alpha", "someone"), ())
+        self.assertEqual(routing.route("irc.example.com", "#gamma", "AlphaBot"), ())
+        self.assertEqual(routing.route("irc.third.com", "#alpha", "AlphaBot"), ())
+
+    def test_rebuild(self):
+        routing.rebuild([self.gamma])
+        self.assertEqual(routing.route("irc.example.com", "#alpha", "AlphaBot"), ())
+        self.assertEqual(
+            routing.route("irc.other.com", "#alpha", "AlphaBot"), (self.gamma,)
+        )
+
+    @mock.patch.object(message_handler, "_sanitize_message")
+    @mock.patch.object(message_handler, "_parse", return_value=None)
+    def test_chatter_dropped(self, parse, sanitize):
+        sanitize.side_effect = lambda message: message
+        trackers = (self.alpha, self.beta)
+
+        asyncio.run(
+            message_handler.on_message(
+                trackers, "irc.example.com", "someone", "#alpha", "chatter"
+            )
+        )
+        sanitize.assert_not_called()
+        parse.assert_not_called()
+
+        asyncio.run(
+            message_handler.on_message(
+                trackers, "irc.example.com", "AlphaBot", "#alpha", "announcement"
+            )
+        )
+        sanitize.assert_called_once_with("announcement")
+        self.assertEqual(
+            parse.call_args_list,
+            [
+                mock.call(self.alpha, "announcement"),
+                mock.call(self.beta, "announcement"),
+            ],
+        )
+
+    @mock.patch.object(message_handler, "_parse", return_value=None)
+    def test_only_own_trackers(self, parse):
+        asyncio.run(
+            message_handler.on_message(
+                (self.beta,), "irc.example.com", "AlphaBot", "#alpha", "announcement"
+            )
+        )
+        parse.assert_called_once_with(self.beta, "announcement")
+
+
+if __name__ == "__main__":
+    unittest.main()
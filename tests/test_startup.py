@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+
+from arrnounced import startup
+
+
+class StartupTimerTest(unittest.TestCase):
+    def test_phases(self):
+        timer = startup.StartupTimer()
+        with timer.phase("first"):
+            pass
+        with self.assertRaises(ValueError):
+            with timer.phase("failed"):
+                raise ValueError()
+
+        self.assertEqual([p[0] for p in timer.phases], ["first", "failed"])
+        for _, at, elapsed in timer.phases:
+            self.assertGreaterEqual(at, 0)
+            self.assertGreaterEqual(elapsed, 0)
+
+    def test_joined(self):
+        timer = startup.StartupTimer()
+        with timer.phase("before"):
+            pass
+
+        with mock.patch.object(startup.logger, "info") as info:
+            timer.joined()
+            timer.joined()
+            info.assert_called_once()
+            self.assertIn("before", info.call_args[0][2])
+            self.assertIsNotNone(timer.first_join)
+
+            info.reset_mock()
+            with timer.phase("after"):
+                pass
+            info.assert_called_once()
+            self.assertEqual(info.call_args[0][1], "after")
+
+
+if __name__ == "__main__":
+    unittest.main()
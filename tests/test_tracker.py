@@ -0,0 +1,55 @@
+import unittest
+
+from arrnounced import config, tracker
+from arrnounced.tracker_xml_config import get_tracker_xml_configs
+
+
+def _tracker_config():
+    cfg = config.init("./tests/configs/override_default.toml")
+    user_tracker = next(t for t in cfg.trackers if t.type == "tracker1")
+    xml_config = get_tracker_xml_configs("./tests/trackers")["alpha"]
+    return tracker.TrackerConfig(user_tracker, xml_config)
+
+
+class TrackerConfigTest(unittest.TestCase):
+    def test_plain_values(self):
+        tracker_config = _tracker_config()
+        self.assertIs(type(tracker_config.irc_server), str)
+        self.assertIs(type(tracker_config.irc_port), int)
+        self.assertIs(type(tracker_config.irc_tls), bool)
+        self.assertIs(type(tracker_config.setting("phony")), str)
+        self.assertEqual(tracker_config.irc_server, "t1url")
+        self.assertEqual(tracker_config.irc_port, 1234)
+        self.assertEqual(tracker_config.announce_delay, 9000)
+        self.assertEqual(tracker_config.setting("phony"), "t1phony")
+        self.assertEqual(tracker_config.setting("missing"), None)
+        self.assertEqual(
+            tracker_config.always_notify_backends,
+            ("test_sonarr", "test_radarr", "test_lidarr"),
+        )
+        self.assertEqual(
+            dict(tracker_config.category_notify_backends),
+            {"test_sonarr": "soncat", "test_radarr": "radcat", "test_lidarr": "lidcat"},
+        )
+
+    def test_channels_and_announcers(self):
+        tracker_config = _tracker_config()
+        self.assertEqual(tracker_config.user_channels, ("t1ch",))
+        self.assertEqual(
+            tracker_config.irc_channels, frozenset(["#alpha-announce", "t1ch"])
+        )
+        self.assertEqual(tracker_config.announcer_names, frozenset(["AlphaBot"]))
+
+    def test_immutable(self):
+        tracker_config = _tracker_config()
+        with self.assertRaises(AttributeError):
+            tracker_config.irc_server = "another"
+        with self.assertRaises(AttributeError):
+            tracker_config.new_attribute = "value"
+        with self.assertRaises(TypeError):
+            tracker_config.settings["phony"] = "another"
+        self.assertEqual(tracker_config.irc_server, "t1url")
+
+
+if __name__ == "__main__":
+    unittest.main()
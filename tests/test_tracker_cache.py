@@ -0,0 +1,172 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from arrnounced import tracker_cache, tracker_xml_config, utils
+
+tracker_path = "./tests/trackers"
+
+
+class TrackerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.data = tempfile.TemporaryDirectory()
+        self.trackers = tempfile.TemporaryDirectory()
+        for tracker_file in os.listdir(tracker_path):
+            shutil.copy(os.path.join(tracker_path, tracker_file), self.trackers.name)
+
+    def tearDown(self):
+        self.data.cleanup()
+        self.trackers.cleanup()
+
+    def load(self):
+        return tracker_cache.get_tracker_xml_configs(self.trackers.name, self.data.name)
+
+    def test_same_as_parsed(self):
+        parsed = tracker_xml_config.get_tracker_xml_configs(tracker_path)
+        self.load()
+        cached = self.load()
+
+        self.assertEqual(sorted(cached), sorted(parsed))
+        for tracker_type, xml_config in parsed.items():
+            cached_config = cached[tracker_type]
+            self.assertEqual(cached_config.tracker_info, xml_config.tracker_info)
+            self.assertEqual(cached_config.settings, xml_config.settings)
+            self.assertEqual(cached_config.servers, xml_config.servers)
+            self.assertEqual(
+                [e.regex for e in cached_config.line_patterns],
+                [e.regex for e in xml_config.line_patterns],
+            )
+            self.assertEqual(
+                [type(m) for m in cached_config.line_matched],
+                [type(m) for m in xml_config.line_matched],
+            )
+
+    def test_regexes_shared(self):
+        self.load()
+        cached = self.load()
+        for xml_config in cached.values():
+            for extract in xml_config.line_patterns + xml_config.multiline_patterns:
+                self.assertIs(extract.regex, utils.compile_regex(extract.regex.pattern))
+
+    def test_warm_start_skips_parsing(self):
+        self.load()
+        with mock.patch.object(
+            tracker_cache, "parse_tracker_file", wraps=tracker_cache.parse_tracker_file
+        ) as parse:
+            self.assertEqual(len(self.load()), 4)
+            parse.assert_not_called()
+
+            # Only the changed file is parsed again
+            alpha = os.path.join(self.trackers.name, "alpha.tracker")
+            stat = os.stat(alpha)
+            os.utime(alpha, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            self.assertEqual(len(self.load()), 4)
+            parse.assert_called_once_with(self.trackers.name, "alpha.tracker")
+
+            parse.reset_mock()
+            self.load()
+            parse.assert_not_called()
+
+    def test_used_trackers(self):
+        with mock.patch.object(
+            tracker_cache, "parse_tracker_file", wraps=tracker_cache.parse_tracker_file
+        ) as parse:
+            cached = tracker_cache.get_tracker_xml_configs(
+                self.trackers.name, self.data.name, ["beta"]
+            )
+            self.assertEqual(list(cached), ["beta"])
+            parse.assert_called_once_with(self.trackers.name, "beta.tracker")
+
+            # Files of other trackers are indexed but not parsed
+            entries = tracker_cache.load_entries(
+                self.trackers.name, self.data.name, {"beta"}
+            )
+            self.assertEqual(
+                {f: (e.tracker_type, e.is_parsed()) for f, e in entries.items()},
+                {
+                    "alpha.tracker": ("alpha", False),
+                    "beta.tracker": ("beta", True),
+                    "delta.tracker": ("delta", False),
+                    "gamma.tracker": ("gamma", False),
+                },
+            )
+
+            # Parsed once their tracker is used
+            parse.reset_mock()
+            cached = tracker_cache.get_tracker_xml_configs(
+                self.trackers.name, self.data.name, ["beta", "delta"]
+            )
+            self.assertEqual(sorted(cached), ["beta", "delta"])
+            parse.assert_called_once_with(self.trackers.name, "delta.tracker")
+
+    def test_used_trackers_indexed(self):
+        tracker_cache.get_tracker_xml_configs(
+            self.trackers.name, self.data.name, ["beta"]
+        )
+        with mock.patch.object(
+            tracker_cache, "read_tracker_type", wraps=tracker_cache.read_tracker_type
+        ) as read:
+            tracker_cache.get_tracker_xml_configs(
+                self.trackers.name, self.data.name, ["beta"]
+            )
+            read.assert_not_called()
+
+    def test_parallel(self):
+        parsed = tracker_xml_config.get_tracker_xml_configs(tracker_path)
+        with mock.patch.object(tracker_cache, "parallel_min_files", 2):
+            with mock.patch.object(tracker_cache.os, "cpu_count", return_value=2):
+                cached = tracker_cache.get_tracker_xml_configs(
+                    self.trackers.name, self.data.name, ["alpha", "beta", "gamma"]
+                )
+
+        self.assertEqual(sorted(cached), ["alpha", "beta", "gamma"])
+        for tracker_type, xml_config in cached.items():
+            self.assertEqual(
+                [e.regex for e in xml_config.line_patterns],
+                [e.regex for e in parsed[tracker_type].line_patterns],
+            )
+            for extract in xml_config.line_patterns:
+                self.assertIs(extract.regex, utils.compile_regex(extract.regex.pattern))
+
+    def test_removed_file(self):
+        self.load()
+        os.remove(os.path.join(self.trackers.name, "beta.tracker"))
+        self.assertEqual(sorted(self.load()), ["alpha", "delta", "gamma"])
+        self.assertEqual(
+            sorted(tracker_cache.load_entries(self.trackers.name, self.data.name)),
+            ["alpha.tracker", "delta.tracker", "gamma.tracker"],
+        )
+
+    def test_invalid_cache(self):
+        with open(tracker_cache.cache_path(self.data.name), "wb") as f:
+            f.write(b"not a pickle")
+
+        with mock.patch.object(tracker_cache.logger, "warning") as warning:
+            self.assertEqual(len(self.load()), 4)
+            warning.assert_called_once()
+        with mock.patch.object(tracker_cache, "parse_tracker_file") as parse:
+            self.assertEqual(len(self.load()), 4)
+            parse.assert_not_called()
+
+    def test_other_version(self):
+        self.load()
+        with mock.patch.object(tracker_cache, "__version__", "0.0.0"):
+            with mock.patch.object(
+                tracker_cache,
+                "parse_tracker_file",
+                wraps=tracker_cache.parse_tracker_file,
+            ) as parse:
+                self.assertEqual(len(self.load()), 4)
+                self.assertEqual(parse.call_count, 4)
+
+    def test_rebuild(self):
+        self.assertEqual(tracker_cache.rebuild(self.trackers.name, self.data.name), 4)
+        with mock.patch.object(tracker_cache, "parse_tracker_file") as parse:
+            self.assertEqual(len(self.load()), 4)
+            parse.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
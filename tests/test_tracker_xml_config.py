@@ -0,0 +1,110 @@
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+from arrnounced import tracker_xml_config, utils
+from tracker_xml_config import get_tracker_index, get_tracker_xml_configs
+
+tracker_path = "./tests/trackers"
+
+
+def _all_line_matched(line_matched):
+    for line_match in line_matched:
+        yield line_match
+        if hasattr(line_match, "line_matches"):
+            yield from _all_line_matched(line_match.line_matches)
+        if hasattr(line_match, "extracts"):
+            yield from line_match.extracts
+
+
+class TrackerXmlConfigTest(unittest.TestCase):
+    def test_load_all_trackers(self):
+        xml_configs = get_tracker_xml_configs(tracker_path)
+        self.assertEqual(
+            sorted(xml_configs.keys()), ["alpha", "beta", "delta", "gamma"]
+        )
+        self.assertEqual(len(xml_configs["beta"].line_patterns), 3)
+        self.assertEqual(len(xml_configs["delta"].multiline_patterns), 4)
+        self.assertEqual(xml_configs["beta"].settings, ["authkey", "torrent_pass"])
+
+    def test_regexes_are_compiled(self):
+        for xml_config in get_tracker_xml_configs(tracker_path).values():
+            for pattern in xml_config.line_patterns + xml_config.multiline_patterns:
+                self.assertIsInstance(pattern.regex, re.Pattern)
+            for ignore in xml_config.ignores:
+                self.assertIsInstance(ignore.regex, re.Pattern)
+            for line_match in _all_line_matched(xml_config.line_matched):
+                regex = getattr(line_match, "regex", None)
+                if regex is not None:
+                    self.assertIsInstance(regex, re.Pattern)
+
+    def test_regexes_are_shared(self):
+        first = get_tracker_xml_configs(tracker_path)
+        second = get_tracker_xml_configs(tracker_path)
+        for tracker_type in first:
+            for one, two in zip(
+                first[tracker_type].line_patterns, second[tracker_type].line_patterns
+            ):
+                self.assertIs(one.regex, two.regex)
+
+        self.assertIs(utils.compile_regex("a(.*)b"), utils.compile_regex("a(.*)b"))
+        self.assertIsNot(
+            utils.compile_regex("a(.*)b"), utils.compile_regex("a(.*)b", re.I)
+        )
+
+    def test_tracker_index(self):
+        self.assertEqual(
+            get_tracker_index(tracker_path),
+            {
+                "alpha": "alpha.tracker",
+                "beta": "beta.tracker",
+                "delta": "delta.tracker",
+                "gamma": "gamma.tracker",
+            },
+        )
+
+    def test_tracker_index_invalid_file(self):
+        with tempfile.TemporaryDirectory() as trackers:
+            with open(os.path.join(trackers, "broken.tracker"), "w") as f:
+                f.write("<trackerinfo")
+            with open(os.path.join(trackers, "typeless.tracker"), "w") as f:
+                f.write('<trackerinfo shortName="T"></trackerinfo>')
+
+            with mock.patch.object(tracker_xml_config.logger, "error") as error:
+                self.assertEqual(get_tracker_index(trackers), {})
+                self.assertEqual(error.call_count, 2)
+
+    def test_load_used_trackers(self):
+        with mock.patch.object(
+            tracker_xml_config,
+            "parse_tracker_file",
+            wraps=tracker_xml_config.parse_tracker_file,
+        ) as parse:
+            xml_configs = tracker_xml_config.get_tracker_xml_configs(
+                tracker_path, ["gamma", "beta", "unknown"]
+            )
+            self.assertEqual(sorted(xml_configs.keys()), ["beta", "gamma"])
+            self.assertEqual(
+                parse.call_args_list,
+                [
+                    mock.call(tracker_path, "beta.tracker"),
+                    mock.call(tracker_path, "gamma.tracker"),
+                ],
+            )
+
+    def test_invalid_regex(self):
+        with self.assertRaises(re.error):
+            tracker_xml_config.set_regex_creator(
+                _Element(srcvar="var", regex="(unbalanced", varName="v", newValue="new")
+            )
+
+
+class _Element:
+    def __init__(self, **attrib):
+        self.attrib = attrib
+
+
+if __name__ == "__main__":
+    unittest.main()
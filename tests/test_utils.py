@@ -0,0 +1,134 @@
+import html
+import random
+import re
+import unittest
+
+from arrnounced import message_handler, utils
+
+
+class VariablesTest(unittest.TestCase):
+    def test_defaults(self):
+        variables = utils.get_default_variables()
+        self.assertEqual(len(variables), 29)
+        self.assertEqual(variables["torrentName"], "")
+        self.assertTrue("cue" in variables)
+        self.assertTrue("$other" not in variables)
+        self.assertEqual(variables.get("$other"), None)
+        self.assertEqual(variables.get("$other", "value"), "value")
+        self.assertEqual(list(variables)[0], "releaseType")
+        with self.assertRaises(KeyError):
+            variables["$other"]
+
+    def test_set(self):
+        variables = utils.get_default_variables()
+        variables["torrentName"] = "a name"
+        variables.update({"$g1": "group 1", "category": "a category"})
+
+        self.assertEqual(len(variables), 30)
+        self.assertEqual(variables["torrentName"], "a name")
+        self.assertEqual(variables.get("category"), "a category")
+        self.assertEqual(variables["$g1"], "group 1")
+        self.assertEqual(list(variables)[-1], "$g1")
+
+        expected = {
+            name: "" for name in utils.get_default_variables() if name != "torrentName"
+        }
+        expected.update({"torrentName": "a name", "category": "a category"})
+        expected["$g1"] = "group 1"
+        self.assertEqual(variables, expected)
+        self.assertEqual(dict(variables), expected)
+
+    def test_defaults_not_shared(self):
+        variables = utils.get_default_variables()
+        other = utils.get_default_variables()
+        variables["torrentName"] = "a name"
+        self.assertEqual(other["torrentName"], "")
+
+        copy = variables.copy()
+        copy["torrentName"] = "another name"
+        copy["$g1"] = "group 1"
+        self.assertEqual(variables["torrentName"], "a name")
+        self.assertTrue("$g1" not in variables)
+
+    def test_delete(self):
+        variables = utils.get_default_variables()
+        variables["$g1"] = "group 1"
+        del variables["torrentName"]
+        del variables["$g1"]
+
+        self.assertEqual(len(variables), 28)
+        self.assertTrue("torrentName" not in variables)
+        self.assertEqual(variables.get("torrentName"), None)
+        self.assertTrue("torrentName" not in list(variables))
+        with self.assertRaises(KeyError):
+            del variables["torrentName"]
+
+        variables["torrentName"] = "a name"
+        self.assertEqual(len(variables), 29)
+
+
+# How formatting codes were stripped before being done in one pass
+def _strip_in_three_passes(line):
+    line = re.sub(r"\x03\d\d?,\d\d?", "", line)
+    line = re.sub(r"\x03\d\d?", "", line)
+    line = re.sub(r"[\x01-\x1F]", "", line)
+    return line
+
+
+_formatting_alphabet = [
+    "\x03",
+    "\x03",
+    "\x02",
+    "\x0f",
+    "\x16",
+    "\x1d",
+    "\x1f",
+    "0",
+    "1",
+    "9",
+    "\u0663",
+    ",",
+    " ",
+    "a",
+    "&",
+    "&amp;",
+    "&#39;",
+]
+
+
+class SanitizeTest(unittest.TestCase):
+    def test_strip_formatting(self):
+        self.assertEqual(utils.strip_irc_color_codes("\x0304,12red\x03 x"), "red x")
+        self.assertEqual(utils.strip_irc_color_codes("\x035,1\x03123"), "3")
+        self.assertEqual(utils.strip_irc_color_codes("\x02bold\x1f\x0f"), "bold")
+        self.assertEqual(utils.strip_irc_color_codes("\x03\x031,234"), "")
+        self.assertEqual(utils.strip_irc_color_codes("\x03\x0313"), "")
+        self.assertEqual(utils.strip_irc_color_codes("plain"), "plain")
+
+    def test_strip_formatting_random(self):
+        rand = random.Random(3)
+        for _ in range(20000):
+            line = "".join(
+                rand.choice(_formatting_alphabet) for _ in range(rand.randint(0, 16))
+            )
+            self.assertEqual(
+                utils.strip_irc_color_codes(line),
+                _strip_in_three_passes(line),
+                repr(line),
+            )
+
+    def test_sanitize_random(self):
+        rand = random.Random(4)
+        for _ in range(5000):
+            line = "".join(
+                rand.choice(_formatting_alphabet) for _ in range(rand.randint(0, 16))
+            )
+            self.assertEqual(
+                message_handler._sanitize_message(line),
+                html.unescape(_strip_in_three_passes(line)),
+                repr(line),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()